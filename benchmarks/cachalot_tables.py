@@ -0,0 +1,122 @@
+"""
+Cachalot benchmark: hit rates, invalidations and memory, all vs main tables.
+
+Catalog and course reads mixed with order writes (as webhooks do). Runs against
+the database and cache from .env / environment, created rows and cached queries
+are deleted (other cache keys are kept):
+    python benchmarks/cachalot_tables.py --iterations 2000 --write-every 5
+"""
+
+import argparse
+import os
+import random
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from cachalot.settings import cachalot_settings  # noqa: E402
+from cachalot.signals import post_invalidation  # noqa: E402
+from django.conf import settings  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from mixer.backend.django import mixer  # noqa: E402
+
+from app.querycache import clear_query_cache, table_memory  # noqa: E402
+from main.models import Block, Course  # noqa: E402
+from orders.models import Order  # noqa: E402
+from users.models import CustomUser  # noqa: E402
+
+COURSES = 20
+
+
+def workload(courses, user, orders, iterations: int, write_every: int) -> None:
+    """Two catalog/course reads and two order reads per iteration"""
+    for i in range(iterations):
+        course = random.choice(courses)  # noqa: S311
+        list(Course.objects.select_related("course_profile").all())
+        list(Block.objects.filter(course=course).order_by("order"))
+        Order.objects.filter(user=user, course=course, status="completed").exists()
+        list(Order.objects.filter(user=user).select_related("course"))
+        if i % write_every == 0:
+            order = random.choice(orders)  # noqa: S311
+            Order.objects.filter(id=order.id).update(
+                status=random.choice(["pending", "completed"])  # noqa: S311
+            )
+
+
+def measure(tables, data, iterations: int, write_every: int) -> dict:
+    invalidations = []
+
+    def on_invalidation(sender, **kwargs):
+        invalidations.append(sender)
+
+    with override_settings(CACHALOT_ONLY_CACHABLE_TABLES=tables):
+        cachalot_settings.reload()
+        clear_query_cache()
+        post_invalidation.connect(on_invalidation)
+        try:
+            with CaptureQueriesContext(connection) as queries:
+                workload(*data, iterations, write_every)
+        finally:
+            post_invalidation.disconnect(on_invalidation)
+        memory = table_memory()
+    cachalot_settings.reload()
+
+    selects = [query["sql"] for query in queries if query["sql"].startswith("SELECT")]
+    order_selects = sum(1 for sql in selects if "orders_order" in sql)
+    return {
+        "main_hit_rate": 1 - (len(selects) - order_selects) / (2 * iterations),
+        "orders_hit_rate": 1 - order_selects / (2 * iterations),
+        "invalidations": len(invalidations),
+        "keys": sum(stats["keys"] for stats in memory.values()),
+        "kib": sum(stats["bytes"] for stats in memory.values()) / 1024,
+        "redis": bool(memory),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--iterations", type=int, default=2000)
+    parser.add_argument("--write-every", type=int, default=5)
+    args = parser.parse_args()
+
+    courses = mixer.cycle(COURSES).blend(Course)
+    for course in courses:
+        mixer.cycle(5).blend(Block, course=course, order=(n for n in range(1, 6)))
+    user = mixer.blend(CustomUser)
+    orders = [mixer.blend(Order, user=user, course=course) for course in courses]
+    data = (courses, user, orders)
+
+    print(f"{connection.vendor}, {settings.CACHES['default']['BACKEND']}")
+    print(
+        f"{'tables':<8} {'main hits':>10} {'order hits':>11} "
+        f"{'invalidations':>14} {'keys':>8} {'KiB':>10}"
+    )
+    try:
+        for name, tables in [
+            ("all", ()),
+            ("main", settings.CACHALOT_ONLY_CACHABLE_TABLES),
+        ]:
+            result = measure(tables, data, args.iterations, args.write_every)
+            keys = result["keys"] if result["redis"] else "n/a"
+            kib = f"{result['kib']:.1f}" if result["redis"] else "n/a"
+            print(
+                f"{name:<8} {result['main_hit_rate']:>10.1%} "
+                f"{result['orders_hit_rate']:>11.1%} "
+                f"{result['invalidations']:>14} {keys:>8} {kib:>10}"
+            )
+    finally:
+        Course.objects.filter(id__in=[course.id for course in courses]).delete()
+        user.delete()
+        clear_query_cache()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Concurrency benchmark: requests/sec and latency at different connection counts.
+
+Example (compare deployments before/after a change, e.g. sync vs async views):
+    python benchmarks/concurrency.py \\
+        "http://localhost:8000/courses-search/?query=python" \\
+        "http://localhost:8000/courses/1/load-next/1/" \\
+        --connections 10 100 500 --duration 10 --cookie "sessionid=..."
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from dataclasses import dataclass, field
+from urllib.parse import urlsplit
+
+
+@dataclass
+class Result:
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def add(self, status: int, latency: float) -> None:
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        self.latencies.append(latency)
+
+
+async def read_response(reader: asyncio.StreamReader) -> tuple[int, dict[str, str]]:
+    """Read one HTTP/1.1 response, return status code and headers"""
+    status_line = await reader.readline()
+    if not status_line:
+        raise ConnectionError("Connection closed")
+    status = int(status_line.split()[1])
+
+    headers = {}
+    line = await reader.readline()
+    while line not in (b"\r\n", b""):
+        name, _, value = line.decode("latin-1").partition(":")
+        headers[name.strip().lower()] = value.strip()
+        line = await reader.readline()
+
+    if headers.get("transfer-encoding") == "chunked":
+        size = int((await reader.readline()).strip(), 16)
+        while size:
+            await reader.readexactly(size + 2)
+            size = int((await reader.readline()).strip(), 16)
+        await reader.readline()
+    else:
+        await reader.readexactly(int(headers.get("content-length", 0)))
+
+    if headers.get("connection") == "close":
+        raise ConnectionResetError("Connection: close")
+    return status, headers
+
+
+async def worker(url: str, cookie: str, deadline: float, result: Result) -> None:
+    parts = urlsplit(url)
+    host, port = parts.hostname, parts.port or 80
+    path = parts.path + (f"?{parts.query}" if parts.query else "")
+    request = (
+        f"GET {path} HTTP/1.1\r\nHost: {parts.netloc}\r\n"
+        + (f"Cookie: {cookie}\r\n" if cookie else "")
+        + "Connection: keep-alive\r\n\r\n"
+    ).encode()
+
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, _ = await read_response(reader)
+            result.add(status, time.perf_counter() - started)
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(url: str, connections: int, duration: float, cookie: str) -> Result:
+    result = Result()
+    deadline = time.perf_counter() + duration
+    await asyncio.gather(
+        *(worker(url, cookie, deadline, result) for _ in range(connections))
+    )
+    return result
+
+
+def percentile(values: list[float], p: int) -> float:
+    if len(values) < 2:
+        return values[0] if values else 0.0
+    return statistics.quantiles(values, n=100)[p - 1]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("urls", nargs="+")
+    parser.add_argument("--connections", type=int, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--cookie", default="", help="e.g. sessionid=...")
+    args = parser.parse_args()
+
+    print(
+        f"{'url':<50} {'conn':>5} {'req/s':>9} {'p50 ms':>8} "
+        f"{'p95 ms':>8} {'p99 ms':>8} {'errors':>7} statuses"
+    )
+    for url in args.urls:
+        for connections in args.connections:
+            result = asyncio.run(run(url, connections, args.duration, args.cookie))
+            ms = [latency * 1000 for latency in result.latencies]
+            print(
+                f"{url[-50:]:<50} {connections:>5} "
+                f"{len(ms) / args.duration:>9.1f} {percentile(ms, 50):>8.1f} "
+                f"{percentile(ms, 95):>8.1f} {percentile(ms, 99):>8.1f} "
+                f"{result.errors:>7} {result.statuses}"
+            )
+
+
+if __name__ == "__main__":
+    main()
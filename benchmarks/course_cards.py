@@ -0,0 +1,101 @@
+"""
+Course listing benchmark: model instances vs slotted CourseCard records.
+
+Builds the course list (query and objects) and renders the listing template,
+reports time, memory of the list (tracemalloc) and its pickled (cached) size.
+Runs against the database from .env / environment, created courses are deleted:
+    python benchmarks/course_cards.py --courses 10000 --repeat 5
+"""
+
+import argparse
+import os
+import pickle  # noqa: S403
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection  # noqa: E402
+from django.template.loader import render_to_string  # noqa: E402
+
+from main.models import Course  # noqa: E402
+from main.services.fetching import get_courses_by_query  # noqa: E402
+
+TEMPLATE = "main/partials/partial_search_courses.html"
+TITLE = "Benchmark course"
+
+
+def build_models() -> list:
+    return list(get_courses_by_query(TITLE))
+
+
+def build_cards() -> list:
+    return get_courses_by_query(TITLE, cards=True)
+
+
+def measure(build, repeat: int) -> dict:
+    build_times, render_times = [], []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        courses = build()
+        build_times.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        render_to_string(TEMPLATE, {"courses": courses})
+        render_times.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    courses = build()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return {
+        "count": len(courses),
+        "build_ms": statistics.median(build_times) * 1000,
+        "render_ms": statistics.median(render_times) * 1000,
+        "memory_mib": memory / 2**20,
+        "pickle_kib": len(pickle.dumps(courses)) / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--courses", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    courses = Course.objects.bulk_create_with_profiles(
+        [
+            Course(title=f"{TITLE} {i}", description="Описание курса " * 10)
+            for i in range(args.courses)
+        ],
+        batch_size=1000,
+    )
+    ids = [course.id for course in courses]
+
+    print(f"{connection.vendor}, {args.courses} courses")
+    print(
+        f"{'records':<8} {'courses':>8} {'build ms':>9} {'render ms':>10} "
+        f"{'memory MiB':>11} {'pickle KiB':>11}"
+    )
+    try:
+        for name, build in [("models", build_models), ("cards", build_cards)]:
+            result = measure(build, args.repeat)
+            print(
+                f"{name:<8} {result['count']:>8} {result['build_ms']:>9.1f} "
+                f"{result['render_ms']:>10.1f} {result['memory_mib']:>11.1f} "
+                f"{result['pickle_kib']:>11.0f}"
+            )
+    finally:
+        Course.objects.filter(id__in=ids).delete()
+
+
+if __name__ == "__main__":
+    main()
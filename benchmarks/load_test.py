@@ -0,0 +1,289 @@
+"""
+Load test of reading and checkout flows: latency, throughput and query counts.
+
+Seed data first (prints path of data file with session cookies and ids):
+    python src/manage.py seed_benchmark_data --clear
+
+Run server with PERF_SAMPLE_RATE=1 to get query counts (Server-Timing header):
+    PERF_SAMPLE_RATE=1 make up
+
+Then all flows are driven at the same time:
+    python benchmarks/load_test.py --connections 20 --duration 30
+    python benchmarks/load_test.py --save-baseline  # store current results
+    python benchmarks/load_test.py --compare        # exit 1 on regression
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import re
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from urllib.parse import quote, urlsplit
+
+from concurrency import percentile, read_response
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_DATA = BENCHMARKS_DIR / "data.json"
+DEFAULT_BASELINE = BENCHMARKS_DIR / "baseline.json"
+
+SCENARIOS = (
+    "course_list",
+    "search",
+    "detail",
+    "load_next",
+    "profile",
+    "checkout",
+    "webhook",
+)
+
+QUERIES_RE = re.compile(r'db;[^,]*desc="(\d+) queries"')
+
+
+@dataclass
+class Target:
+    method: str
+    path: str
+    cookie: str = ""
+    body: bytes = b""
+
+
+@dataclass
+class ScenarioResult:
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=dict)
+    errors: int = 0
+
+    def summary(self, duration: float) -> dict:
+        ms = [latency * 1000 for latency in self.latencies]
+        return {
+            "requests": len(ms),
+            "rps": round(len(ms) / duration, 1),
+            "p50_ms": round(percentile(ms, 50), 1),
+            "p95_ms": round(percentile(ms, 95), 1),
+            "p99_ms": round(percentile(ms, 99), 1),
+            "queries": (
+                round(sum(self.queries) / len(self.queries), 1)
+                if self.queries
+                else None
+            ),
+            "errors": self.errors,
+            "statuses": {str(k): v for k, v in sorted(self.statuses.items())},
+        }
+
+
+def webhook_body(order: dict) -> bytes:
+    event = {
+        "type": "payment.succeeded",
+        "object": {
+            "id": order["payment_id"],
+            "status": "succeeded",
+            "metadata": {"order_id": order["order_id"], "user_id": order["user_id"]},
+        },
+    }
+    return json.dumps(event).encode()
+
+
+def build_targets(data: dict, scenario: str) -> list[Target]:
+    users = data["users"]
+    if scenario == "course_list":
+        return [Target("GET", "/courses/")]
+    if scenario == "search":
+        return [
+            Target("GET", f"/courses-search/?query={quote(query)}")
+            for query in data["search_queries"]
+        ]
+    if scenario == "detail":
+        return [
+            Target("GET", f"/courses/{course['course_id']}/", user["cookie"])
+            for user in users
+            for course in user["purchased"]
+        ]
+    if scenario == "load_next":
+        return [
+            Target(
+                "GET",
+                f"/courses/{course['course_id']}/load-next/{course['block_id']}/",
+                user["cookie"],
+            )
+            for user in users
+            for course in user["purchased"]
+            if course["block_id"]
+        ]
+    if scenario == "profile":
+        return [Target("GET", "/users/profile/", user["cookie"]) for user in users]
+    if scenario == "checkout":
+        # GET only, POST creates a real YooKassa payment
+        return [
+            Target("GET", f"/orders/checkout/{course_id}/", user["cookie"])
+            for user in users
+            for course_id in user["not_purchased"][:5]
+        ]
+    if scenario == "webhook":
+        return [
+            Target("POST", "/orders/yookassa/webhook/", body=webhook_body(order))
+            for user in users
+            for order in user["pending_orders"]
+        ]
+    raise ValueError(f"Unknown scenario: {scenario}")
+
+
+def encode_request(target: Target, netloc: str) -> bytes:
+    headers = [
+        f"{target.method} {target.path} HTTP/1.1",
+        f"Host: {netloc}",
+        "User-Agent: cogniwise-load-test",
+        "Connection: keep-alive",
+    ]
+    if target.cookie:
+        headers.append(f"Cookie: {target.cookie}")
+    if target.method == "POST":
+        headers.append("Content-Type: application/json")
+        headers.append(f"Content-Length: {len(target.body)}")
+    return ("\r\n".join(headers) + "\r\n\r\n").encode() + target.body
+
+
+async def worker(
+    base_url: str, targets: list[Target], deadline: float, result: ScenarioResult
+) -> None:
+    parts = urlsplit(base_url)
+    host, port = parts.hostname, parts.port or 80
+    requests = [encode_request(target, parts.netloc) for target in targets]
+
+    reader = writer = None
+    while time.perf_counter() < deadline:
+        request = random.choice(requests)  # noqa: S311
+        try:
+            if writer is None:
+                reader, writer = await asyncio.open_connection(host, port)
+            started = time.perf_counter()
+            writer.write(request)
+            await writer.drain()
+            status, headers = await read_response(reader)
+            result.latencies.append(time.perf_counter() - started)
+            result.statuses[status] = result.statuses.get(status, 0) + 1
+
+            match = QUERIES_RE.search(headers.get("server-timing", ""))
+            if match:
+                result.queries.append(int(match.group(1)))
+        except (OSError, ValueError, asyncio.IncompleteReadError):
+            result.errors += 1
+            if writer is not None:
+                writer.close()
+            reader = writer = None
+    if writer is not None:
+        writer.close()
+
+
+async def run(
+    base_url: str, data: dict, scenarios: list[str], connections: int, duration: float
+) -> dict[str, ScenarioResult]:
+    results = {scenario: ScenarioResult() for scenario in scenarios}
+    deadline = time.perf_counter() + duration
+    workers = []
+    for scenario in scenarios:
+        targets = build_targets(data, scenario)
+        if not targets:
+            print(f"No data for {scenario}, skipped", file=sys.stderr)
+            continue
+        workers += [
+            worker(base_url, targets, deadline, results[scenario])
+            for _ in range(connections)
+        ]
+    await asyncio.gather(*workers)
+    return results
+
+
+def compare(summary: dict, baseline: dict, tolerance: float) -> list[str]:
+    """Regressions against baseline: latency, throughput, query count"""
+    regressions = []
+    for scenario, current in summary.items():
+        base = baseline.get(scenario)
+        if base is None:
+            continue
+        if current["p95_ms"] > base["p95_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{scenario}: p95 {current['p95_ms']} ms > {base['p95_ms']} ms"
+            )
+        if current["rps"] < base["rps"] * (1 - tolerance):
+            regressions.append(
+                f"{scenario}: throughput {current['rps']} < {base['rps']} req/s"
+            )
+        if (
+            current["queries"] is not None
+            and base["queries"] is not None
+            and current["queries"] > base["queries"] + 0.5
+        ):
+            regressions.append(
+                f"{scenario}: queries {current['queries']} > {base['queries']}"
+            )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--data", default=str(DEFAULT_DATA))
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS))
+    parser.add_argument(
+        "--connections", type=int, default=10, help="Connections per scenario"
+    )
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--note", default="", help="Environment, saved in baseline")
+    parser.add_argument("--compare", action="store_true")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.2, help="Allowed latency/rps change"
+    )
+    args = parser.parse_args()
+
+    data = json.loads(Path(args.data).read_text())
+    results = asyncio.run(
+        run(args.url, data, args.scenarios, args.connections, args.duration)
+    )
+    summary = {
+        scenario: result.summary(args.duration) for scenario, result in results.items()
+    }
+
+    print(
+        f"{'scenario':<12} {'req/s':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} "
+        f"{'queries':>8} {'errors':>7} statuses"
+    )
+    for scenario, row in summary.items():
+        queries = "-" if row["queries"] is None else row["queries"]
+        print(
+            f"{scenario:<12} {row['rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+            f"{row['p99_ms']:>8} {queries:>8} {row['errors']:>7} {row['statuses']}"
+        )
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline = {
+            "note": args.note,
+            "connections": args.connections,
+            "duration": args.duration,
+            "scenarios": summary,
+        }
+        baseline_path.write_text(json.dumps(baseline, indent=2) + "\n")
+        print(f"Baseline saved: {baseline_path}")
+
+    if args.compare:
+        if not baseline_path.exists():
+            print(f"No baseline {baseline_path}, save it with --save-baseline")
+            return
+        baseline = json.loads(baseline_path.read_text())
+        regressions = compare(summary, baseline["scenarios"], args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against baseline")
+
+
+if __name__ == "__main__":
+    main()
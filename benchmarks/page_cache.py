@@ -0,0 +1,61 @@
+"""
+Anonymous page cache benchmark: requests/sec and queries with and without it.
+
+In-process test client against the database and cache from .env / environment:
+    python benchmarks/page_cache.py --requests 500
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.conf import settings  # noqa: E402
+from django.core.cache import cache  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client, override_settings  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from django.urls import reverse  # noqa: E402
+
+VIEWS = ["main:home", "main:about", "main:courses-list", "main:modal-open-demo"]
+
+
+def measure(url: str, count: int, enabled: bool) -> tuple[float, int]:
+    """Requests/sec and queries of the last request (warm cache)"""
+    with override_settings(PAGE_CACHE_ENABLED=enabled):
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        client.get(url)
+        started = time.perf_counter()
+        for _ in range(count - 1):
+            client.get(url)
+        elapsed = time.perf_counter() - started
+        with CaptureQueriesContext(connection) as queries:
+            client.get(url)
+    return (count - 1) / elapsed, len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"{connection.vendor}, {settings.CACHES['default']['BACKEND']}")
+    print(f"{'view':<22} {'page cache':<11} {'req/s':>9} {'queries':>8}")
+    for view_name in VIEWS:
+        url = reverse(view_name)
+        for name, enabled in [("off", False), ("on", True)]:
+            cache.clear()
+            rate, queries = measure(url, args.requests, enabled)
+            print(f"{view_name:<22} {name:<11} {rate:>9.0f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    main()
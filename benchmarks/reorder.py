@@ -0,0 +1,78 @@
+"""
+Reorder benchmark: set-based rebalance vs loading rows and bulk_update.
+
+Runs against the database from .env / environment, data is rolled back:
+    python benchmarks/reorder.py --subblocks 100 1000 5000
+"""
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "src"))
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "app.settings")
+
+import django  # noqa: E402
+
+django.setup()
+
+from django.db import connection, transaction  # noqa: E402
+from django.test.utils import CaptureQueriesContext  # noqa: E402
+from mixer.backend.django import mixer  # noqa: E402
+
+from main.models import ORDER_GAP, SubBlock  # noqa: E402
+
+
+def bulk_update_rebalance(block) -> None:
+    """Previous approach: rows loaded into Python, two bulk_update (CASE per row)"""
+    siblings = list(
+        SubBlock.objects.only("order").filter(block=block).order_by("order")
+    )
+    offset = max(siblings[-1].order, len(siblings) * ORDER_GAP) + 1
+    for index, sibling in enumerate(siblings):
+        sibling.order = offset + index
+    SubBlock.objects.bulk_update(siblings, ["order"])
+    for index, sibling in enumerate(siblings, 1):
+        sibling.order = index * ORDER_GAP
+    SubBlock.objects.bulk_update(siblings, ["order"])
+
+
+def set_based_rebalance(block) -> None:
+    SubBlock.objects.rebalance({"block": block})
+
+
+def measure(rebalance, count: int) -> tuple[float, int]:
+    with transaction.atomic():
+        block = mixer.blend("main.Block", order=1)
+        SubBlock.objects.bulk_create(
+            SubBlock(block=block, title=str(i), content="", order=i + 1)
+            for i in range(count)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            rebalance(block)
+            elapsed = time.perf_counter() - started
+        transaction.set_rollback(True)
+    return elapsed, len(queries)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--subblocks", type=int, nargs="+", default=[100, 1000, 5000])
+    args = parser.parse_args()
+
+    print(f"{connection.vendor}")
+    print(f"{'subblocks':>10} {'approach':<12} {'ms':>9} {'queries':>8}")
+    for count in args.subblocks:
+        for name, rebalance in [
+            ("bulk_update", bulk_update_rebalance),
+            ("set-based", set_based_rebalance),
+        ]:
+            elapsed, queries = measure(rebalance, count)
+            print(f"{count:>10} {name:<12} {elapsed * 1000:>9.1f} {queries:>8}")
+
+
+if __name__ == "__main__":
+    main()
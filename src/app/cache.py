@@ -0,0 +1,317 @@
+import asyncio
+import math
+import random
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+TAG_KEY_PREFIX = "cache-tag:"
+
+
+class LocalTTLCache:
+    """
+    Small in-process LRU cache with short TTL (per worker).
+    Used in front of Redis for values read on every request.
+    """
+
+    def __init__(self, timeout: float, max_size: int = 1024):
+        self.timeout = timeout
+        self.max_size = max_size
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return default
+
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return default
+
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = (time.monotonic() + self.timeout, value)
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def delete(self, key) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+def get_redis(alias: str = "default"):
+    """Raw Redis client of django-redis cache, None for other cache backends"""
+    try:
+        from django_redis import get_redis_connection
+
+        return get_redis_connection(alias)
+    except (ImportError, NotImplementedError):
+        return None
+
+
+# Tagged values: stored with versions of their tags, a value is valid while
+# none of its tags was invalidated. Invalidation increments tag version
+# (generation counter), entries with old versions are never read again, so
+# they can live long (TAGGED_CACHE_TIMEOUT) and expire on their own.
+
+
+def _tag_keys(tags) -> dict[str, str]:
+    return {tag: f"{TAG_KEY_PREFIX}{tag}" for tag in tags}
+
+
+def _new_tag_version() -> int:
+    # New (or evicted) tag starts from time, so old entries stay stale
+    return time.time_ns()
+
+
+def _current_entry(entry, versions: dict):
+    if entry is None or entry["tags"] != versions:
+        return None
+    return entry
+
+
+def _timeout(timeout):
+    return settings.TAGGED_CACHE_TIMEOUT if timeout is None else timeout
+
+
+def _missing_tags(tag_keys: dict, versions: dict) -> dict:
+    """New versions of tags which aren't stored, by tag key"""
+    return {
+        tag_keys[tag]: _new_tag_version()
+        for tag, version in versions.items()
+        if version is None
+    }
+
+
+# One missing tag is created with add(). Several ones are stored in one call
+# (set_many, a concurrent reader may overwrite them) and read back, so readers
+# agree on the last versions. Values are computed after that: invalidations
+# made before are seen, the ones made after increment the stored versions.
+
+
+def _set_created(tag_keys: dict, versions: dict, missing: dict, stored) -> None:
+    for tag, tag_key in tag_keys.items():
+        if tag_key in missing:
+            versions[tag] = stored.get(tag_key, missing[tag_key])
+
+
+def _create_tags(tag_keys: dict, versions: dict) -> None:
+    missing = _missing_tags(tag_keys, versions)
+    if not missing:
+        return
+    if len(missing) == 1:
+        [(tag_key, version)] = missing.items()
+        if not cache.add(tag_key, version, None):
+            missing[tag_key] = cache.get(tag_key, version)
+        stored = missing
+    else:
+        cache.set_many(missing, None)
+        stored = cache.get_many(list(missing))
+    _set_created(tag_keys, versions, missing, stored)
+
+
+async def _acreate_tags(tag_keys: dict, versions: dict) -> None:
+    missing = _missing_tags(tag_keys, versions)
+    if not missing:
+        return
+    if len(missing) == 1:
+        [(tag_key, version)] = missing.items()
+        if not await cache.aadd(tag_key, version, None):
+            missing[tag_key] = await cache.aget(tag_key, version)
+        stored = missing
+    else:
+        await cache.aset_many(missing, None)
+        stored = await cache.aget_many(list(missing))
+    _set_created(tag_keys, versions, missing, stored)
+
+
+def _read_tagged(key: str, tags) -> tuple:
+    """Entry with current tag versions (or None) and the versions"""
+    tag_keys = _tag_keys(tags)
+    found = cache.get_many([key, *tag_keys.values()])
+    versions = {tag: found.get(tag_key) for tag, tag_key in tag_keys.items()}
+    _create_tags(tag_keys, versions)
+    return _current_entry(found.get(key), versions), versions
+
+
+async def _aread_tagged(key: str, tags) -> tuple:
+    tag_keys = _tag_keys(tags)
+    found = await cache.aget_many([key, *tag_keys.values()])
+    versions = {tag: found.get(tag_key) for tag, tag_key in tag_keys.items()}
+    await _acreate_tags(tag_keys, versions)
+    return _current_entry(found.get(key), versions), versions
+
+
+def get_tagged(key: str, tags, default=None) -> tuple:
+    """
+    Value stored with set_tagged (default if missing or stale) and current
+    versions of tags, to store a new value with. One cache call.
+    """
+    entry, versions = _read_tagged(key, tags)
+    return (default if entry is None else entry["value"]), versions
+
+
+def set_tagged(key: str, value, versions: dict, timeout=None) -> None:
+    """Store value with tag versions read before it was computed"""
+    cache.set(key, {"value": value, "tags": versions}, _timeout(timeout))
+
+
+async def aget_tagged(key: str, tags, default=None) -> tuple:
+    """Async version of get_tagged"""
+    entry, versions = await _aread_tagged(key, tags)
+    return (default if entry is None else entry["value"]), versions
+
+
+async def aset_tagged(key: str, value, versions: dict, timeout=None) -> None:
+    """Async version of set_tagged"""
+    await cache.aset(key, {"value": value, "tags": versions}, _timeout(timeout))
+
+
+# Hot keys: get_or_set_tagged recomputes a value in one worker at a time
+# (lock is cache.add, SET NX in Redis). Values are kept STALE_TIMEOUT after
+# expiry and served while it is recomputed, and are recomputed a bit before
+# expiry with probability growing near it (XFetch, longer computations
+# start earlier). Values of invalidated tags are never served, readers wait
+# LOCK_WAIT for the new one.
+
+LOCK_KEY_PREFIX = "cache-lock:"
+# Seconds
+LOCK_TIMEOUT = 10
+LOCK_WAIT = 0.5
+LOCK_POLL_INTERVAL = 0.05
+STALE_TIMEOUT = 60
+EARLY_REFRESH_BETA = 1.0
+
+
+def _lock_key(key: str) -> str:
+    return f"{LOCK_KEY_PREFIX}{key}"
+
+
+def _should_refresh(entry: dict) -> bool:
+    expires = entry.get("expires")
+    if expires is None:
+        return False
+    jitter = -math.log(1 - random.random())  # noqa: S311
+    early = entry["delta"] * EARLY_REFRESH_BETA * jitter
+    return time.time() + early >= expires
+
+
+def _computed_entry(value, versions: dict, timeout, started: float) -> dict:
+    return {
+        "value": value,
+        "tags": versions,
+        "expires": time.time() + timeout,
+        "delta": time.monotonic() - started,
+    }
+
+
+def _compute_tagged(key: str, versions: dict, compute, family: str, timeout):
+    from app import metrics
+
+    started = time.monotonic()
+    value = compute()
+    timeout = _timeout(timeout)
+    entry = _computed_entry(value, versions, timeout, started)
+    cache.set(key, entry, timeout + STALE_TIMEOUT)
+    metrics.inc("cache_computations_total", family=family)
+    return value
+
+
+async def _acompute_tagged(key: str, versions: dict, compute, family: str, timeout):
+    from app import metrics
+
+    started = time.monotonic()
+    value = await compute()
+    timeout = _timeout(timeout)
+    entry = _computed_entry(value, versions, timeout, started)
+    await cache.aset(key, entry, timeout + STALE_TIMEOUT)
+    metrics.inc("cache_computations_total", family=family)
+    return value
+
+
+def get_or_set_tagged(key: str, tags, compute, family: str, timeout=None):
+    """
+    Cached value of compute() (None is cached too), hits counted per family.
+    Computed once at a time for all workers.
+    """
+    from app import metrics
+
+    entry, versions = _read_tagged(key, tags)
+    metrics.cache_result(family, entry is not None)
+    if entry is not None and not _should_refresh(entry):
+        return entry["value"]
+
+    lock_key = _lock_key(key)
+    if cache.add(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return _compute_tagged(key, versions, compute, family, timeout)
+        finally:
+            cache.delete(lock_key)
+    if entry is not None:
+        # Stale (or expiring) while other worker recomputes it
+        return entry["value"]
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        entry, versions = _read_tagged(key, tags)
+        if entry is not None:
+            return entry["value"]
+    # Computation is slow or its worker failed
+    return _compute_tagged(key, versions, compute, family, timeout)
+
+
+async def aget_or_set_tagged(key: str, tags, compute, family: str, timeout=None):
+    """Async version of get_or_set_tagged, compute is a coroutine function"""
+    from app import metrics
+
+    entry, versions = await _aread_tagged(key, tags)
+    metrics.cache_result(family, entry is not None)
+    if entry is not None and not _should_refresh(entry):
+        return entry["value"]
+
+    lock_key = _lock_key(key)
+    if await cache.aadd(lock_key, 1, LOCK_TIMEOUT):
+        try:
+            return await _acompute_tagged(key, versions, compute, family, timeout)
+        finally:
+            await cache.adelete(lock_key)
+    if entry is not None:
+        return entry["value"]
+
+    deadline = time.monotonic() + LOCK_WAIT
+    while time.monotonic() < deadline:
+        await asyncio.sleep(LOCK_POLL_INTERVAL)
+        entry, versions = await _aread_tagged(key, tags)
+        if entry is not None:
+            return entry["value"]
+    return await _acompute_tagged(key, versions, compute, family, timeout)
+
+
+def invalidate_tags(*tags: str) -> None:
+    for tag_key in _tag_keys(tags).values():
+        try:
+            cache.incr(tag_key)
+        except ValueError:
+            # Tag isn't stored, so no entry has its current version
+            pass
+
+
+def invalidate_tags_on_commit(*tags: str) -> None:
+    """After commit, so readers can't cache data of the old transaction"""
+    transaction.on_commit(lambda: invalidate_tags(*tags))
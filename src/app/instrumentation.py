@@ -0,0 +1,278 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from dataclasses import dataclass
+from functools import wraps
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.template.backends.django import Template
+
+# Upper bounds of histogram buckets, ms
+DEFAULT_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float("inf"))
+QUERIES_BUCKETS = (1, 2, 5, 10, 20, 50, 100, float("inf"))
+
+_MISSING = object()
+
+
+@dataclass
+class RequestStats:
+    db_queries: int = 0
+    db_time: float = 0.0
+    cache_calls: int = 0
+    cache_hits: int = 0
+    cache_misses: int = 0
+    cache_time: float = 0.0
+    template_time: float = 0.0
+    total_time: float = 0.0
+    # Backends may call own get() from get_many(), count outer call only
+    in_cache_call: bool = False
+
+    def server_timing(self) -> str:
+        """Value for Server-Timing header, durations in ms"""
+        return ", ".join(
+            [
+                f'db;dur={self.db_time * 1000:.1f};desc="{self.db_queries} queries"',
+                f"cache;dur={self.cache_time * 1000:.1f};"
+                f'desc="{self.cache_hits} hits, {self.cache_misses} misses"',
+                f"tpl;dur={self.template_time * 1000:.1f}",
+                f"total;dur={self.total_time * 1000:.1f}",
+            ]
+        )
+
+
+_current_stats: ContextVar[Optional[RequestStats]] = ContextVar(
+    "request_stats", default=None
+)
+
+
+def start_request_stats() -> RequestStats:
+    stats = RequestStats()
+    _current_stats.set(stats)
+    return stats
+
+
+def finish_request_stats() -> None:
+    _current_stats.set(None)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class ViewStats:
+    """Histograms of one URL name"""
+
+    def __init__(self):
+        self.total_ms = Histogram()
+        self.db_ms = Histogram()
+        self.cache_ms = Histogram()
+        self.template_ms = Histogram()
+        self.db_queries = Histogram(QUERIES_BUCKETS)
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def observe(self, stats: RequestStats) -> None:
+        self.total_ms.observe(stats.total_time * 1000)
+        self.db_ms.observe(stats.db_time * 1000)
+        self.cache_ms.observe(stats.cache_time * 1000)
+        self.template_ms.observe(stats.template_time * 1000)
+        self.db_queries.observe(stats.db_queries)
+        self.cache_hits += stats.cache_hits
+        self.cache_misses += stats.cache_misses
+
+
+_views_lock = threading.Lock()
+_views: dict[str, ViewStats] = {}
+
+
+def record_view_stats(view_name: str, stats: RequestStats) -> None:
+    with _views_lock:
+        view_stats = _views.get(view_name)
+        if view_stats is None:
+            view_stats = _views[view_name] = ViewStats()
+        view_stats.observe(stats)
+
+
+def get_views_stats() -> dict[str, ViewStats]:
+    with _views_lock:
+        return dict(_views)
+
+
+def reset_views_stats() -> None:
+    with _views_lock:
+        _views.clear()
+
+
+# Hooks. Every hook is a plain call when no request is sampled. They are
+# installed by install_hooks only, when PerfMiddleware is enabled.
+
+# Wrappers installed into cache backends and templates
+_instrumented: set[Callable] = set()
+
+
+def _mark_instrumented(wrapper: Callable) -> Callable:
+    _instrumented.add(wrapper)
+    return wrapper
+
+
+def _db_wrapper(execute, sql, params, many, context):
+    stats = _current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_queries += 1
+        stats.db_time += time.perf_counter() - started
+
+
+def _add_db_wrapper(connection, **kwargs):
+    if _db_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_db_wrapper)
+
+
+def _timed_cache_method(method):
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None or stats.in_cache_call:
+            return method(self, *args, **kwargs)
+
+        started = time.perf_counter()
+        stats.in_cache_call = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            stats.in_cache_call = False
+            stats.cache_calls += 1
+            stats.cache_time += time.perf_counter() - started
+
+    return _mark_instrumented(wrapper)
+
+
+def _timed_cache_get(method):
+    @wraps(method)
+    def wrapper(self, key, default=None, version=None, **kwargs):
+        stats = _current_stats.get()
+        if stats is None or stats.in_cache_call:
+            return method(self, key, default, version, **kwargs)
+
+        started = time.perf_counter()
+        stats.in_cache_call = True
+        try:
+            value = method(self, key, _MISSING, version, **kwargs)
+        finally:
+            stats.in_cache_call = False
+        stats.cache_calls += 1
+        stats.cache_time += time.perf_counter() - started
+        if value is _MISSING:
+            stats.cache_misses += 1
+            return default
+        stats.cache_hits += 1
+        return value
+
+    return _mark_instrumented(wrapper)
+
+
+def _timed_cache_get_many(method):
+    @wraps(method)
+    def wrapper(self, keys, version=None, **kwargs):
+        stats = _current_stats.get()
+        if stats is None or stats.in_cache_call:
+            return method(self, keys, version, **kwargs)
+
+        keys = list(keys)
+        started = time.perf_counter()
+        stats.in_cache_call = True
+        try:
+            values = method(self, keys, version, **kwargs)
+        finally:
+            stats.in_cache_call = False
+        stats.cache_calls += 1
+        stats.cache_time += time.perf_counter() - started
+        stats.cache_hits += len(values)
+        stats.cache_misses += len(keys) - len(values)
+        return values
+
+    return _mark_instrumented(wrapper)
+
+
+CACHE_METHODS = (
+    "set",
+    "add",
+    "delete",
+    "set_many",
+    "delete_many",
+    "incr",
+    "touch",
+)
+
+
+def _instrument_cache_backend(backend_class) -> None:
+    if backend_class.get in _instrumented:
+        return
+    backend_class.get = _timed_cache_get(backend_class.get)
+    backend_class.get_many = _timed_cache_get_many(backend_class.get_many)
+    for name in CACHE_METHODS:
+        setattr(backend_class, name, _timed_cache_method(getattr(backend_class, name)))
+
+
+def _instrument_templates() -> None:
+    render = Template.render
+    if render in _instrumented:
+        return
+
+    @wraps(render)
+    def timed_render(self, *args, **kwargs):
+        stats = _current_stats.get()
+        if stats is None:
+            return render(self, *args, **kwargs)
+
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            stats.template_time += time.perf_counter() - started
+
+    Template.render = _mark_instrumented(timed_render)
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def install_hooks() -> None:
+    """
+    Hook db, cache and template rendering once per process.
+    Cache backend classes and Template.render are patched for all instances.
+    """
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+
+        connection_created.connect(_add_db_wrapper)
+        for connection in connections.all(initialized_only=True):
+            _add_db_wrapper(connection)
+
+        for alias in settings.CACHES:
+            _instrument_cache_backend(type(caches[alias]))
+
+        _instrument_templates()
+        _installed = True
@@ -0,0 +1,268 @@
+"""
+Prometheus-style metrics shared by all uvicorn workers.
+
+Workers add to in-process deltas (a dict increment per sample), and every
+METRICS_FLUSH_SECONDS push them to one Redis hash in a single pipeline.
+/metrics renders the hash, so it shows totals of every worker.
+Without django-redis cache (tests, local) totals are kept in-process.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.db import connections
+from redis.exceptions import RedisError
+
+from app.cache import get_redis
+
+logger = logging.getLogger(__name__)
+
+COUNTERS_KEY = "cogniwise:metrics:counters"
+GAUGES_KEY_PREFIX = "cogniwise:metrics:gauges:"
+GAUGES_TIMEOUT = 60
+
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+# Seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRIC_TYPES = {
+    "http_requests_total": "counter",
+    "http_request_duration_seconds": "histogram",
+    "cache_requests_total": "counter",
+    "cache_computations_total": "counter",
+    "cachalot_invalidations_total": "counter",
+    "cachalot_query_keys": "gauge",
+    "cachalot_query_bytes": "gauge",
+    "yookassa_webhook_duration_seconds": "histogram",
+    "yookassa_api_duration_seconds": "histogram",
+    "db_pool_size": "gauge",
+    "db_pool_available": "gauge",
+    "db_pool_requests_waiting": "gauge",
+}
+
+_lock = threading.Lock()
+_deltas: defaultdict[str, float] = defaultdict(float)
+_local_totals: defaultdict[str, float] = defaultdict(float)
+_last_flush = time.monotonic()
+
+
+def _label_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(value)
+
+
+def _sample_name(name: str, labels: dict) -> str:
+    if not labels:
+        return name
+    labels_str = ",".join(
+        f'{key}="{_label_value(value)}"' for key, value in sorted(labels.items())
+    )
+    return f"{name}{{{labels_str}}}"
+
+
+def inc(name: str, value: float = 1, **labels) -> None:
+    sample = _sample_name(name, labels)
+    with _lock:
+        _deltas[sample] += value
+
+
+@lru_cache(maxsize=4096)
+def _histogram_samples(name: str, labels: tuple, buckets: tuple):
+    """Sample names of one histogram, formatted once"""
+    labels_dict = dict(labels)
+    bucket_samples = tuple(
+        (bucket, _sample_name(f"{name}_bucket", {**labels_dict, "le": bucket}))
+        for bucket in (*buckets, float("inf"))
+    )
+    count = _sample_name(f"{name}_count", labels_dict)
+    total = _sample_name(f"{name}_sum", labels_dict)
+    return bucket_samples, count, total
+
+
+def observe(name: str, value: float, buckets=LATENCY_BUCKETS, **labels) -> None:
+    """Histogram sample, cumulative buckets as in Prometheus"""
+    bucket_samples, count, total = _histogram_samples(
+        name, tuple(sorted(labels.items())), buckets
+    )
+    with _lock:
+        # Empty buckets are written too, so every bucket is exported
+        for bucket, sample in bucket_samples:
+            _deltas[sample] += 1 if value <= bucket else 0
+        _deltas[count] += 1
+        _deltas[total] += value
+
+
+@contextmanager
+def timed(name: str, **labels):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - started, **labels)
+
+
+def cache_result(family: str, hit: bool, level: str = "redis") -> None:
+    inc(
+        "cache_requests_total",
+        family=family,
+        level=level,
+        result="hit" if hit else "miss",
+    )
+
+
+def _pool_gauges() -> dict[str, float]:
+    gauges = {}
+    for connection in connections.all(initialized_only=True):
+        pools = getattr(type(connection), "_connection_pools", {})
+        pool = pools.get(connection.alias)
+        if pool is None:
+            continue
+        stats = pool.get_stats()
+        labels = {"alias": connection.alias, "worker": WORKER_ID}
+        gauges[_sample_name("db_pool_size", labels)] = stats.get("pool_size", 0)
+        gauges[_sample_name("db_pool_available", labels)] = stats.get(
+            "pool_available", 0
+        )
+        gauges[_sample_name("db_pool_requests_waiting", labels)] = stats.get(
+            "requests_waiting", 0
+        )
+    return gauges
+
+
+def flush() -> None:
+    """Push collected deltas (and this worker gauges) to shared storage"""
+    global _last_flush
+    with _lock:
+        deltas = dict(_deltas)
+        _deltas.clear()
+        _last_flush = time.monotonic()
+    gauges = _pool_gauges()
+
+    redis = get_redis()
+    if redis is None:
+        with _lock:
+            for sample, value in deltas.items():
+                _local_totals[sample] += value
+            _local_totals.update(gauges)
+        return
+
+    # MULTI: deltas are applied all or none, so failed ones can be retried
+    pipe = redis.pipeline()
+    for sample, value in deltas.items():
+        pipe.hincrbyfloat(COUNTERS_KEY, sample, value)
+    if gauges:
+        gauges_key = GAUGES_KEY_PREFIX + WORKER_ID
+        pipe.hset(gauges_key, mapping=gauges)
+        pipe.expire(gauges_key, GAUGES_TIMEOUT)
+    try:
+        pipe.execute()
+    except RedisError:
+        # Metrics never fail a request, deltas go with the next flush
+        logger.exception("Metrics flush failed")
+        with _lock:
+            for sample, value in deltas.items():
+                _deltas[sample] += value
+
+
+def publish_gauges(source: str, gauges: list[tuple], timeout: int) -> None:
+    """
+    Gauges computed outside of workers (e.g. by a command), replace previous
+    ones of source and are kept timeout seconds. gauges: (name, labels, value)
+    """
+    samples = {_sample_name(name, labels): value for name, labels, value in gauges}
+    redis = get_redis()
+    if redis is None:
+        with _lock:
+            _local_totals.update(samples)
+        return
+
+    gauges_key = GAUGES_KEY_PREFIX + source
+    pipe = redis.pipeline()
+    pipe.delete(gauges_key)
+    if samples:
+        pipe.hset(gauges_key, mapping=samples)
+        pipe.expire(gauges_key, timeout)
+    pipe.execute()
+
+
+def is_flush_due() -> bool:
+    return time.monotonic() - _last_flush >= settings.METRICS_FLUSH_SECONDS
+
+
+def maybe_flush() -> None:
+    if is_flush_due():
+        flush()
+
+
+def _collect_samples() -> dict[str, float]:
+    redis = get_redis()
+    if redis is None:
+        with _lock:
+            return dict(_local_totals)
+
+    samples = {}
+    for sample, value in redis.hgetall(COUNTERS_KEY).items():
+        samples[sample.decode()] = float(value)
+    for gauges_key in redis.scan_iter(match=GAUGES_KEY_PREFIX + "*"):
+        for sample, value in redis.hgetall(gauges_key).items():
+            samples[sample.decode()] = float(value)
+    return samples
+
+
+def _family(sample: str) -> str:
+    name = sample.split("{", 1)[0]
+    for suffix in ("_bucket", "_count", "_sum"):
+        base = name.removesuffix(suffix)
+        if base != name and METRIC_TYPES.get(base) == "histogram":
+            return base
+    return name
+
+
+def render() -> str:
+    """Metrics in Prometheus text exposition format"""
+    flush()
+
+    lines = []
+    current_family = None
+    for sample, value in sorted(_collect_samples().items()):
+        family = _family(sample)
+        if family != current_family:
+            lines.append(f"# TYPE {family} {METRIC_TYPES.get(family, 'untyped')}")
+            current_family = family
+        lines.append(f"{sample} {value}")
+    return "".join(f"{line}\n" for line in lines)
+
+
+def reset() -> None:
+    """Drop collected values of this process (local storage only)"""
+    with _lock:
+        _deltas.clear()
+        _local_totals.clear()
+
+
+def _on_cachalot_invalidation(sender, db_alias=None, **kwargs):
+    inc("cachalot_invalidations_total", table=sender, db=db_alias)
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def install_receivers() -> None:
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        from cachalot.signals import post_invalidation
+
+        post_invalidation.connect(_on_cachalot_invalidation)
+        _installed = True
@@ -0,0 +1,269 @@
+import random
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+
+from app import metrics, pagecache, querycheck
+from app.cache import aget_tagged, aset_tagged, get_tagged, set_tagged
+from app.instrumentation import (
+    finish_request_stats,
+    install_hooks,
+    record_view_stats,
+    start_request_stats,
+)
+from app.routers import (
+    is_pinned_to_primary,
+    replica_context,
+    was_replica_data_written,
+)
+
+REPLICA_PIN_COOKIE = "db_primary_pin"
+
+
+class HybridMiddleware:
+    """
+    Sync and async middleware: async under ASGI, so async views aren't run
+    through threads. Subclasses implement process and aprocess.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.aprocess(request)
+        return self.process(request)
+
+    def process(self, request):
+        raise NotImplementedError
+
+    async def aprocess(self, request):
+        raise NotImplementedError
+
+
+def _view_name(request) -> str:
+    match = request.resolver_match
+    return match.view_name if match else "<unresolved>"
+
+
+class ReplicaPinMiddleware(HybridMiddleware):
+    """
+    Read-your-writes for the replica router.
+    When a request writes replicated data, the client gets a short-lived cookie,
+    and its following requests read from the primary until replica catches up.
+    """
+
+    @staticmethod
+    def _is_pinned(request) -> bool:
+        # Outer pin (use_primary) is kept
+        return REPLICA_PIN_COOKIE in request.COOKIES or is_pinned_to_primary()
+
+    @staticmethod
+    def _pin_if_written(response) -> None:
+        if was_replica_data_written():
+            response.set_cookie(
+                REPLICA_PIN_COOKIE,
+                "1",
+                max_age=settings.REPLICA_STICKY_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+
+    def process(self, request):
+        with replica_context(pinned=self._is_pinned(request)):
+            response = self.get_response(request)
+            self._pin_if_written(response)
+        return response
+
+    async def aprocess(self, request):
+        with replica_context(pinned=self._is_pinned(request)):
+            response = await self.get_response(request)
+            self._pin_if_written(response)
+        return response
+
+
+class PerformanceMiddleware(HybridMiddleware):
+    """
+    Per-request db, cache, template and total timings for sampled requests.
+    Timings are sent in Server-Timing header and aggregated per URL name.
+    With PERF_SAMPLE_RATE=0 middleware isn't used at all.
+    """
+
+    def __init__(self, get_response):
+        if settings.PERF_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = settings.PERF_SAMPLE_RATE
+        install_hooks()
+
+    def _is_sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate  # noqa: S311
+
+    @staticmethod
+    def _record(request, response, stats, started: float) -> None:
+        stats.total_time = time.perf_counter() - started
+        record_view_stats(_view_name(request), stats)
+        if settings.PERF_SERVER_TIMING:
+            response["Server-Timing"] = stats.server_timing()
+
+    def process(self, request):
+        if not self._is_sampled():
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        stats = start_request_stats()
+        try:
+            response = self.get_response(request)
+        finally:
+            finish_request_stats()
+        self._record(request, response, stats, started)
+        return response
+
+    async def aprocess(self, request):
+        if not self._is_sampled():
+            return await self.get_response(request)
+
+        started = time.perf_counter()
+        stats = start_request_stats()
+        try:
+            response = await self.get_response(request)
+        finally:
+            finish_request_stats()
+        self._record(request, response, stats, started)
+        return response
+
+
+class MetricsMiddleware(HybridMiddleware):
+    """Request latency per URL name for /metrics, always on (METRICS_ENABLED)"""
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        metrics.install_receivers()
+
+    @staticmethod
+    def _observe(request, response, started: float) -> None:
+        duration = time.perf_counter() - started
+        view_name = _view_name(request)
+        metrics.observe("http_request_duration_seconds", duration, view=view_name)
+        metrics.inc("http_requests_total", view=view_name, status=response.status_code)
+
+    def process(self, request):
+        started = time.perf_counter()
+        response = self.get_response(request)
+        self._observe(request, response, started)
+        metrics.maybe_flush()
+        return response
+
+    async def aprocess(self, request):
+        started = time.perf_counter()
+        response = await self.get_response(request)
+        self._observe(request, response, started)
+        # Redis client is sync, a thread only once per flush interval
+        if metrics.is_flush_due():
+            await sync_to_async(metrics.flush, thread_sensitive=False)()
+        return response
+
+
+class QueryDetectorMiddleware(HybridMiddleware):
+    """
+    N+1 and slow query detector for sampled requests (app/querycheck.py).
+    With QUERY_DETECTOR_SAMPLE_RATE=0 middleware isn't used at all.
+    """
+
+    def __init__(self, get_response):
+        if settings.QUERY_DETECTOR_SAMPLE_RATE <= 0:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+        self.sample_rate = settings.QUERY_DETECTOR_SAMPLE_RATE
+        querycheck.install_hooks()
+
+    def _is_sampled(self) -> bool:
+        return self.sample_rate >= 1 or random.random() < self.sample_rate  # noqa: S311
+
+    def process(self, request):
+        if not self._is_sampled():
+            return self.get_response(request)
+
+        with querycheck.track_queries() as tracker:
+            response = self.get_response(request)
+        querycheck.report(tracker.problems(_view_name(request)))
+        return response
+
+    async def aprocess(self, request):
+        if not self._is_sampled():
+            return await self.get_response(request)
+
+        with querycheck.track_queries() as tracker:
+            response = await self.get_response(request)
+        querycheck.report(tracker.problems(_view_name(request)))
+        return response
+
+
+class PageCacheMiddleware(HybridMiddleware):
+    """
+    Full-page cache for anonymous visitors (app/pagecache.py), served before
+    session, CSRF and auth middleware. With PAGE_CACHE_ENABLED=False
+    middleware isn't used at all.
+    """
+
+    def __init__(self, get_response):
+        if not settings.PAGE_CACHE_ENABLED:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    @staticmethod
+    def _hit(request, match, page):
+        request.resolver_match = match
+        response = pagecache.load_page(page)
+        response["X-Page-Cache"] = "hit"
+        return response
+
+    @staticmethod
+    def _timeout(options) -> int:
+        return options["timeout"] or settings.PAGE_CACHE_TIMEOUT
+
+    def process(self, request):
+        match, options = pagecache.resolve_cached_view(request)
+        if options is None:
+            return self.get_response(request)
+
+        key = pagecache.page_cache_key(request)
+        page, versions = get_tagged(key, options["tags"])
+        metrics.cache_result("page", page is not None)
+        if page is not None:
+            return self._hit(request, match, page)
+
+        response = self.get_response(request)
+        page = pagecache.dump_page(request, response)
+        if page is not None:
+            set_tagged(key, page, versions, self._timeout(options))
+            response["X-Page-Cache"] = "miss"
+        return response
+
+    async def aprocess(self, request):
+        match, options = pagecache.resolve_cached_view(request)
+        if options is None:
+            return await self.get_response(request)
+
+        key = pagecache.page_cache_key(request)
+        page, versions = await aget_tagged(key, options["tags"])
+        metrics.cache_result("page", page is not None)
+        if page is not None:
+            return self._hit(request, match, page)
+
+        response = await self.get_response(request)
+        page = pagecache.dump_page(request, response)
+        if page is not None:
+            await aset_tagged(key, page, versions, self._timeout(options))
+            response["X-Page-Cache"] = "miss"
+        return response
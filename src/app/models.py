@@ -1,6 +1,58 @@
 from behaviors.behaviors import Timestamped
+from django.db import models
 
 
 class TimeStampedModel(Timestamped):
     class Meta:
         abstract = True
+
+
+class ProfileManagerMixin(models.Manager):
+    """
+    Manager of model with one-to-one profile created with every row.
+    profile_field is name of reverse relation ("course_profile", "profile").
+    Unsaved profile set to the relation is saved instead of default one.
+    """
+
+    profile_field: str
+
+    def _profile_relation(self):
+        return self.model._meta.get_field(self.profile_field)
+
+    def _build_profile(self, obj):
+        relation = self._profile_relation()
+        # Reading the relation of unsaved row caches None
+        profile = relation.get_cached_value(obj, default=None)
+        if profile is not None:
+            setattr(profile, relation.field.name, obj)
+            return profile
+        return relation.related_model(**{relation.field.name: obj})
+
+    def create_profile(self, obj, using=None):
+        """Profile of created row, without checking it exists"""
+        self._build_profile(obj).save(using=using)
+
+    def bulk_create_with_profiles(self, objs, batch_size=None) -> list:
+        """Rows and their profiles in two INSERT statements (per batch)"""
+        objs = self.bulk_create(objs, batch_size=batch_size)
+        relation = self._profile_relation()
+        relation.related_model.objects.bulk_create(
+            [self._build_profile(obj) for obj in objs], batch_size=batch_size
+        )
+        return objs
+
+    def create_missing_profiles(self, batch_size=1000) -> int:
+        """Create default profiles of rows without them, return count"""
+        relation = self._profile_relation()
+        missing = list(
+            self.filter(**{f"{self.profile_field}__isnull": True}).values_list(
+                "pk", flat=True
+            )
+        )
+        # Conflicts: profile created after the select
+        relation.related_model.objects.bulk_create(
+            [relation.related_model(**{relation.field.attname: pk}) for pk in missing],
+            batch_size=batch_size,
+            ignore_conflicts=True,
+        )
+        return len(missing)
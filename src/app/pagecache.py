@@ -0,0 +1,84 @@
+"""
+Full-page cache for anonymous visitors of views marked with cache_anonymous_page.
+
+PageCacheMiddleware serves stored pages before session, CSRF, auth and
+messages middleware run. Requests with a session cookie (logged in users,
+pending messages) always go to the view, responses which set cookies
+(CSRF token of a form, new session) are not stored. Pages are stored with
+tags (app.cache) and dropped when one of the tags is invalidated.
+"""
+
+import hashlib
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.urls import Resolver404, resolve
+from django.utils import translation
+
+PAGE_KEY_PREFIX = "page:"
+# Set per response
+SKIPPED_HEADERS = {"server-timing", "set-cookie"}
+
+
+def cache_anonymous_page(*tags: str, timeout=None):
+    """Decorator. Mark view to be cached for anonymous visitors, with tags"""
+
+    def decorator(view_func):
+        view_func.page_cache = {"tags": tags, "timeout": timeout}
+        return view_func
+
+    return decorator
+
+
+def page_cache_key(request) -> str:
+    query = urlencode(sorted(request.GET.lists()), doseq=True)
+    url = f"{request.get_host()}{request.path}?{query}"
+    digest = hashlib.sha1(url.encode()).hexdigest()  # noqa: S324
+    return f"{PAGE_KEY_PREFIX}{translation.get_language()}:{digest}"
+
+
+def _is_anonymous(request) -> bool:
+    return settings.SESSION_COOKIE_NAME not in request.COOKIES
+
+
+def _is_storable(request, response) -> bool:
+    return (
+        response.status_code == 200
+        and not response.streaming
+        and not response.cookies
+        and not request.META.get("CSRF_COOKIE_NEEDS_UPDATE")
+    )
+
+
+def resolve_cached_view(request):
+    """URL match and cache options of anonymous request to a cached view"""
+    if request.method not in ("GET", "HEAD") or not _is_anonymous(request):
+        return None, None
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None, None
+    return match, getattr(match.func, "page_cache", None)
+
+
+def load_page(page: dict) -> HttpResponse:
+    response = HttpResponse(page["content"], status=page["status"])
+    for header, value in page["headers"]:
+        response[header] = value
+    return response
+
+
+def dump_page(request, response):
+    """Stored form of response, None if it must not be stored"""
+    if request.method != "GET" or not _is_storable(request, response):
+        return None
+    return {
+        "status": response.status_code,
+        "content": response.content,
+        "headers": [
+            (header, value)
+            for header, value in response.items()
+            if header.lower() not in SKIPPED_HEADERS
+        ],
+    }
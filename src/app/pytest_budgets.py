@@ -0,0 +1,34 @@
+"""
+Pytest plugin: report SQL queries and cache calls of test requests.
+
+`pytest --budgets-report` shows the largest counts per URL name next to
+budgets of app/tests/budgets.py, budgets aren't checked in this run.
+"""
+
+from app.tests import budgets
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--budgets-report",
+        action="store_true",
+        help="report queries and cache calls per URL name instead of checking budgets",
+    )
+
+
+def pytest_configure(config):
+    budgets.checked = not config.getoption("--budgets-report")
+
+
+def pytest_terminal_summary(terminalreporter, config):
+    if not config.getoption("--budgets-report"):
+        return
+    terminalreporter.section("request budgets")
+    terminalreporter.write_line("URL name: queries/budget, cache calls/budget")
+    for view_name, used in sorted(budgets.measured.items()):
+        budget = budgets.REQUEST_BUDGETS.get(view_name)
+        limits = (budget.queries, budget.cache_calls) if budget else ("-", "-")
+        terminalreporter.write_line(
+            f"{view_name}: {used.queries}/{limits[0]}, "
+            f"{used.cache_calls}/{limits[1]}"
+        )
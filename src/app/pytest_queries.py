@@ -0,0 +1,84 @@
+"""
+Pytest plugin: fail tests whose requests run new N+1 queries.
+
+Every test client request goes through QueryDetectorMiddleware. Known
+problems are listed in n_plus_one_baseline.txt, run
+`pytest --update-n-plus-one-baseline` to add found ones instead of failing.
+Single test can be excluded with @pytest.mark.allow_n_plus_one.
+"""
+
+from pathlib import Path
+
+import pytest
+
+from app.querycheck import add_listener, remove_listener
+
+BASELINE_PATH = Path(__file__).resolve().parent.parent / "n_plus_one_baseline.txt"
+
+# Repeats in tests are counted on few objects, so threshold is lower
+TEST_REPEAT_THRESHOLD = 3
+
+
+def _read_baseline() -> set[str]:
+    if not BASELINE_PATH.exists():
+        return set()
+    lines = BASELINE_PATH.read_text().splitlines()
+    return {line.strip() for line in lines if line.strip() and line[0] != "#"}
+
+
+def pytest_addoption(parser):
+    parser.addoption(
+        "--update-n-plus-one-baseline",
+        action="store_true",
+        help="add found N+1 queries to n_plus_one_baseline.txt",
+    )
+
+
+def pytest_configure(config):
+    config.addinivalue_line(
+        "markers", "allow_n_plus_one: don't fail test on N+1 queries"
+    )
+    config.n_plus_one_baseline = _read_baseline()
+    config.n_plus_one_found = set()
+
+
+def pytest_sessionfinish(session):
+    config = session.config
+    if not config.getoption("--update-n-plus-one-baseline"):
+        return
+    keys = sorted(config.n_plus_one_baseline | config.n_plus_one_found)
+    BASELINE_PATH.write_text(
+        "# Known N+1 queries: kind, view name, statement digest\n"
+        + "".join(f"{key}\n" for key in keys)
+    )
+
+
+@pytest.fixture(autouse=True)
+def _n_plus_one_detector(request, settings):
+    settings.QUERY_DETECTOR_SAMPLE_RATE = 1
+    settings.QUERY_DETECTOR_REPEAT_THRESHOLD = TEST_REPEAT_THRESHOLD
+
+    problems = []
+
+    def listener(problem):
+        if problem.kind == "n+1":
+            problems.append(problem)
+
+    add_listener(listener)
+    yield
+    remove_listener(listener)
+
+    config = request.config
+    if request.node.get_closest_marker("allow_n_plus_one"):
+        return
+    new_problems = [
+        problem for problem in problems if problem.key not in config.n_plus_one_baseline
+    ]
+    if config.getoption("--update-n-plus-one-baseline"):
+        config.n_plus_one_found.update(problem.key for problem in new_problems)
+    elif new_problems:
+        pytest.fail(
+            "New N+1 queries (fix them or see app/pytest_queries.py):\n"
+            + "\n".join(problem.message() for problem in new_problems),
+            pytrace=False,
+        )
@@ -0,0 +1,79 @@
+"""
+Cachalot (ORM query cache) helpers.
+
+Query keys are prefixed with the main table of the query, so Redis memory
+of cached queries can be measured per table (joined tables are counted
+under the main one).
+"""
+
+from collections import defaultdict
+
+from cachalot.api import invalidate
+from cachalot.utils import get_query_cache_key
+
+from app.cache import get_redis
+
+QUERY_KEY_PREFIX = "cachalot-query:"
+SCAN_BATCH_SIZE = 1000
+
+
+def query_cache_key(compiler) -> str:
+    """CACHALOT_QUERY_KEYGEN: default key with table of the query"""
+    table = compiler.query.get_meta().db_table
+    return f"{QUERY_KEY_PREFIX}{table}:{get_query_cache_key(compiler)}"
+
+
+def _table(key: bytes) -> str:
+    return key.decode().split(QUERY_KEY_PREFIX, 1)[1].rsplit(":", 1)[0]
+
+
+def table_memory(alias: str = "default") -> dict[str, dict[str, int]]:
+    """
+    {table: {"keys": ..., "bytes": ...}} of cached queries (Redis MEMORY
+    USAGE), empty without django-redis cache
+    """
+    redis = get_redis(alias)
+    if redis is None:
+        return {}
+
+    stats: defaultdict[str, dict[str, int]] = defaultdict(
+        lambda: {"keys": 0, "bytes": 0}
+    )
+    keys: list[bytes] = []
+
+    def measure():
+        pipe = redis.pipeline(transaction=False)
+        for key in keys:
+            pipe.memory_usage(key)
+        for key, size in zip(keys, pipe.execute()):
+            table = stats[_table(key)]
+            table["keys"] += 1
+            table["bytes"] += size or 0
+        keys.clear()
+
+    for key in redis.scan_iter(match=f"*{QUERY_KEY_PREFIX}*", count=SCAN_BATCH_SIZE):
+        keys.append(key)
+        if len(keys) >= SCAN_BATCH_SIZE:
+            measure()
+    measure()
+    return dict(stats)
+
+
+def clear_query_cache(alias: str = "default") -> None:
+    """
+    Delete cached queries only (not sessions, metrics or tagged values of
+    the same Redis), invalidate all tables without django-redis cache
+    """
+    redis = get_redis(alias)
+    if redis is None:
+        invalidate(cache_alias=alias)
+        return
+
+    keys: list[bytes] = []
+    for key in redis.scan_iter(match=f"*{QUERY_KEY_PREFIX}*", count=SCAN_BATCH_SIZE):
+        keys.append(key)
+        if len(keys) >= SCAN_BATCH_SIZE:
+            redis.delete(*keys)
+            keys.clear()
+    if keys:
+        redis.delete(*keys)
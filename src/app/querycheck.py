@@ -0,0 +1,208 @@
+"""
+Slow query and N+1 detector.
+
+A sampled request records a fingerprint of every SQL statement (literals
+and IN lists replaced), statements repeated QUERY_DETECTOR_REPEAT_THRESHOLD
+times (N+1) and statements slower than QUERY_DETECTOR_SLOW_MS are logged with
+the view name and the project part of the stack.
+"""
+
+import hashlib
+import logging
+import re
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+formatter = logging.Formatter(
+    fmt="[{asctime}] #{levelname:8} {filename}:" "{lineno} - {name} - {message}",
+    style="{",
+)
+handler = logging.StreamHandler()
+handler.setFormatter(formatter)
+
+logger = logging.getLogger(__name__)
+logger.addHandler(handler)
+
+STACK_LIMIT = 8
+
+_IN_LIST = re.compile(r"\bIN \((?:%s, )*%s\)", re.IGNORECASE)
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r"\b\d+(?:\.\d+)?\b")
+_SPACES = re.compile(r"\s+")
+
+
+def fingerprint(sql: str) -> str:
+    """SQL without literals, same for every N+1 iteration"""
+    sql = _IN_LIST.sub("IN (...)", sql)
+    sql = _STRING.sub("?", sql)
+    sql = _NUMBER.sub("?", sql)
+    sql = sql.replace("%s", "?")
+    return _SPACES.sub(" ", sql).strip()
+
+
+def _project_stack() -> list[str]:
+    """Last frames of project code (no site-packages, no this module)"""
+    base_dir = str(settings.BASE_DIR)
+    frames = [
+        frame
+        for frame in traceback.extract_stack()
+        if frame.filename.startswith(base_dir)
+        and "site-packages" not in frame.filename
+        and frame.filename != __file__
+    ]
+    return traceback.format_list(frames[-STACK_LIMIT:])
+
+
+@dataclass
+class QueryProblem:
+    kind: str  # "n+1" or "slow"
+    view_name: str
+    fingerprint: str
+    count: int
+    duration: float  # seconds, all statements together
+    stack: list[str] = field(default_factory=list)
+
+    @property
+    def key(self) -> str:
+        """Stable id for baselines: view name and fingerprint digest"""
+        digest = hashlib.sha1(self.fingerprint.encode(), usedforsecurity=False)
+        return f"{self.kind} {self.view_name} {digest.hexdigest()[:12]}"
+
+    def message(self) -> str:
+        return (
+            f"{self.kind} in {self.view_name}: {self.count} x "
+            f"{self.duration * 1000:.1f} ms total: {self.fingerprint}\n"
+            + "".join(self.stack)
+        )
+
+
+@dataclass
+class _Statement:
+    count: int = 0
+    duration: float = 0.0
+    stack: list[str] = field(default_factory=list)
+    slow: bool = False
+
+
+class QueryTracker:
+    def __init__(self, repeat_threshold: int, slow_ms: float):
+        self.repeat_threshold = repeat_threshold
+        self.slow_seconds = slow_ms / 1000
+        self.statements: dict[str, _Statement] = {}
+
+    def record(self, sql: str, duration: float) -> None:
+        key = fingerprint(sql)
+        statement = self.statements.get(key)
+        if statement is None:
+            statement = self.statements[key] = _Statement()
+        statement.count += 1
+        statement.duration += duration
+
+        # Stack is taken once per statement, only when it becomes a problem
+        if not statement.stack and (
+            statement.count == 2 or duration >= self.slow_seconds
+        ):
+            statement.stack = _project_stack()
+        if duration >= self.slow_seconds:
+            statement.slow = True
+
+    def problems(self, view_name: str) -> list[QueryProblem]:
+        problems = []
+        for key, statement in self.statements.items():
+            if statement.count >= self.repeat_threshold:
+                kind = "n+1"
+            elif statement.slow:
+                kind = "slow"
+            else:
+                continue
+            problems.append(
+                QueryProblem(
+                    kind,
+                    view_name,
+                    key,
+                    statement.count,
+                    statement.duration,
+                    statement.stack,
+                )
+            )
+        return problems
+
+
+_current_tracker: ContextVar[Optional[QueryTracker]] = ContextVar(
+    "query_tracker", default=None
+)
+
+
+def _tracking_wrapper(execute, sql, params, many, context):
+    tracker = _current_tracker.get()
+    if tracker is None:
+        return execute(sql, params, many, context)
+
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        tracker.record(sql, time.perf_counter() - started)
+
+
+def _add_tracking_wrapper(connection, **kwargs):
+    if _tracking_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_tracking_wrapper)
+
+
+_install_lock = threading.Lock()
+_installed = False
+
+
+def install_hooks() -> None:
+    global _installed
+    with _install_lock:
+        if _installed:
+            return
+        connection_created.connect(_add_tracking_wrapper)
+        for connection in connections.all(initialized_only=True):
+            _add_tracking_wrapper(connection)
+        _installed = True
+
+
+@contextmanager
+def track_queries(repeat_threshold=None, slow_ms=None):
+    """Record statements executed inside the block"""
+    install_hooks()
+    tracker = QueryTracker(
+        repeat_threshold or settings.QUERY_DETECTOR_REPEAT_THRESHOLD,
+        slow_ms or settings.QUERY_DETECTOR_SLOW_MS,
+    )
+    token = _current_tracker.set(tracker)
+    try:
+        yield tracker
+    finally:
+        _current_tracker.reset(token)
+
+
+# Called with every found problem (pytest plugin collects them)
+_listeners: list[Callable[[QueryProblem], None]] = []
+
+
+def add_listener(listener: Callable[[QueryProblem], None]) -> None:
+    _listeners.append(listener)
+
+
+def remove_listener(listener: Callable[[QueryProblem], None]) -> None:
+    _listeners.remove(listener)
+
+
+def report(problems: list[QueryProblem]) -> None:
+    for problem in problems:
+        logger.warning(problem.message())
+        for listener in list(_listeners):
+            listener(problem)
@@ -0,0 +1,76 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+DEFAULT_DB = "default"
+REPLICA_DB = "replica"
+
+# Apps whose reads may be served by the replica
+REPLICA_READ_APPS = {"main"}
+
+_pinned_to_primary: ContextVar[bool] = ContextVar("pinned_to_primary", default=False)
+_replica_written: ContextVar[bool] = ContextVar("replica_written", default=False)
+
+
+def pin_to_primary() -> None:
+    """Route all reads of the current request/context to the primary"""
+    _pinned_to_primary.set(True)
+
+
+def is_pinned_to_primary() -> bool:
+    return _pinned_to_primary.get()
+
+
+def was_replica_data_written() -> bool:
+    return _replica_written.get()
+
+
+@contextmanager
+def use_primary():
+    """Temporarily read everything from the primary"""
+    token = _pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        _pinned_to_primary.reset(token)
+
+
+@contextmanager
+def replica_context(pinned: bool = False):
+    """Fresh routing state, used once per request by the middleware"""
+    pinned_token = _pinned_to_primary.set(pinned)
+    written_token = _replica_written.set(False)
+    try:
+        yield
+    finally:
+        _replica_written.reset(written_token)
+        _pinned_to_primary.reset(pinned_token)
+
+
+class PrimaryReplicaRouter:
+    """
+    Sends reads of catalog/course models to the replica.
+    Everything else (orders, users, sessions) and every write stays on the primary.
+    After a write to a replicated model the context is pinned to the primary,
+    so the writer reads its own data.
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in REPLICA_READ_APPS and not is_pinned_to_primary():
+            return REPLICA_DB
+        return DEFAULT_DB
+
+    def db_for_write(self, model, **hints):
+        # select_for_update() and get_or_create() are also routed here
+        if model._meta.app_label in REPLICA_READ_APPS:
+            _replica_written.set(True)
+            pin_to_primary()
+        return DEFAULT_DB
+
+    def allow_relation(self, obj1, obj2, **hints):
+        db_set = {DEFAULT_DB, REPLICA_DB}
+        if obj1._state.db in db_set and obj2._state.db in db_set:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB
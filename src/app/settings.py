@@ -37,6 +37,10 @@ INSTALLED_APPS = [
 
 
 MIDDLEWARE = [
+    "app.middleware.MetricsMiddleware",
+    "app.middleware.PerformanceMiddleware",
+    "app.middleware.PageCacheMiddleware",
+    "app.middleware.QueryDetectorMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -46,6 +50,32 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Performance instrumentation (app/instrumentation.py)
+# Share of requests to measure, 0 - disabled, 1 - every request
+PERF_SAMPLE_RATE = env("PERF_SAMPLE_RATE", cast=float, default=0.0)
+PERF_SERVER_TIMING = env("PERF_SERVER_TIMING", cast=bool, default=True)
+
+# Prometheus metrics on /metrics/ (app/metrics.py), summed over workers in Redis
+METRICS_ENABLED = env("METRICS_ENABLED", cast=bool, default=True)
+METRICS_FLUSH_SECONDS = env("METRICS_FLUSH_SECONDS", cast=float, default=5)
+# Bearer token for /metrics/, empty - forbidden unless DEBUG
+METRICS_TOKEN = env("METRICS_TOKEN", cast=str, default="")
+
+# N+1 and slow query detector (app/querycheck.py), logs problems with stack
+# Share of requests to check, 0 - disabled
+QUERY_DETECTOR_SAMPLE_RATE = env("QUERY_DETECTOR_SAMPLE_RATE", cast=float, default=0.0)
+# Same statement executed this many times in one request is N+1
+QUERY_DETECTOR_REPEAT_THRESHOLD = env(
+    "QUERY_DETECTOR_REPEAT_THRESHOLD", cast=int, default=5
+)
+QUERY_DETECTOR_SLOW_MS = env("QUERY_DETECTOR_SLOW_MS", cast=float, default=100)
+
+# Full-page cache of anonymous visitors (app/pagecache.py), seconds
+PAGE_CACHE_ENABLED = env("PAGE_CACHE_ENABLED", cast=bool, default=True)
+PAGE_CACHE_TIMEOUT = env("PAGE_CACHE_TIMEOUT", cast=int, default=600)
+# Tagged service caches (app/cache.py), dropped by tag invalidation on writes
+TAGGED_CACHE_TIMEOUT = env("TAGGED_CACHE_TIMEOUT", cast=int, default=24 * 3600)
+
 ROOT_URLCONF = "app.urls"
 
 TEMPLATES = [
@@ -73,15 +103,63 @@ DATABASES = {
     "default": {
         **env.db_url("DATABASE_URL"),
         "ATOMIC_REQUESTS": True,
-        "OPTIONS": {
-            "pool": True,
-        },
     }
 }
+
+# Optional read replica, for catalog/course reading (see app/routers.py)
+DATABASE_REPLICA_URL = env("DATABASE_REPLICA_URL", cast=str, default="")
+# Seconds to read from primary after client writes (replication lag)
+REPLICA_STICKY_SECONDS = env("REPLICA_STICKY_SECONDS", cast=int, default=10)
+if DATABASE_REPLICA_URL:
+    DATABASES["replica"] = {
+        **env.db_url("DATABASE_REPLICA_URL"),
+        "TEST": {"MIRROR": "default"},
+    }
+    DATABASE_ROUTERS = ["app.routers.PrimaryReplicaRouter"]
+    MIDDLEWARE.insert(5, "app.middleware.ReplicaPinMiddleware")
+
+    # Cachalot invalidates per db alias, so writes to primary won't reach
+    # replica entries. Caching only primary queries keeps cache consistent.
+    CACHALOT_DATABASES = ["default"]
+
+# Cachalot caches only queries of read-mostly tables: writes to other ones
+# (orders, sessions, users) don't invalidate anything. Empty - all tables.
+CACHALOT_ONLY_CACHABLE_TABLES = [
+    table
+    for table in env(
+        "CACHALOT_TABLES",
+        cast=str,
+        default="main_course,main_courseprofile,main_block,main_subblock",
+    ).split(",")
+    if table
+]
+CACHALOT_QUERY_KEYGEN = "app.querycache.query_cache_key"
+# Seconds, None - until invalidated
+CACHALOT_TIMEOUT = env("CACHALOT_TIMEOUT", cast=int, default=None)
+
+# Connection pool is supported only by PostgreSQL (sqlite files for local testing)
+for _db in DATABASES.values():
+    if _db["ENGINE"] == "django.db.backends.postgresql":
+        _db["OPTIONS"] = {**_db.get("OPTIONS", {}), "pool": True}
+
 CACHES = {
     "default": env.cache_url("REDIS_URL"),
 }
 
+# Sessions
+# "db" - database (default), "cache" - only cache, "cached_db" - cache + database
+SESSION_MODE = env("SESSION_MODE", cast=str, default="db")
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+}
+SESSION_ENGINE = SESSION_ENGINES[SESSION_MODE]
+# Separate cache for sessions, so they aren't evicted with query cache
+if env("SESSION_REDIS_URL", cast=str, default=""):
+    CACHES["sessions"] = env.cache_url("SESSION_REDIS_URL")
+    SESSION_CACHE_ALIAS = "sessions"
+
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -112,6 +190,8 @@ USE_TZ = True
 
 # Static files
 USE_S3 = env("USE_S3", cast=bool, default=False)
+# Lifetime of signed course bundle URLs, seconds
+COURSE_BUNDLE_URL_EXPIRE = env("COURSE_BUNDLE_URL_EXPIRE", cast=int, default=300)
 if USE_S3:
     STORAGES = {
         "default": {
@@ -128,6 +208,22 @@ if USE_S3:
                 default="django.contrib.staticfiles.storage.StaticFilesStorage",
             ),
         },
+        # Private, served by signed URLs
+        "bundles": {
+            "BACKEND": "storages.backends.s3.S3Storage",
+            "OPTIONS": {
+                "location": "course-bundles",
+                "default_acl": "private",
+                "custom_domain": None,
+                "querystring_auth": True,
+                "querystring_expire": COURSE_BUNDLE_URL_EXPIRE,
+                "file_overwrite": True,
+                # Bundle names are versioned
+                "object_parameters": {
+                    "CacheControl": "private, max-age=31536000, immutable"
+                },
+            },
+        },
     }
 
     AWS_ACCESS_KEY_ID = env("AWS_ACCESS_KEY_ID", default=None)
@@ -148,6 +244,17 @@ if USE_S3:
     MEDIA_URL = env("MEDIA_URL", default="/local-media/")
     MEDIA_ROOT = BASE_DIR / "mediafiles"
 else:
+    STORAGES = {
+        "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"},
+        "staticfiles": {
+            "BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"
+        },
+        # Not under MEDIA_URL, served by the bundle view
+        "bundles": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": BASE_DIR / "course-bundles"},
+        },
+    }
     STATIC_URL = "/staticfiles/"
     STATIC_ROOT = BASE_DIR / "staticfiles"
     MEDIA_URL = "mediafiles/"
@@ -0,0 +1,5 @@
+from asgiref.sync import sync_to_async
+from django.shortcuts import render
+
+# Full pages touch session, user and messages while rendering (sync db access)
+arender = sync_to_async(render)
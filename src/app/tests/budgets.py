@@ -0,0 +1,74 @@
+"""
+Upper bounds of SQL queries and cache calls per request, by URL name.
+Counts include session, user and cachalot calls. Budgets are the counts
+measured by the test suite (`pytest --budgets-report`). Raise a budget only
+with a reason, a lost select_related shows up here as exceeded queries.
+"""
+
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class Budget:
+    queries: int
+    cache_calls: int
+
+    def check(self, view_name: str, stats) -> None:
+        assert (
+            stats.db_queries <= self.queries
+        ), f"{view_name}: {stats.db_queries} queries, budget {self.queries}"
+        assert (
+            stats.cache_calls <= self.cache_calls
+        ), f"{view_name}: {stats.cache_calls} cache calls, budget {self.cache_calls}"
+
+
+# Largest counts of test requests by URL name, reported with
+# `pytest --budgets-report` (app/pytest_budgets.py), which doesn't check budgets
+measured: dict[str, Budget] = {}
+checked = True
+
+
+def record(view_name: str, stats) -> None:
+    last = measured.get(view_name, Budget(queries=0, cache_calls=0))
+    measured[view_name] = Budget(
+        queries=max(last.queries, stats.db_queries),
+        cache_calls=max(last.cache_calls, stats.cache_calls),
+    )
+
+
+REQUEST_BUDGETS = {
+    # main
+    "main:home": Budget(queries=2, cache_calls=2),
+    "main:about": Budget(queries=2, cache_calls=2),
+    "main:modal-open-demo": Budget(queries=2, cache_calls=2),
+    "main:modal-open-contact": Budget(queries=2, cache_calls=0),
+    "main:modal-close": Budget(queries=2, cache_calls=0),
+    "main:courses-list": Budget(queries=3, cache_calls=8),
+    "main:courses-search": Budget(queries=1, cache_calls=1),
+    "main:course-detail": Budget(queries=8, cache_calls=19),
+    "main:course-bundle": Budget(queries=6, cache_calls=13),
+    "main:course-resume": Budget(queries=8, cache_calls=14),
+    "main:load-next-content": Budget(queries=9, cache_calls=16),
+    "main:load-next-content-from-subblock": Budget(queries=10, cache_calls=17),
+    # users
+    "users:login": Budget(queries=11, cache_calls=0),
+    "users:logout": Budget(queries=6, cache_calls=0),
+    # Profile data is cached in two steps: ids, then rows with course tags.
+    # Cold load: four tagged reads, tag creation and recompute locks
+    "users:profile": Budget(queries=9, cache_calls=24),
+    "users:profile-partial": Budget(queries=8, cache_calls=22),
+    "users:profile-orders": Budget(queries=6, cache_calls=9),
+    "users:password-change": Budget(queries=14, cache_calls=0),
+    "users:edit-account-details": Budget(queries=5, cache_calls=3),
+    "users:register": Budget(queries=5, cache_calls=0),
+    "users:email_verification": Budget(queries=12, cache_calls=0),
+    "users:password_reset": Budget(queries=3, cache_calls=0),
+    "users:password_reset_done": Budget(queries=2, cache_calls=0),
+    "users:password_reset_confirm": Budget(queries=7, cache_calls=0),
+    "users:password_reset_complete": Budget(queries=3, cache_calls=0),
+    # orders
+    "orders:checkout": Budget(queries=9, cache_calls=10),
+    "orders:yookassa_webhook": Budget(queries=4, cache_calls=0),
+    "orders:yookassa_success": Budget(queries=9, cache_calls=5),
+    "orders:yookassa_cancel": Budget(queries=9, cache_calls=5),
+}
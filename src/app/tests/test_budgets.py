@@ -0,0 +1,93 @@
+from importlib import import_module
+from unittest.mock import patch
+
+import pytest
+from django.contrib.auth.tokens import default_token_generator
+from django.urls import reverse
+from django.utils.encoding import force_bytes
+from django.utils.http import urlsafe_base64_encode
+
+from app.tests.budgets import REQUEST_BUDGETS
+
+pytestmark = [pytest.mark.django_db]
+
+URLCONFS = ["main.urls", "users.urls", "orders.urls"]
+
+# Budgets must not depend on amount of data, requests below run on many rows
+ROWS = 15
+
+
+def test_every_url_has_budget():
+    for module in URLCONFS:
+        urlconf = import_module(module)
+        for pattern in urlconf.urlpatterns:
+            assert f"{urlconf.app_name}:{pattern.name}" in REQUEST_BUDGETS
+
+
+def test_courses_list(app, mixer):
+    mixer.cycle(ROWS).blend("main.Course")
+    app.get(reverse("main:courses-list"))
+    app.get(reverse("main:courses-search") + "?query=a")
+
+
+@pytest.fixture
+def purchased_course(mixer, auth_user, course):
+    """Course with many blocks and subblocks, bought by auth_user"""
+    for order in range(1, ROWS + 1):
+        block = mixer.blend("main.Block", course=course, order=order)
+        mixer.cycle(3).blend("main.SubBlock", block=block, order=(n for n in (1, 2, 3)))
+    mixer.blend("orders.Order", user=auth_user, course=course, status="completed")
+    return course
+
+
+def test_course_reading(app, purchased_course):
+    block = purchased_course.blocks.order_by("order").first()
+    subblock = block.subblocks.order_by("order").first()
+
+    app.get(reverse("main:course-detail", args=[purchased_course.id]))
+    app.get(reverse("main:load-next-content", args=[purchased_course.id, block.id]))
+    app.get(
+        reverse(
+            "main:load-next-content-from-subblock",
+            args=[purchased_course.id, block.id, subblock.id],
+        )
+    )
+
+
+def test_profile(app, mixer, auth_user):
+    courses = mixer.cycle(ROWS).blend("main.Course")
+    for course in courses:
+        mixer.blend("orders.Order", user=auth_user, course=course, status="completed")
+
+    app.get(reverse("users:profile"))
+    app.get(reverse("users:profile-partial"))
+
+
+@patch("orders.views.Payment.find_one")
+def test_payment_status(mock_find_one, app, mixer, auth_user, course):
+    mock_find_one.return_value.status = "succeeded"
+    mixer.cycle(ROWS).blend("orders.Order", user=auth_user)
+    order = mixer.blend(
+        "orders.Order", user=auth_user, course=course, yookassa_payment_id="1"
+    )
+
+    app.get(reverse("orders:yookassa_success") + f"?order_id={order.id}")
+
+
+def test_password_reset(app, user):
+    app.get(reverse("users:password_reset"))
+    app.post(
+        reverse("users:password_reset"),
+        {"email": user.email},
+        expected_status_code=302,
+    )
+    app.get(reverse("users:password_reset_done"))
+
+    uidb64 = urlsafe_base64_encode(force_bytes(user.pk))
+    token = default_token_generator.make_token(user)
+    response = app.get(
+        reverse("users:password_reset_confirm", args=[uidb64, token]),
+        expected_status_code=302,
+    )
+    app.get(response.url)
+    app.get(reverse("users:password_reset_complete"))
@@ -0,0 +1,134 @@
+import asyncio
+import threading
+import time
+from unittest.mock import patch
+
+from django.core.cache import cache
+
+from app.cache import aget_or_set_tagged, get_or_set_tagged, invalidate_tags
+
+THREADS = 8
+
+
+class Computation:
+    """Slow compute function, counts calls"""
+
+    def __init__(self, duration=0.1):
+        self.duration = duration
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self):
+        with self._lock:
+            self.calls += 1
+            calls = self.calls
+        time.sleep(self.duration)
+        return calls
+
+
+def _concurrently(func) -> list:
+    barrier = threading.Barrier(THREADS)
+    results = [None] * THREADS
+
+    def run(index):
+        barrier.wait()
+        results[index] = func()
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(THREADS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def _get(compute, timeout=None):
+    return get_or_set_tagged("key", ["tag"], compute, "test", timeout)
+
+
+class TestGetOrSetTagged:
+    def test_cached(self):
+        compute = Computation(duration=0)
+        assert _get(compute) == _get(compute) == 1
+
+    def test_none_cached(self):
+        calls = []
+        assert _get(lambda: calls.append(1)) is None
+        assert _get(lambda: calls.append(1)) is None
+        assert len(calls) == 1
+
+    def test_single_flight_on_miss(self):
+        """Test concurrent misses compute value once, others wait for it"""
+        compute = Computation()
+
+        results = _concurrently(lambda: _get(compute))
+
+        assert compute.calls == 1
+        assert results == [1] * THREADS
+
+    @patch("app.cache.random.random", return_value=0)  # no early refresh
+    def test_single_flight_on_expiry(self, _):
+        """Test expired value is recomputed once, stale one is served meanwhile"""
+        compute = Computation()
+        _get(compute, timeout=0.2)
+        time.sleep(0.3)
+
+        results = _concurrently(lambda: _get(compute, timeout=0.2))
+
+        assert compute.calls == 2
+        assert set(results) <= {1, 2}
+        assert _get(compute) == 2
+
+    def test_new_tags(self):
+        """Test tags created in constant cache calls, any of them invalidates"""
+        tags = [f"tag:{i}" for i in range(20)]
+        compute = Computation(duration=0)
+        with patch("app.cache.cache.add", wraps=cache.add) as add:
+            get_or_set_tagged("key", tags, compute, "test")
+        # Lock only
+        assert add.call_count == 1
+
+        assert get_or_set_tagged("key", tags, compute, "test") == 1
+        invalidate_tags("tag:7")
+        assert get_or_set_tagged("key", tags, compute, "test") == 2
+
+    def test_invalidated_not_served(self):
+        """Test readers wait for new value instead of invalidated one"""
+        compute = Computation()
+        _get(compute)
+        invalidate_tags("tag")
+
+        results = _concurrently(lambda: _get(compute))
+
+        assert compute.calls == 2
+        assert results == [2] * THREADS
+
+    def test_early_refresh(self):
+        """Test value close to expiry may be recomputed before it"""
+        compute = Computation(duration=0.05)
+        _get(compute, timeout=1)
+
+        with patch("app.cache.random.random", return_value=0.5):
+            assert _get(compute, timeout=1) == 1
+        with patch("app.cache.random.random", return_value=1 - 1e-13):
+            assert _get(compute, timeout=1) == 2
+
+
+def test_async_single_flight():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def run():
+        return await asyncio.gather(
+            *[
+                aget_or_set_tagged("key", ["tag"], compute, "test")
+                for _ in range(THREADS)
+            ]
+        )
+
+    assert asyncio.run(run()) == [1] * THREADS
+    assert len(calls) == 1
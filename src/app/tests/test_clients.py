@@ -1,25 +1,57 @@
+from typing import Optional
+
 import boto3
 from botocore.config import Config
 from django.conf import settings
 from django.test import Client
 from django.utils.functional import cached_property
 
+from app.instrumentation import finish_request_stats, install_hooks, start_request_stats
+from app.tests import budgets
+from app.tests.budgets import REQUEST_BUDGETS, Budget
+
 
 class AppClient:
-    """Simulating User client API"""
+    """
+    Simulating User client API.
+    Every request is checked against budget of its URL name (app/tests/budgets.py),
+    budget argument overrides it, check_budgets=False disables checks.
+    """
+
+    def __init__(self, check_budgets=True):
+        self.check_budgets = check_budgets
 
     @cached_property
     def client(self) -> Client:
         return Client()
 
+    def _request(self, method, *args, budget: Optional[Budget] = None, **kwargs):
+        if not self.check_budgets:
+            return method(*args, **kwargs)
+
+        install_hooks()
+        stats = start_request_stats()
+        try:
+            result = method(*args, **kwargs)
+        finally:
+            finish_request_stats()
+
+        match = result.resolver_match
+        view_name = match.view_name if match else "<unresolved>"
+        budgets.record(view_name, stats)
+        budget = budget or REQUEST_BUDGETS.get(view_name)
+        if budget is not None and budgets.checked:
+            budget.check(view_name, stats)
+        return result
+
     def get(self, *args, expected_status_code=200, **kwargs):
-        result = self.client.get(*args, **kwargs)
+        result = self._request(self.client.get, *args, **kwargs)
         assert result.status_code == expected_status_code
 
         return result
 
     def post(self, *args, expected_status_code=200, **kwargs):
-        result = self.client.post(*args, **kwargs)
+        result = self._request(self.client.post, *args, **kwargs)
         assert result.status_code == expected_status_code
 
         return result
@@ -0,0 +1,94 @@
+import asyncio
+from unittest.mock import patch
+
+import pytest
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.http import HttpResponse
+from django.urls import reverse
+
+from app.instrumentation import (
+    Histogram,
+    finish_request_stats,
+    get_views_stats,
+    install_hooks,
+    reset_views_stats,
+    start_request_stats,
+)
+from app.middleware import PerformanceMiddleware
+from app.tests.test_clients import AppClient
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def sampled_app(settings):
+    settings.PERF_SAMPLE_RATE = 1
+    reset_views_stats()
+    yield AppClient()
+    reset_views_stats()
+
+
+def test_not_used_when_sampling_off(settings):
+    """Test cache backends and templates aren't patched when middleware is off"""
+    settings.PERF_SAMPLE_RATE = 0
+    with patch("app.middleware.install_hooks") as install:
+        with pytest.raises(MiddlewareNotUsed):
+            PerformanceMiddleware(lambda request: None)
+    install.assert_not_called()
+
+
+def test_server_timing_header(sampled_app, course):
+    """Test timings are sent and aggregated per URL name"""
+    response = sampled_app.get(reverse("main:courses-list"))
+
+    server_timing = response["Server-Timing"]
+    for metric in ["db;dur=", "cache;dur=", "tpl;dur=", "total;dur="]:
+        assert metric in server_timing
+
+    view_stats = get_views_stats()["main:courses-list"]
+    assert view_stats.total_ms.count == 1
+    assert view_stats.db_queries.sum >= 1
+
+
+def test_async_middleware(settings, rf):
+    settings.PERF_SAMPLE_RATE = 1
+
+    async def view(request):
+        return HttpResponse()
+
+    response = asyncio.run(PerformanceMiddleware(view)(rf.get("/")))
+    assert "total;dur=" in response["Server-Timing"]
+
+
+def test_server_timing_disabled(sampled_app, settings):
+    settings.PERF_SERVER_TIMING = False
+    response = sampled_app.get(reverse("main:home"))
+    assert "Server-Timing" not in response
+    assert get_views_stats()["main:home"].total_ms.count == 1
+
+
+def test_cache_hits_and_misses():
+    install_hooks()
+    cache.set("instrumentation_test", None)
+    cache.delete("instrumentation_test_missing")
+
+    stats = start_request_stats()
+    try:
+        assert cache.get("instrumentation_test", "default") is None
+        assert cache.get("instrumentation_test_missing", "default") == "default"
+        cache.get_many(["instrumentation_test", "instrumentation_test_missing"])
+    finally:
+        finish_request_stats()
+
+    assert (stats.cache_hits, stats.cache_misses, stats.cache_calls) == (2, 2, 3)
+
+
+def test_histogram():
+    histogram = Histogram(buckets=(10, 100, float("inf")))
+    for value in [1, 10, 50, 1000]:
+        histogram.observe(value)
+
+    assert histogram.counts == [2, 1, 1]
+    assert histogram.count == 4
+    assert histogram.sum == 1061
@@ -0,0 +1,140 @@
+import asyncio
+from unittest.mock import MagicMock, patch
+
+import pytest
+from asgiref.sync import iscoroutinefunction
+from cachalot.signals import post_invalidation
+from django.http import HttpResponse
+from django.urls import reverse
+from redis.exceptions import RedisError
+
+from app import metrics
+from app.middleware import MetricsMiddleware
+from app.tests.test_clients import AppClient
+from orders.services import is_purchased
+from users.services.caching import get_user_avatar_url
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture(autouse=True)
+def _reset_metrics():
+    metrics.reset()
+    yield
+    metrics.reset()
+
+
+def _samples() -> dict[str, float]:
+    samples = {}
+    for line in metrics.render().splitlines():
+        if not line.startswith("#"):
+            sample, value = line.rsplit(" ", 1)
+            samples[sample] = float(value)
+    return samples
+
+
+def test_histogram_buckets_are_cumulative():
+    metrics.observe("yookassa_api_duration_seconds", 0.03, method="create")
+    metrics.observe("yookassa_api_duration_seconds", 3, method="create")
+
+    samples = _samples()
+    bucket = 'yookassa_api_duration_seconds_bucket{{le="{}",method="create"}}'
+    assert samples[bucket.format(0.025)] == 0
+    assert samples[bucket.format(0.05)] == 1
+    assert samples[bucket.format(5)] == 2
+    assert samples[bucket.format("+Inf")] == 2
+    assert samples['yookassa_api_duration_seconds_count{method="create"}'] == 2
+    assert samples[
+        'yookassa_api_duration_seconds_sum{method="create"}'
+    ] == pytest.approx(3.03)
+
+
+def test_render_type_lines():
+    metrics.inc("cachalot_invalidations_total", table="main_course", db="default")
+    metrics.observe("yookassa_webhook_duration_seconds", 0.1)
+
+    output = metrics.render()
+    assert "# TYPE cachalot_invalidations_total counter" in output
+    assert output.count("# TYPE yookassa_webhook_duration_seconds histogram") == 1
+
+
+def test_request_latency_per_view(course):
+    AppClient().get(reverse("main:courses-list"))
+
+    samples = _samples()
+    assert samples['http_requests_total{status="200",view="main:courses-list"}'] == 1
+    assert samples['http_request_duration_seconds_count{view="main:courses-list"}'] == 1
+
+
+def test_async_middleware(rf):
+    """Test middleware stays async for async handlers, without threads"""
+
+    async def view(request):
+        return HttpResponse()
+
+    middleware = MetricsMiddleware(view)
+    assert iscoroutinefunction(middleware)
+    asyncio.run(middleware(rf.get("/")))
+
+    samples = _samples()
+    assert samples['http_requests_total{status="200",view="<unresolved>"}'] == 1
+
+
+def test_failed_flush_kept(caplog):
+    """Test Redis errors don't fail requests, deltas are flushed later"""
+    redis = MagicMock()
+    redis.pipeline.return_value.execute.side_effect = RedisError("down")
+    metrics.inc("http_requests_total", view="v", status=200)
+
+    with patch("app.metrics.get_redis", return_value=redis):
+        metrics.flush()
+
+    assert "Metrics flush failed" in caplog.text
+    assert _samples()['http_requests_total{status="200",view="v"}'] == 1
+
+
+def test_cache_hit_ratio(user, course):
+    is_purchased(user, course.id)
+    is_purchased(user, course.id)
+
+    samples = _samples()
+    labels = 'family="purchase_status",level="redis"'
+    assert samples[f'cache_requests_total{{{labels},result="miss"}}'] == 1
+    assert samples[f'cache_requests_total{{{labels},result="hit"}}'] == 1
+
+
+def test_avatar_local_hit(user):
+    get_user_avatar_url(user.id)
+    get_user_avatar_url(user.id)
+
+    samples = _samples()
+    labels = 'family="user_avatar_url",level="local"'
+    assert samples[f'cache_requests_total{{{labels},result="hit"}}'] >= 1
+
+
+def test_cachalot_invalidations():
+    metrics.install_receivers()
+    # Sent by cachalot on commit (tests run inside a transaction)
+    post_invalidation.send("main_course", db_alias="default")
+
+    samples = _samples()
+    assert (
+        samples['cachalot_invalidations_total{db="default",table="main_course"}'] >= 1
+    )
+
+
+def test_metrics_token(settings):
+    settings.METRICS_TOKEN = "secret-token"
+    app = AppClient()
+    url = reverse("metrics")
+
+    assert app.get(url, expected_status_code=403)
+    response = app.get(url, HTTP_AUTHORIZATION="Bearer secret-token")
+    assert response["Content-Type"].startswith("text/plain")
+
+
+@pytest.mark.parametrize(("debug", "status_code"), [(False, 403), (True, 200)])
+def test_metrics_without_token(settings, debug, status_code):
+    settings.METRICS_TOKEN = ""
+    settings.DEBUG = debug
+    AppClient().get(reverse("metrics"), expected_status_code=status_code)
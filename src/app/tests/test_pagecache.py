@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from asgiref.sync import iscoroutinefunction
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.test import AsyncClient, RequestFactory
+from django.urls import reverse
+
+from app.cache import get_tagged, invalidate_tags, set_tagged
+from app.middleware import PageCacheMiddleware
+from app.pagecache import dump_page, page_cache_key
+from app.tests.test_clients import AppClient
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestTaggedCache:
+    def test_set_and_get(self):
+        value, versions = get_tagged("key", ["a", "b"])
+        assert value is None
+
+        set_tagged("key", "value", versions)
+        assert get_tagged("key", ["a", "b"])[0] == "value"
+
+    def test_invalidate_tag(self):
+        _, versions = get_tagged("key", ["a", "b"])
+        set_tagged("key", "value", versions)
+
+        invalidate_tags("b")
+
+        assert get_tagged("key", ["a", "b"])[0] is None
+
+    def test_other_tags_are_kept(self):
+        _, versions = get_tagged("key", ["a"])
+        set_tagged("key", "value", versions)
+
+        invalidate_tags("b")
+
+        assert get_tagged("key", ["a"])[0] == "value"
+
+    def test_lost_tag_version(self):
+        _, versions = get_tagged("key", ["a"])
+        set_tagged("key", "value", versions)
+
+        cache.delete("cache-tag:a")
+
+        assert get_tagged("key", ["a"])[0] is None
+
+    def test_invalidate_unknown_tag(self):
+        invalidate_tags("unknown")
+
+
+class TestPageCache:
+    def test_anonymous_hit(self, course, django_assert_num_queries):
+        app = AppClient()
+        first = app.get(reverse("main:courses-list"))
+        with django_assert_num_queries(0):
+            second = app.get(reverse("main:courses-list"))
+
+        assert first["X-Page-Cache"] == "miss"
+        assert second["X-Page-Cache"] == "hit"
+        assert second.content == first.content
+
+    def test_logged_in_bypass(self, user):
+        app = AppClient(check_budgets=False)
+        app.client.force_login(user)
+        app.get(reverse("main:home"))
+        response = app.get(reverse("main:home"))
+
+        assert "X-Page-Cache" not in response
+
+    def test_not_cached_view(self):
+        app = AppClient()
+        app.get(reverse("main:modal-close"))
+        response = app.get(reverse("main:modal-close"))
+
+        assert "X-Page-Cache" not in response
+
+    def test_catalog_invalidation(self, course, django_capture_on_commit_callbacks):
+        app = AppClient()
+        app.get(reverse("main:courses-list"))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.title = "Новое название"
+            course.save()
+        response = app.get(reverse("main:courses-list"))
+
+        assert response["X-Page-Cache"] == "miss"
+        assert "Новое название" in response.content.decode()
+
+    def test_landing_kept_on_catalog_change(
+        self, course, django_capture_on_commit_callbacks
+    ):
+        app = AppClient()
+        app.get(reverse("main:about"))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.save()
+
+        assert app.get(reverse("main:about"))["X-Page-Cache"] == "hit"
+
+    def test_async_hit(self):
+        """Test ASGI requests are cached and served by async middleware"""
+        client = AsyncClient()
+        url = reverse("main:about")
+
+        first = asyncio.run(client.get(url))
+        second = asyncio.run(client.get(url))
+
+        assert first["X-Page-Cache"] == "miss"
+        assert second["X-Page-Cache"] == "hit"
+        assert second.content == first.content
+
+    def test_async_capable(self):
+        async def view(request):
+            return HttpResponse()
+
+        assert iscoroutinefunction(PageCacheMiddleware(view))
+
+    def test_disabled(self, settings):
+        settings.PAGE_CACHE_ENABLED = False
+        app = AppClient()
+        app.get(reverse("main:home"))
+
+        assert "X-Page-Cache" not in app.get(reverse("main:home"))
+
+
+class TestPageCacheKey:
+    def test_query_order(self):
+        factory = RequestFactory()
+        assert page_cache_key(factory.get("/courses/?a=1&b=2")) == page_cache_key(
+            factory.get("/courses/?b=2&a=1")
+        )
+
+    def test_query_values(self):
+        factory = RequestFactory()
+        assert page_cache_key(factory.get("/courses/?page=1")) != page_cache_key(
+            factory.get("/courses/?page=2")
+        )
+
+
+class TestDumpPage:
+    def test_response_with_cookie(self):
+        request = RequestFactory().get("/")
+        response = HttpResponse("page")
+        response.set_cookie("csrftoken", "token")
+
+        assert dump_page(request, response) is None
+
+    def test_not_ok(self):
+        request = RequestFactory().get("/")
+
+        assert dump_page(request, HttpResponse(status=404)) is None
+
+    def test_skipped_headers(self):
+        request = RequestFactory().get("/")
+        response = HttpResponse("page")
+        response["Server-Timing"] = "db;dur=1"
+
+        headers = dict(dump_page(request, response)["headers"])
+
+        assert "Server-Timing" not in headers
+        assert headers["Content-Type"].startswith("text/html")
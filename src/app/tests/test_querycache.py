@@ -0,0 +1,66 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from django.core.management import call_command
+from django.db import connection
+
+from app.querycache import _table, clear_query_cache, query_cache_key, table_memory
+from main.models import Course
+from orders.models import Order
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_query_key_has_table():
+    compiler = Course.objects.filter(id=1).query.get_compiler(connection=connection)
+
+    key = query_cache_key(compiler)
+
+    assert key.startswith("cachalot-query:main_course:")
+    assert _table(f":1:{key}".encode()) == "main_course"
+
+
+def test_only_main_tables_cached(course, order, django_assert_num_queries):
+    with django_assert_num_queries(1):
+        list(Course.objects.filter(id=course.id))
+        list(Course.objects.filter(id=course.id))
+
+    with django_assert_num_queries(2):
+        list(Order.objects.filter(id=order.id))
+        list(Order.objects.filter(id=order.id))
+
+
+@patch("cachalot.monkey_patch.invalidate")
+def test_order_writes_not_invalidating(invalidate, course, order):
+    Order.objects.filter(id=order.id).update(status="pending")
+    invalidate.assert_not_called()
+
+    Course.objects.filter(id=course.id).update(title="Курс")
+    assert invalidate.call_args.args == ("main_course",)
+
+
+def test_table_memory_without_redis():
+    assert table_memory() == {}
+
+
+def test_clear_without_redis(course, django_assert_num_queries):
+    list(Course.objects.filter(id=course.id))
+    clear_query_cache()
+    with django_assert_num_queries(1):
+        list(Course.objects.filter(id=course.id))
+
+
+def test_clear_only_queries():
+    redis = MagicMock()
+    redis.scan_iter.return_value = [b":1:cachalot-query:main_course:a"]
+    with patch("app.querycache.get_redis", return_value=redis):
+        clear_query_cache()
+
+    assert redis.scan_iter.call_args.kwargs["match"] == "*cachalot-query:*"
+    redis.delete.assert_called_once_with(b":1:cachalot-query:main_course:a")
+    redis.flushdb.assert_not_called()
+
+
+def test_stats_command(capsys):
+    call_command("cachalot_stats", "--publish")
+    assert "No cached queries" in capsys.readouterr().out
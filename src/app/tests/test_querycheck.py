@@ -0,0 +1,68 @@
+import pytest
+from django.http import HttpResponse
+
+from app.middleware import QueryDetectorMiddleware
+from app.querycheck import add_listener, fingerprint, remove_listener, track_queries
+from main.models import Block
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_fingerprint():
+    assert fingerprint(
+        "SELECT * FROM t WHERE id IN (%s, %s, %s) AND name = 'x'  LIMIT 21"
+    ) == fingerprint("SELECT * FROM t WHERE id IN (%s) AND name = 'y' LIMIT 1")
+
+
+def _blocks_course_titles():
+    # Course of every block is a separate query
+    return [block.course.title for block in Block.objects.all()]
+
+
+@pytest.mark.allow_n_plus_one
+def test_n_plus_one_found(mixer):
+    mixer.cycle(4).blend("main.Block")
+
+    with track_queries(repeat_threshold=3) as tracker:
+        _blocks_course_titles()
+
+    problems = tracker.problems("main:test")
+    assert [problem.kind for problem in problems] == ["n+1"]
+    assert problems[0].count == 4
+    assert "_blocks_course_titles" in "".join(problems[0].stack)
+
+
+def test_select_related_is_fine(mixer):
+    mixer.cycle(4).blend("main.Block")
+
+    with track_queries(repeat_threshold=3) as tracker:
+        [block.course.title for block in Block.objects.select_related("course")]
+
+    assert tracker.problems("main:test") == []
+
+
+def test_slow_query(mixer):
+    with track_queries(slow_ms=1e-6) as tracker:
+        Block.objects.exists()
+
+    assert [problem.kind for problem in tracker.problems("main:test")] == ["slow"]
+
+
+@pytest.mark.allow_n_plus_one
+def test_middleware_reports(rf, mixer, settings):
+    settings.QUERY_DETECTOR_REPEAT_THRESHOLD = 3
+    mixer.cycle(3).blend("main.Block")
+
+    def view(request):
+        return HttpResponse(", ".join(_blocks_course_titles()))
+
+    problems = []
+    add_listener(problems.append)
+    try:
+        QueryDetectorMiddleware(view)(rf.get("/"))
+    finally:
+        remove_listener(problems.append)
+
+    assert [(problem.kind, problem.view_name) for problem in problems] == [
+        ("n+1", "<unresolved>")
+    ]
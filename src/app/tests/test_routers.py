@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from app.middleware import REPLICA_PIN_COOKIE, ReplicaPinMiddleware
+from app.routers import (
+    DEFAULT_DB,
+    REPLICA_DB,
+    PrimaryReplicaRouter,
+    replica_context,
+    use_primary,
+)
+from main.models import Block, Course
+from orders.models import Order
+from users.models import CustomUserProfile
+
+
+@pytest.fixture
+def router():
+    return PrimaryReplicaRouter()
+
+
+class TestPrimaryReplicaRouter:
+    @pytest.mark.parametrize("model", [Course, Block])
+    def test_catalog_read_from_replica(self, router, model):
+        with replica_context():
+            assert router.db_for_read(model) == REPLICA_DB
+
+    @pytest.mark.parametrize("model", [Order, CustomUserProfile])
+    def test_other_read_from_primary(self, router, model):
+        with replica_context():
+            assert router.db_for_read(model) == DEFAULT_DB
+
+    def test_write_pins_context(self, router):
+        with replica_context():
+            assert router.db_for_write(Course) == DEFAULT_DB
+            assert router.db_for_read(Course) == DEFAULT_DB
+
+    def test_orders_write_does_not_pin(self, router):
+        with replica_context():
+            router.db_for_write(Order)
+            assert router.db_for_read(Course) == REPLICA_DB
+
+    def test_use_primary(self, router):
+        with replica_context():
+            with use_primary():
+                assert router.db_for_read(Course) == DEFAULT_DB
+            assert router.db_for_read(Course) == REPLICA_DB
+
+    def test_migrate_only_primary(self, router):
+        assert router.allow_migrate(DEFAULT_DB, "main")
+        assert not router.allow_migrate(REPLICA_DB, "main")
+
+
+class TestReplicaPinMiddleware:
+    def test_sets_cookie_after_write(self, router, settings):
+        settings.REPLICA_STICKY_SECONDS = 5
+
+        def view(request):
+            router.db_for_write(Course)
+            return HttpResponse()
+
+        response = ReplicaPinMiddleware(view)(RequestFactory().get("/"))
+        assert response.cookies[REPLICA_PIN_COOKIE]["max-age"] == 5
+
+    def test_no_cookie_without_write(self):
+        response = ReplicaPinMiddleware(lambda request: HttpResponse())(
+            RequestFactory().get("/")
+        )
+        assert REPLICA_PIN_COOKIE not in response.cookies
+
+    def test_pinned_by_cookie(self, router):
+        request = RequestFactory().get("/")
+        request.COOKIES[REPLICA_PIN_COOKIE] = "1"
+
+        def view(request):
+            return HttpResponse(router.db_for_read(Course))
+
+        response = ReplicaPinMiddleware(view)(request)
+        assert response.content.decode() == DEFAULT_DB
+
+    def test_async_write_sets_cookie(self, router):
+        async def view(request):
+            router.db_for_write(Course)
+            return HttpResponse()
+
+        response = asyncio.run(ReplicaPinMiddleware(view)(RequestFactory().get("/")))
+        assert REPLICA_PIN_COOKIE in response.cookies
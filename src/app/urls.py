@@ -2,11 +2,14 @@ from django.conf import settings
 from django.contrib import admin
 from django.urls import include, path
 
+from app.views import metrics_view
+
 urlpatterns = [
     path("", include("main.urls", namespace="main")),
     path("users/", include("users.urls", namespace="users")),
     path("orders/", include("orders.urls", namespace="orders")),
     path("admin/", admin.site.urls),
+    path("metrics/", metrics_view, name="metrics"),
 ]
 
 if settings.DEBUG:
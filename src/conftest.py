@@ -1,7 +1,45 @@
 import pytest
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.storage import storages
 from mixer.backend.django import mixer as _mixer
 
+from app.routers import use_primary
 from app.tests.test_clients import AppClient
+from users.services.caching import _local_avatars
+
+pytest_plugins = ["app.pytest_budgets", "app.pytest_queries"]
+
+
+@pytest.fixture(autouse=True)
+def _primary_reads():
+    """Replica test mirror is a separate connection, it can't see test data"""
+    if "replica" not in settings.DATABASES:
+        yield
+        return
+    with use_primary():
+        yield
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    """Caches outlive test transactions, and ids are reused between tests"""
+    yield
+    cache.clear()
+    _local_avatars.clear()
+
+
+@pytest.fixture
+def bundle_storage(settings, tmp_path):
+    """Course bundles in a temporary directory"""
+    settings.STORAGES = {
+        **settings.STORAGES,
+        "bundles": {
+            "BACKEND": "django.core.files.storage.FileSystemStorage",
+            "OPTIONS": {"location": tmp_path},
+        },
+    }
+    return storages["bundles"]
 
 
 @pytest.fixture
@@ -1,20 +1,34 @@
+import json
+
+from django import forms
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.paginator import Paginator
+from django.http import Http404, JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.urls import path
+from django.utils.decorators import method_decorator
+from django.views.decorators.http import require_http_methods
 
-from main.models import Block, Course, CourseProfile, SubBlock
+from main.models import Block, Course, CourseProfile, ReadingProgress, SubBlock
+from main.services.ordering import reorder_course
 
+BLOCKS_PER_PAGE = 20
 
-class BlockInlineBase(admin.StackedInline):
-    extra = 1
-    fields = ("title", "content", "order")
 
+class SubBlockInline(admin.TabularInline):
+    """Titles only, content is edited on subblock page or in course editor"""
 
-class SubBlockInline(BlockInlineBase):
     model = SubBlock
+    fields = ("title", "order")
+    extra = 0
+    show_change_link = True
 
 
-class BlockInline(BlockInlineBase):
-    model = Block
-    inlines = [SubBlockInline]
+class BlockContentForm(forms.ModelForm):
+    class Meta:
+        fields = ("title", "content")
+        widgets = {"content": forms.Textarea(attrs={"rows": 20, "cols": 100})}
 
 
 class CourseProfileInline(admin.StackedInline):
@@ -26,7 +40,129 @@ class CourseProfileInline(admin.StackedInline):
 class CourseAdmin(admin.ModelAdmin):
     list_display = ("title", "price", "created_at", "updated_at")
     search_fields = ("title", "description")
-    inlines = [CourseProfileInline, BlockInline]
+    inlines = [CourseProfileInline]
+    change_form_template = "admin/main/course/change_form.html"
+
+    def get_urls(self):
+        urls = [
+            path(
+                "<int:course_id>/reorder/",
+                self.admin_site.admin_view(self.reorder_view),
+                name="main_course_reorder",
+            ),
+            path(
+                "<int:course_id>/blocks/",
+                self.admin_site.admin_view(self.blocks_view),
+                name="main_course_blocks",
+            ),
+            path(
+                "<int:course_id>/blocks/<str:kind>/<int:pk>/",
+                self.admin_site.admin_view(self.block_content_view),
+                name="main_course_block_content",
+            ),
+        ]
+        return urls + super().get_urls()
+
+    def get_course(self, request, course_id):
+        course = get_object_or_404(Course.objects.only("title"), id=course_id)
+        if not self.has_change_permission(request, course):
+            raise PermissionDenied
+        return course
+
+    @staticmethod
+    def get_outline(course_id, blocks=None):
+        """Blocks (all or given page) with subblocks, titles only"""
+        if blocks is None:
+            blocks = (
+                Block.objects.filter(course_id=course_id)
+                .only("title", "order")
+                .order_by("order")
+            )
+        blocks = list(blocks)
+        subblocks = (
+            SubBlock.objects.filter(block__in=blocks)
+            .only("title", "order", "block_id")
+            .order_by("order")
+        )
+        block_subblocks = {block.id: [] for block in blocks}
+        for subblock in subblocks:
+            block_subblocks[subblock.block_id].append(subblock)
+        return [(block, block_subblocks[block.id]) for block in blocks]
+
+    @method_decorator(require_http_methods(["GET", "POST"]))
+    def reorder_view(self, request, course_id):
+        """Drag-and-drop order of blocks and subblocks, saved at once"""
+        course = self.get_course(request, course_id)
+
+        if request.method == "POST":
+            try:
+                outline = json.loads(request.body)["blocks"]
+                reorder_course(course.id, outline)
+            except (json.JSONDecodeError, KeyError, TypeError):
+                return JsonResponse({"error": "Неверный JSON"}, status=400)
+            except ValidationError as e:
+                return JsonResponse({"error": e.messages[0]}, status=400)
+            return JsonResponse({"status": "ok"})
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "course": course,
+            "outline": self.get_outline(course.id),
+            "title": f"Порядок блоков: {course.title}",
+        }
+        return render(request, "admin/main/course/reorder.html", context)
+
+    def blocks_view(self, request, course_id):
+        """Course editor: page of blocks with subblocks, titles only"""
+        course = self.get_course(request, course_id)
+        blocks = (
+            Block.objects.filter(course_id=course.id)
+            .only("title", "order")
+            .order_by("order")
+        )
+        page = Paginator(blocks, BLOCKS_PER_PAGE).get_page(request.GET.get("page"))
+
+        context = {
+            **self.admin_site.each_context(request),
+            "opts": self.model._meta,
+            "course": course,
+            "page": page,
+            "outline": self.get_outline(course.id, page.object_list),
+            "title": f"Блоки курса: {course.title}",
+        }
+        return render(request, "admin/main/course/blocks.html", context)
+
+    @method_decorator(require_http_methods(["GET", "POST"]))
+    def block_content_view(self, request, course_id, kind, pk):
+        """
+        HTMX: GET returns form of one block or subblock, POST saves changed
+        fields only and returns row with title. GET with cancel returns row.
+        """
+        course = self.get_course(request, course_id)
+        if kind == "block":
+            queryset = Block.objects.filter(course_id=course.id)
+        elif kind == "subblock":
+            queryset = SubBlock.objects.filter(block__course_id=course.id)
+        else:
+            raise Http404
+
+        context = {"course": course, "kind": kind}
+        if request.method == "GET" and "cancel" in request.GET:
+            context["item"] = get_object_or_404(queryset.only("title"), pk=pk)
+            return render(request, "admin/main/course/partials/block_row.html", context)
+
+        item = get_object_or_404(queryset, pk=pk)
+        form_class = forms.modelform_factory(queryset.model, form=BlockContentForm)
+        form = form_class(request.POST or None, instance=item)
+        if request.method == "POST" and form.is_valid():
+            if form.has_changed():
+                form.save(commit=False).save(update_fields=form.changed_data)
+            context["item"] = item
+            return render(request, "admin/main/course/partials/block_row.html", context)
+
+        context.update(item=item, form=form)
+        return render(request, "admin/main/course/partials/block_form.html", context)
 
 
 @admin.register(CourseProfile)
@@ -42,9 +178,32 @@ class BlockAdmin(admin.ModelAdmin):
     search_fields = ("title", "content")
     inlines = [SubBlockInline]
 
+    def save_related(self, request, form, formsets, change):
+        # Subblocks of inlines touch the course once
+        with Course.objects.touch_once():
+            super().save_related(request, form, formsets, change)
+
+    def delete_queryset(self, request, queryset):
+        course_ids = set(queryset.values_list("course_id", flat=True))
+        super().delete_queryset(request, queryset)
+        Course.objects.touch(*course_ids)
+
 
 @admin.register(SubBlock)
 class SubBlockAdmin(admin.ModelAdmin):
     list_display = ("title", "block", "order")
     list_filters = ("block__course", "block")
     search_fields = ("title", "content")
+
+    def delete_queryset(self, request, queryset):
+        course_ids = set(queryset.values_list("block__course_id", flat=True))
+        super().delete_queryset(request, queryset)
+        Course.objects.touch(*course_ids)
+
+
+@admin.register(ReadingProgress)
+class ReadingProgressAdmin(admin.ModelAdmin):
+    list_display = ("user", "course", "percent", "updated_at")
+    list_select_related = ("user", "course")
+    raw_id_fields = ("user", "course", "block", "subblock")
+    search_fields = ("user__email", "course__title")
@@ -1,25 +1,14 @@
-from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
 
-from users.models import CustomUserProfile
+from users.services.caching import get_user_avatar_url
 
 
 def user_avatar(request):
-    """Get user avatar URL with caching"""
-    if not request.user.is_authenticated:
-        return {"avatar_url": None}
+    """Get user avatar URL with caching, only when template uses it"""
 
-    cache_key = f"user_avatar_url_{request.user.id}"
-    avatar_url = cache.get(cache_key, None)
+    def _avatar_url():
+        if not request.user.is_authenticated:
+            return None
+        return get_user_avatar_url(request.user.id)
 
-    if avatar_url:
-        return {"avatar_url": avatar_url}
-
-    try:
-        profile = CustomUserProfile.objects.only("avatar").get(user=request.user)
-        avatar_url = profile.avatar.url if profile.avatar else None
-    except CustomUserProfile.DoesNotExist:
-        avatar_url = None
-
-    cache.set(cache_key, avatar_url, 1800)
-
-    return {"avatar_url": avatar_url}
+    return {"avatar_url": SimpleLazyObject(_avatar_url)}
@@ -1,14 +1,38 @@
+import hashlib
 from functools import wraps
 
-from django.shortcuts import get_object_or_404, render
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.shortcuts import aget_object_or_404, get_object_or_404, render
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
 
+from app.shortcuts import arender
 from main.models import Course
-from orders.services import is_purchased
+from main.services.caching import CONTENT_TEMPLATES_VERSION
+from main.services.progress import record_progress
+from orders.services import ais_purchased, is_purchased
 
 
 def purchase_required(view_func):
     """Decorator. For purchase status checking, with caching"""
 
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def async_wrapper(request, course_id, *args, **kwargs):
+            user = await request.auser()
+            purchase_status = await ais_purchased(user, course_id)
+
+            if not purchase_status:
+                course = await aget_object_or_404(Course, id=course_id)
+                return await arender(
+                    request, "main/access_denied.html", {"course": course}, status=402
+                )
+
+            return await view_func(request, course_id, *args, **kwargs)
+
+        return async_wrapper
+
     @wraps(view_func)
     def wrapper(request, course_id, *args, **kwargs):
         purchase_status = is_purchased(request.user, course_id)
@@ -22,3 +46,109 @@ def purchase_required(view_func):
         return view_func(request, course_id, *args, **kwargs)
 
     return wrapper
+
+
+def track_progress(view_func):
+    """
+    Decorator. Record reading position: the block (subblock) after which next
+    content is requested was reached. Goes after purchase_required and before
+    conditional_content, so revalidated requests are recorded too.
+    """
+
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def async_wrapper(request, course_id, current_block_id, **kwargs):
+            user = await request.auser()
+            await sync_to_async(record_progress)(
+                user.pk, course_id, current_block_id, kwargs.get("current_subblock_id")
+            )
+            return await view_func(request, course_id, current_block_id, **kwargs)
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, course_id, current_block_id, **kwargs):
+        record_progress(
+            request.user.pk,
+            course_id,
+            current_block_id,
+            kwargs.get("current_subblock_id"),
+        )
+        return view_func(request, course_id, current_block_id, **kwargs)
+
+    return wrapper
+
+
+def _content_etag(course_id, updated_at, user_id) -> str:
+    """Weak ETag (responses are compressed), pages have user header"""
+    key = f"{CONTENT_TEMPLATES_VERSION}:{course_id}:{updated_at.isoformat()}:{user_id}"
+    return f'W/"{hashlib.sha1(key.encode()).hexdigest()}"'  # noqa: S324
+
+
+def _conditional_response(request, course_id, updated_at, user_id):
+    """304 response or None, and headers for full response"""
+    etag = _content_etag(course_id, updated_at, user_id)
+    last_modified = int(updated_at.timestamp())
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    headers = {"ETag": etag, "Last-Modified": http_date(last_modified)}
+    return response, headers
+
+
+def _set_content_headers(request, response, headers) -> None:
+    if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+        for header, value in headers.items():
+            response.headers.setdefault(header, value)
+    # Stored by browser only, revalidated on every visit
+    patch_cache_control(response, private=True, no_cache=True)
+
+
+def _course_updated_at(course_id):
+    return Course.objects.filter(id=course_id).values_list(
+        "content_updated_at", flat=True
+    )
+
+
+def conditional_content(view_func):
+    """
+    Decorator. 304 Not Modified for course content which hasn't changed since
+    the client's copy (ETag from Course.content_updated_at and user), before
+    the view queries and renders content. Only for content partials: full pages
+    have header (avatar, nav) which changes with the profile. Goes after
+    purchase_required.
+    """
+
+    if iscoroutinefunction(view_func):
+
+        @wraps(view_func)
+        async def async_wrapper(request, course_id, *args, **kwargs):
+            updated_at = await _course_updated_at(course_id).afirst()
+            if updated_at is None:
+                return await view_func(request, course_id, *args, **kwargs)
+
+            user = await request.auser()
+            response, headers = _conditional_response(
+                request, course_id, updated_at, user.pk
+            )
+            if response is None:
+                response = await view_func(request, course_id, *args, **kwargs)
+            _set_content_headers(request, response, headers)
+            return response
+
+        return async_wrapper
+
+    @wraps(view_func)
+    def wrapper(request, course_id, *args, **kwargs):
+        updated_at = _course_updated_at(course_id).first()
+        if updated_at is None:
+            return view_func(request, course_id, *args, **kwargs)
+
+        response, headers = _conditional_response(
+            request, course_id, updated_at, request.user.pk
+        )
+        if response is None:
+            response = view_func(request, course_id, *args, **kwargs)
+        _set_content_headers(request, response, headers)
+        return response
+
+    return wrapper
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Course
+from main.services.bundles import build_course_bundle, prune_course_bundles
+
+
+class Command(BaseCommand):
+    help = (
+        "Build bundles of current course versions and delete old ones "
+        "(run after course imports, bundles are also built on first request)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("course_ids", nargs="*", type=int, help="All if empty")
+
+    def handle(self, *args, course_ids, **options):
+        if not course_ids:
+            course_ids = Course.objects.order_by("id").values_list("id", flat=True)
+
+        built = pruned = 0
+        for course_id in course_ids:
+            name = build_course_bundle(course_id)
+            pruned += prune_course_bundles(course_id, keep=name)
+            built += 1
+        self.stdout.write(
+            self.style.SUCCESS(f"Bundles built: {built}, old deleted: {pruned}")
+        )
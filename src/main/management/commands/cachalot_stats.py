@@ -0,0 +1,41 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from app import metrics
+from app.querycache import table_memory
+
+
+class Command(BaseCommand):
+    help = "Show Redis memory of cached ORM queries per table, publish it as metrics"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--publish",
+            action="store_true",
+            help="Store as cachalot_query_keys/bytes gauges (run periodically)",
+        )
+        parser.add_argument("--ttl", type=int, default=300, help="Gauges TTL, seconds")
+
+    def handle(self, *args, publish, ttl, **options):
+        alias = getattr(settings, "CACHALOT_CACHE", "default")
+        stats = table_memory(alias)
+        if not stats:
+            self.stdout.write("No cached queries (or cache isn't django-redis)")
+
+        for table, table_stats in sorted(stats.items()):
+            self.stdout.write(
+                f"{table:<30} {table_stats['keys']:>8} keys "
+                f"{table_stats['bytes'] / 1024:>10.1f} KiB"
+            )
+
+        if publish:
+            gauges = []
+            for table, table_stats in stats.items():
+                gauges.append(
+                    ("cachalot_query_keys", {"table": table}, table_stats["keys"])
+                )
+                gauges.append(
+                    ("cachalot_query_bytes", {"table": table}, table_stats["bytes"])
+                )
+            metrics.publish_gauges("cachalot", gauges, ttl)
+            self.stdout.write(self.style.SUCCESS(f"Tables published: {len(stats)}"))
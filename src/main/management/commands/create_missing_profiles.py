@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import Course
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = "Create default profiles of courses and users without them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, batch_size, **options):
+        for model in [Course, CustomUser]:
+            with transaction.atomic():
+                created = model.objects.create_missing_profiles(batch_size)
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{model._meta.verbose_name_plural}: created {created} profiles"
+                )
+            )
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.services.progress import BATCH_SIZE, flush_reading_progress
+
+
+class Command(BaseCommand):
+    help = "Save buffered reading positions of users (run periodically)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        saved = flush_reading_progress(batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Positions saved: {saved}"))
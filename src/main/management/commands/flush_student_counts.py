@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from main.services.students import BATCH_SIZE, flush_student_counts
+
+
+class Command(BaseCommand):
+    help = "Apply buffered numbers of students to course profiles (run periodically)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, batch_size, **options):
+        updated = flush_student_counts(batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Courses updated: {updated}"))
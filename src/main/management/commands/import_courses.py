@@ -0,0 +1,34 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.services.importing import BATCH_SIZE, import_courses
+
+
+class Command(BaseCommand):
+    help = (
+        "Create or update courses from markdown files of a directory tree "
+        "(one file is one course, ## headings are blocks, ### are subblocks)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("directory")
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=BATCH_SIZE,
+            help="Files read and saved at once",
+        )
+
+    def handle(self, *args, directory, batch_size, **options):
+        root = Path(directory)
+        if not root.is_dir():
+            raise CommandError(f"Directory not found: {root}")
+
+        stats = import_courses(root, batch_size)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Created: {stats['created']}, updated: {stats['updated']}, "
+                f"unchanged: {stats['skipped']}"
+            )
+        )
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, Window
+from django.db.models.functions import Lag
+
+from main.models import ORDER_GAP, Block, SubBlock
+
+
+class Command(BaseCommand):
+    help = "Renumber blocks and subblocks with too small gaps between neighbours"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-gap",
+            type=int,
+            default=ORDER_GAP // 64,
+            help="Rebalance siblings with a smaller gap between two of them",
+        )
+        parser.add_argument(
+            "--all",
+            action="store_true",
+            dest="rebalance_all",
+            help="Rebalance all blocks and subblocks",
+        )
+
+    def handle(self, *args, min_gap, rebalance_all, **options):
+        for model in [Block, SubBlock]:
+            parent_field = f"{model.order_parent}_id"
+            parent_ids = self.get_parent_ids(
+                model, parent_field, min_gap, rebalance_all
+            )
+            for parent_id in parent_ids:
+                with transaction.atomic():
+                    model.objects.rebalance({parent_field: parent_id})
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f"{model._meta.verbose_name_plural}: rebalanced {len(parent_ids)}"
+                )
+            )
+
+    def get_parent_ids(self, model, parent_field, min_gap, rebalance_all) -> set:
+        if rebalance_all:
+            return set(model.objects.values_list(parent_field, flat=True))
+
+        # Gap to previous sibling, first sibling is compared with 0
+        previous_order = Window(
+            Lag("order", default=0),
+            partition_by=[F(parent_field)],
+            order_by=F("order").asc(),
+        )
+        tight = (
+            model.objects.annotate(gap=F("order") - previous_order)
+            .filter(gap__lt=min_gap)
+            .values_list(parent_field, flat=True)
+        )
+        return set(tight)
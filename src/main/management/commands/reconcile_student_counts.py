@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main.services.students import reconcile_student_counts
+
+
+class Command(BaseCommand):
+    help = "Recompute numbers of students of all courses from completed orders"
+
+    def handle(self, *args, **options):
+        updated = reconcile_student_counts()
+        if updated is None:
+            raise CommandError("Student counts are being flushed, try again later")
+        self.stdout.write(self.style.SUCCESS(f"Course profiles updated: {updated}"))
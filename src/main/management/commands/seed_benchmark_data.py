@@ -0,0 +1,253 @@
+import json
+import random
+from importlib import import_module
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from main.models import (
+    ORDER_GAP,
+    Block,
+    Course,
+    CourseProfile,
+    SubBlock,
+    render_content,
+)
+from main.services.importing import parse_markdown
+from orders.models import Order
+from users.models import CustomUser
+
+BENCH_TITLE_PREFIX = "[bench] "
+BENCH_EMAIL_DOMAIN = "bench.local"
+CONTENT_DIR = settings.BASE_DIR.parent / "course-content-example"
+DEFAULT_OUTPUT = settings.BASE_DIR.parent / "benchmarks" / "data.json"
+BATCH_SIZE = 1000
+
+# Words for search requests, found in example courses
+SEARCH_QUERIES = ["python", "javascript", "машинное", "основы", "данных", "курс"]
+
+
+def load_example_courses() -> list[tuple[str, list[dict]]]:
+    examples = [
+        (path.stem.replace("_", " ").capitalize(), parse_markdown(path.read_text()))
+        for path in sorted(Path(CONTENT_DIR).glob("*.markdown"))
+    ]
+    # Rendered once, sections are repeated in many courses
+    for _, blocks in examples:
+        for section in [
+            *blocks,
+            *(sub for block in blocks for sub in block["subblocks"]),
+        ]:
+            section["rendered_content"] = render_content(section["content"])
+    return examples
+
+
+def create_session(user) -> str:
+    """Logged in session of user, return its cookie"""
+    engine = import_module(settings.SESSION_ENGINE)
+    session = engine.SessionStore()
+    session[SESSION_KEY] = str(user.pk)
+    session[BACKEND_SESSION_KEY] = "django.contrib.auth.backends.ModelBackend"
+    session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+    session.create()
+    return f"{settings.SESSION_COOKIE_NAME}={session.session_key}"
+
+
+class Command(BaseCommand):
+    help = "Create courses, users, orders and sessions for benchmarks/load_test.py"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--courses", type=int, default=2000)
+        parser.add_argument(
+            "--depth",
+            type=int,
+            default=3,
+            help="Example course texts in one course (more blocks)",
+        )
+        parser.add_argument("--users", type=int, default=1000)
+        parser.add_argument(
+            "--orders", type=int, default=5, help="Bought courses per user"
+        )
+        parser.add_argument(
+            "--sessions", type=int, default=200, help="Users logged in for load test"
+        )
+        parser.add_argument("--output", default=str(DEFAULT_OUTPUT))
+        parser.add_argument("--seed", type=int, default=42)
+        parser.add_argument(
+            "--clear", action="store_true", help="Delete previously seeded data"
+        )
+
+    def handle(self, *args, **options):
+        rnd = random.Random(options["seed"])  # noqa: S311
+
+        with transaction.atomic():
+            if options["clear"]:
+                self.clear()
+            course_ids = self.create_courses(options["courses"], options["depth"], rnd)
+            users = self.create_users(options["users"])
+            orders = self.create_orders(users, course_ids, options["orders"], rnd)
+
+        data = self.build_data(users[: options["sessions"]], course_ids, orders)
+        Path(options["output"]).write_text(json.dumps(data, ensure_ascii=False))
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Courses: {len(course_ids)}, users: {len(users)}, "
+                f"orders: {len(orders)}, data: {options['output']}"
+            )
+        )
+
+    def clear(self):
+        Course.objects.filter(title__startswith=BENCH_TITLE_PREFIX).delete()
+        CustomUser.objects.filter(email__endswith=f"@{BENCH_EMAIL_DOMAIN}").delete()
+
+    def create_courses(self, count: int, depth: int, rnd) -> list[int]:
+        examples = load_example_courses()
+
+        courses = []
+        for i in range(count):
+            course = Course(
+                title=f"{BENCH_TITLE_PREFIX}{examples[i % len(examples)][0]} {i}",
+                description=f"Курс для нагрузочного теста номер {i}",
+                price=rnd.choice([99, 129.90, 499, 1990]),
+            )
+            course.course_profile = CourseProfile(
+                hours_to_complete=rnd.randint(1, 200),
+                number_of_students=rnd.randint(0, 5000),
+            )
+            courses.append(course)
+        Course.objects.bulk_create_with_profiles(courses, batch_size=BATCH_SIZE)
+
+        blocks, subblocks_by_block = [], []
+        for course in courses:
+            sections = [
+                block for _ in range(depth) for block in rnd.choice(examples)[1]
+            ]
+            for order, section in enumerate(sections, 1):
+                blocks.append(
+                    Block(
+                        course=course,
+                        title=section["title"],
+                        content=section["content"],
+                        rendered_content=section["rendered_content"],
+                        order=order * ORDER_GAP,
+                    )
+                )
+                subblocks_by_block.append(section["subblocks"])
+        Block.objects.bulk_create(blocks, batch_size=BATCH_SIZE)
+
+        SubBlock.objects.bulk_create(
+            [
+                SubBlock(
+                    block=block,
+                    title=subblock["title"],
+                    content=subblock["content"],
+                    rendered_content=subblock["rendered_content"],
+                    order=order * ORDER_GAP,
+                )
+                for block, subblocks in zip(blocks, subblocks_by_block)
+                for order, subblock in enumerate(subblocks, 1)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return [course.id for course in courses]
+
+    def create_users(self, count: int) -> list[CustomUser]:
+        # One hash for all users, hashing is slow on purpose
+        password = make_password("bench-password")
+        start = CustomUser.objects.filter(
+            email__endswith=f"@{BENCH_EMAIL_DOMAIN}"
+        ).count()
+        users = CustomUser.objects.bulk_create_with_profiles(
+            [
+                CustomUser(
+                    email=f"user{start + i}@{BENCH_EMAIL_DOMAIN}",
+                    first_name="Нагрузка",
+                    last_name=f"Тест{i}",
+                    password=password,
+                    email_verified=True,
+                )
+                for i in range(count)
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        return users
+
+    def create_orders(self, users, course_ids, per_user: int, rnd) -> list[Order]:
+        orders = []
+        for user in users:
+            bought = rnd.sample(course_ids, min(per_user + 1, len(course_ids)))
+            for course_id in bought[:-1]:
+                orders.append(
+                    Order(
+                        user=user,
+                        course_id=course_id,
+                        total_price=129.90,
+                        status="completed",
+                    )
+                )
+            # Pending order is completed by webhook requests
+            orders.append(
+                Order(
+                    user=user,
+                    course_id=bought[-1],
+                    total_price=129.90,
+                    status="pending",
+                    yookassa_payment_id=f"bench-{user.pk}",
+                )
+            )
+        return Order.objects.bulk_create(orders, batch_size=BATCH_SIZE)
+
+    def build_data(self, users, course_ids, orders) -> dict:
+        """Requests data for load test: session cookies and ids"""
+        first_blocks = dict(
+            Block.objects.filter(course_id__in=course_ids, order=ORDER_GAP).values_list(
+                "course_id", "id"
+            )
+        )
+        user_orders: dict[int, list[Order]] = {}
+        for order in orders:
+            user_orders.setdefault(order.user_id, []).append(order)
+
+        users_data = []
+        for user in users:
+            completed = [
+                order for order in user_orders[user.pk] if order.status == "completed"
+            ]
+            pending = [
+                order for order in user_orders[user.pk] if order.status == "pending"
+            ]
+            bought = {order.course_id for order in completed}
+            users_data.append(
+                {
+                    "cookie": create_session(user),
+                    "purchased": [
+                        {
+                            "course_id": order.course_id,
+                            "block_id": first_blocks.get(order.course_id),
+                        }
+                        for order in completed
+                    ],
+                    "not_purchased": [
+                        course_id
+                        for course_id in course_ids[:50]
+                        if course_id not in bought
+                    ],
+                    "pending_orders": [
+                        {
+                            "order_id": order.pk,
+                            "user_id": user.pk,
+                            "payment_id": order.yookassa_payment_id,
+                        }
+                        for order in pending
+                    ],
+                }
+            )
+        return {
+            "course_ids": course_ids,
+            "search_queries": SEARCH_QUERIES,
+            "users": users_data,
+        }
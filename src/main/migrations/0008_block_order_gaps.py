@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0007_alter_block_options_alter_subblock_options"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="block",
+            name="order",
+            field=models.PositiveIntegerField(blank=True, verbose_name="Порядок"),
+        ),
+    ]
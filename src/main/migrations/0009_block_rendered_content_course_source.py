@@ -0,0 +1,52 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:52
+
+from django.db import migrations, models
+
+# Template filter, not main.models: migrations don't import current models
+from main.templatetags.format_text import format_text
+
+
+def render_contents(apps, schema_editor):
+    for model_name in ["Block", "SubBlock"]:
+        model = apps.get_model("main", model_name)
+        rows = []
+        for row in model.objects.only("content").iterator(chunk_size=1000):
+            row.rendered_content = str(format_text(row.content))
+            rows.append(row)
+            if len(rows) == 1000:
+                model.objects.bulk_update(rows, ["rendered_content"])
+                rows = []
+        model.objects.bulk_update(rows, ["rendered_content"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0008_block_order_gaps"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="block",
+            name="rendered_content",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="source_hash",
+            field=models.CharField(blank=True, editable=False, max_length=64),
+        ),
+        migrations.AddField(
+            model_name="course",
+            name="source_path",
+            field=models.CharField(
+                blank=True, db_index=True, editable=False, max_length=255
+            ),
+        ),
+        migrations.AddField(
+            model_name="subblock",
+            name="rendered_content",
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.RunPython(render_contents, migrations.RunPython.noop),
+    ]
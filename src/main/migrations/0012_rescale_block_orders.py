@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-20 09:12
+
+from django.db import migrations
+from django.db.models import Count, F, Max
+
+# main.models.ORDER_GAP when gapped ordering was introduced (0008)
+ORDER_GAP = 1024
+BATCH_SIZE = 1000
+
+
+def rescale_orders(apps, schema_editor):
+    """Renumber siblings ORDER_GAP apart, keeping their sequence"""
+    for model_name, parent_field in [("Block", "course_id"), ("SubBlock", "block_id")]:
+        model = apps.get_model("main", model_name)
+        rows = model.objects.order_by()
+        stats = rows.aggregate(max_order=Max("order"))
+        counts = rows.values(parent_field).annotate(count=Count("pk")).order_by()
+        max_count = max((group["count"] for group in counts), default=0)
+        if not max_count:
+            continue
+
+        # Unique (parent, order): all rows are moved above old and new orders first
+        offset = max(stats["max_order"], max_count * ORDER_GAP) + 1
+        rows.update(order=F("order") + offset)
+
+        batch = []
+        parent, number = None, 0
+        for row in rows.order_by(parent_field, "order").only(parent_field, "order"):
+            if getattr(row, parent_field) != parent:
+                parent, number = getattr(row, parent_field), 0
+            number += 1
+            row.order = number * ORDER_GAP
+            batch.append(row)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_update(batch, ["order"])
+                batch = []
+        model.objects.bulk_update(batch, ["order"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("main", "0011_course_content_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(rescale_orders, migrations.RunPython.noop),
+    ]
@@ -1,9 +1,62 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
 from typing import Optional
 
+from django.conf import settings
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
+from django.db import connections, models, router
+from django.db.models import Count, F, Max, Window
+from django.db.models.functions import RowNumber
+from django.dispatch import Signal
+from django.utils import timezone
 from django_resized import ResizedImageField
 
+from app.models import ProfileManagerMixin
+from main.templatetags.format_text import format_text
+
+# Sent with course_ids after content (blocks, subblocks, their order) changed
+course_content_changed = Signal()
+
+# Courses touched inside CourseManager.touch_once, None outside it
+_deferred_touches: ContextVar[Optional[set]] = ContextVar(
+    "deferred_touches", default=None
+)
+
+
+class CourseManager(ProfileManagerMixin, models.Manager):
+    profile_field = "course_profile"
+
+    def touch(self, *course_ids) -> None:
+        """
+        Content of courses changed: new content_updated_at, so new content
+        ETag. updated_at (catalog order) is kept.
+        """
+        deferred = _deferred_touches.get()
+        if deferred is not None:
+            deferred.update(course_ids)
+            return
+        self.filter(id__in=course_ids).update(content_updated_at=timezone.now())
+        course_content_changed.send(sender=self.model, course_ids=course_ids)
+
+    @contextmanager
+    def touch_once(self):
+        """
+        Touch courses changed by saves and deletes of many blocks and subblocks
+        once, at the end of the block (one UPDATE and signal)
+        """
+        if _deferred_touches.get() is not None:
+            yield
+            return
+
+        course_ids: set = set()
+        token = _deferred_touches.set(course_ids)
+        try:
+            yield
+        finally:
+            _deferred_touches.reset(token)
+        if course_ids:
+            self.touch(*course_ids)
+
 
 class Course(models.Model):
     title = models.CharField(max_length=100, verbose_name="Название курса")
@@ -16,6 +69,18 @@ class Course(models.Model):
 
     created_at = models.DateTimeField(auto_now_add=True, verbose_name="Дата создания")
     updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+    # Version of course page content: course, its blocks and subblocks
+    content_updated_at = models.DateTimeField(
+        auto_now=True, verbose_name="Дата изменения содержимого"
+    )
+
+    # Markdown file of imported course (import_courses), path relative to import root
+    source_path = models.CharField(
+        max_length=255, blank=True, db_index=True, editable=False
+    )
+    source_hash = models.CharField(max_length=64, blank=True, editable=False)
+
+    objects = CourseManager()
 
     class Meta:
         verbose_name = "Курс"
@@ -26,13 +91,10 @@ class Course(models.Model):
         return self.title
 
     def save(self, *args, **kwargs):
-        created = self.pk is None
+        created = self._state.adding
         super().save(*args, **kwargs)
         if created:
-            try:
-                self.course_profile
-            except CourseProfile.DoesNotExist:
-                CourseProfile.objects.create(course=self)
+            Course.objects.create_profile(self, using=kwargs.get("using"))
 
 
 class CourseProfile(models.Model):
@@ -67,24 +129,118 @@ class CourseProfile(models.Model):
         return f"Профиль для курса: {self.course.title}"
 
 
-class BlockBaseManager(models.Manager):
-    def get_max_order(self, filter_fields: Optional[dict] = None):
-        filter_fields = filter_fields or {}
+# Siblings are created ORDER_GAP apart, so a block can be put between two others
+ORDER_GAP = 1024
+
+
+def render_content(text: str) -> str:
+    """HTML of block content, stored on save instead of rendering every request"""
+    return str(format_text(text))
 
-        result = self.only("order").filter(**filter_fields).order_by("order").last()
-        max_order = result.order
-        return max_order
 
-    def do_reordering(self, filter_fields: Optional[dict] = None):
+def _render_on_save(obj, save_kwargs: dict) -> None:
+    """Render content of block or subblock saved with its content"""
+    update_fields = save_kwargs.get("update_fields")
+    if update_fields is None:
+        if "content" in obj.get_deferred_fields():
+            return
+    elif "content" not in update_fields:
+        return
+    else:
+        save_kwargs["update_fields"] = {*update_fields, "rendered_content"}
+    obj.rendered_content = render_content(obj.content)
+
+
+class BlockBaseManager(models.Manager):
+    """
+    Gapped ordering: insert, move and delete change only one row.
+    Siblings are renumbered (rebalanced) only when no gap is left
+    between two neighbours, or by rebalance_block_orders command.
+    """
+
+    def get_max_order(self, filter_fields: Optional[dict] = None):
         filter_fields = filter_fields or {}
 
-        course_subblocks = list(
-            self.only("order").filter(**filter_fields).order_by("order")
+        max_order = (
+            self._for_write().filter(**filter_fields).aggregate(max_order=Max("order"))
         )
-        for index, subblock in enumerate(course_subblocks, 1):
-            if subblock.order != index:
-                subblock.order = index
-        self.bulk_update(course_subblocks, ["order"])
+        return max_order["max_order"] or 0
+
+    def get_next_order(self, filter_fields: Optional[dict] = None) -> int:
+        return self.get_max_order(filter_fields) + ORDER_GAP
+
+    def _for_write(self):
+        """Orders are read to be written, so replica lag must not be seen"""
+        return self.using(router.db_for_write(self.model))
+
+    def _siblings_filter(self, obj) -> dict:
+        parent_field = f"{self.model.order_parent}_id"
+        return {parent_field: getattr(obj, parent_field)}
+
+    def _order_after(self, obj, after) -> Optional[int]:
+        """Free order between after (or start) and its next sibling"""
+        low = after.order if after else 0
+        next_sibling = (
+            self._for_write()
+            .only("order")
+            .filter(**self._siblings_filter(obj), order__gt=low)
+            .exclude(pk=obj.pk)
+            .order_by("order")
+            .first()
+        )
+        if next_sibling is None:
+            return low + ORDER_GAP
+        if next_sibling.order - low < 2:
+            return None
+        return (low + next_sibling.order) // 2
+
+    def move_after(self, obj, after=None) -> None:
+        """Put obj right after sibling after (first, when None)"""
+        order = self._order_after(obj, after)
+        if order is None:
+            self.rebalance(self._siblings_filter(obj))
+            if after is not None:
+                after.refresh_from_db(fields=["order"])
+            order = self._order_after(obj, after)
+
+        obj.order = order
+        if obj.pk is not None:
+            self.filter(pk=obj.pk).update(order=order)
+            obj.touch_course()
+
+    def rebalance(self, filter_fields: Optional[dict] = None, gap=ORDER_GAP) -> None:
+        """
+        Renumber siblings gap apart keeping their sequence,
+        in constant number of queries (aggregate and two UPDATE statements)
+        """
+        siblings = self._for_write().filter(**(filter_fields or {})).order_by()
+        stats = siblings.aggregate(max_order=Max("order"), count=Count("pk"))
+        if not stats["count"]:
+            return
+
+        # Unique (parent, order) is checked per row, so first all rows are moved
+        # above both old and new orders, then numbered in place
+        offset = max(stats["max_order"], stats["count"] * gap) + 1
+        siblings.update(order=F("order") + offset)
+
+        numbered = siblings.annotate(
+            row_number=Window(RowNumber(), order_by=F("order").asc())
+        ).values("pk", "row_number")
+        numbered_sql, params = numbered.query.sql_with_params()
+
+        connection = connections[siblings.db]
+        quote = connection.ops.quote_name
+        table = quote(self.model._meta.db_table)
+        pk = quote(self.model._meta.pk.column)
+        # Only quoted names are formatted in, values are parameters
+        sql = (
+            f"UPDATE {table} SET {quote('order')} = "  # noqa: S608
+            f"numbered.{quote('row_number')} * %s "
+            f"FROM ({numbered_sql}) AS numbered "
+            f"WHERE {table}.{pk} = numbered.{quote('pk')}"
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(sql, (gap, *params))
 
 
 class Block(models.Model):
@@ -93,12 +249,11 @@ class Block(models.Model):
     )
     title = models.CharField(max_length=200, verbose_name="Название блока")
     content = models.TextField(verbose_name="Содержимое блока")
-    order = models.PositiveIntegerField(
-        default=0,
-        verbose_name="Порядок",
-    )
+    rendered_content = models.TextField(blank=True, editable=False)
+    order = models.PositiveIntegerField(blank=True, verbose_name="Порядок")
 
     objects = BlockBaseManager()
+    order_parent = "course"
 
     class Meta:
         verbose_name = "Блок"
@@ -111,17 +266,19 @@ class Block(models.Model):
 
     def save(self, *args, **kwargs):
         if self.pk is None and self.order is None:
-            max_order = Block.objects.get_max_order({"course": self.course})
-            self.order = max_order + 1
+            self.order = Block.objects.get_next_order({"course": self.course})
 
+        _render_on_save(self, kwargs)
         super().save(*args, **kwargs)
+        self.touch_course()
 
     def delete(self, *args, **kwargs):
-        course = self.course
-        # For order resetting
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+        self.touch_course()
+        return result
 
-        Block.objects.do_reordering({"course": course})
+    def touch_course(self) -> None:
+        Course.objects.touch(self.course_id)
 
 
 class SubBlock(models.Model):
@@ -130,9 +287,11 @@ class SubBlock(models.Model):
     )
     title = models.CharField(max_length=200, verbose_name="Название подблока")
     content = models.TextField(verbose_name="Содержимое подблока")
+    rendered_content = models.TextField(blank=True, editable=False)
     order = models.PositiveIntegerField(blank=True, verbose_name="Порядок")
 
     objects = BlockBaseManager()
+    order_parent = "block"
 
     class Meta:
         verbose_name = "Подблок"
@@ -145,14 +304,61 @@ class SubBlock(models.Model):
 
     def save(self, *args, **kwargs):
         if self.pk is None and self.order is None:
-            max_order = SubBlock.objects.get_max_order({"block": self.block})
-            self.order = max_order + 1
+            self.order = SubBlock.objects.get_next_order({"block": self.block})
 
+        _render_on_save(self, kwargs)
         super().save(*args, **kwargs)
+        self.touch_course()
 
     def delete(self, *args, **kwargs):
-        block = self.block
-        # For order resetting
-        super().delete(*args, **kwargs)
+        result = super().delete(*args, **kwargs)
+        self.touch_course()
+        return result
 
-        SubBlock.objects.do_reordering({"block": block})
+    def touch_course(self) -> None:
+        Course.objects.touch(self.block.course_id)
+
+
+class ReadingProgress(models.Model):
+    """Last read block (and subblock) of a course, see services/progress.py"""
+
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name="reading_progress",
+        verbose_name="Пользователь",
+    )
+    course = models.ForeignKey(
+        Course,
+        on_delete=models.CASCADE,
+        related_name="reading_progress",
+        verbose_name="Курс",
+    )
+    block = models.ForeignKey(
+        Block,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Блок",
+    )
+    subblock = models.ForeignKey(
+        SubBlock,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name="+",
+        verbose_name="Подблок",
+    )
+    percent = models.PositiveSmallIntegerField(
+        default=0, validators=[MaxValueValidator(100)], verbose_name="Пройдено, %"
+    )
+    updated_at = models.DateTimeField(auto_now=True, verbose_name="Дата обновления")
+
+    class Meta:
+        verbose_name = "Прогресс чтения"
+        verbose_name_plural = "Прогресс чтения"
+        unique_together = ("user", "course")
+
+    def __str__(self):
+        return f"{self.user_id} - {self.course_id}: {self.percent}%"
@@ -1 +1,10 @@
-__all__ = ["fetching", "mailing"]
+__all__ = [
+    "bundles",
+    "caching",
+    "fetching",
+    "importing",
+    "mailing",
+    "ordering",
+    "progress",
+    "students",
+]
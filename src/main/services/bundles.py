@@ -0,0 +1,128 @@
+"""
+Course bundles: whole course (outline and rendered parts) in one gzipped
+JSON file, so a client renders the course from one download instead of
+a request per block.
+
+Bundle names are versioned by Course.content_updated_at and templates, so
+a stored bundle never changes and is built once per course version. They
+are kept in the private "bundles" storage and served by short-lived signed
+URLs (S3), or by the bundle view itself (local storage).
+"""
+
+import gzip
+import hashlib
+import json
+from typing import Optional
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import storages
+from django.shortcuts import get_object_or_404
+from django.template.loader import render_to_string
+
+from app.cache import get_or_set_tagged
+from main.models import Course
+from main.services.caching import CONTENT_TEMPLATES_VERSION, course_tag
+from main.services.fetching import get_course_first_content
+
+# Change when bundle structure changes
+BUNDLE_FORMAT = 1
+
+
+def get_bundle_storage():
+    return storages["bundles"]
+
+
+def bundle_name(course_id, updated_at) -> str:
+    key = f"{BUNDLE_FORMAT}:{CONTENT_TEMPLATES_VERSION}:{updated_at.isoformat()}"
+    version = hashlib.sha1(key.encode()).hexdigest()[:16]  # noqa: S324
+    return f"{course_id}/{version}.json.gz"
+
+
+def _render_part(content, content_type: str) -> dict:
+    html = render_to_string(
+        "main/partials/partial_content.html",
+        {"content": content, "content_type": content_type},
+    )
+    return {"id": f"{content_type}-{content.id}", "html": html}
+
+
+def compile_course_bundle(course: Course) -> bytes:
+    """Gzipped JSON of course with prefetched blocks and subblocks"""
+    outline = []
+    parts = []
+    for block in course.blocks.all():
+        subblocks = block.subblocks.all()
+        outline.append(
+            {
+                "id": block.id,
+                "title": block.title,
+                "subblocks": [{"id": sub.id, "title": sub.title} for sub in subblocks],
+            }
+        )
+        parts.append(_render_part(block, "block"))
+        parts.extend(_render_part(subblock, "subblock") for subblock in subblocks)
+
+    bundle = {
+        "format": BUNDLE_FORMAT,
+        "course": {"id": course.id, "title": course.title},
+        "outline": outline,
+        "parts": parts,
+    }
+    data = json.dumps(bundle, ensure_ascii=False, separators=(",", ":"))
+    # mtime=0: same course version compiles to the same bytes
+    return gzip.compress(data.encode(), mtime=0)
+
+
+def build_course_bundle(course_id: int) -> str:
+    """Name of the bundle of current course version, stored if it's missing"""
+    updated_at = get_object_or_404(
+        Course.objects.values_list("content_updated_at", flat=True), id=course_id
+    )
+    name = bundle_name(course_id, updated_at)
+    storage = get_bundle_storage()
+    if storage.exists(name):
+        return name
+
+    course = get_course_first_content(course_id)["course"]
+    return storage.save(name, ContentFile(compile_course_bundle(course)))
+
+
+def bundle_cache_key(course_id) -> str:
+    return f"course_bundle_{course_id}"
+
+
+def get_course_bundle(course_id: int) -> str:
+    """Bundle name, built once per course version"""
+    return get_or_set_tagged(
+        bundle_cache_key(course_id),
+        [course_tag(course_id)],
+        lambda: build_course_bundle(course_id),
+        "course_bundle",
+    )
+
+
+def signed_bundle_url(name: str) -> Optional[str]:
+    """Short-lived URL of bundle, None if storage can't sign URLs"""
+    storage = get_bundle_storage()
+    if not getattr(storage, "querystring_auth", False):
+        return None
+    return storage.url(name, expire=settings.COURSE_BUNDLE_URL_EXPIRE)
+
+
+def read_bundle(name: str) -> bytes:
+    with get_bundle_storage().open(name) as file:
+        return file.read()
+
+
+def prune_course_bundles(course_id: int, keep: str) -> int:
+    """Delete bundles of old course versions, return their number"""
+    storage = get_bundle_storage()
+    try:
+        _, files = storage.listdir(str(course_id))
+    except FileNotFoundError:
+        return 0
+    old = [f"{course_id}/{file}" for file in files if f"{course_id}/{file}" != keep]
+    for name in old:
+        storage.delete(name)
+    return len(old)
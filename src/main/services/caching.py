@@ -0,0 +1,20 @@
+from app.cache import invalidate_tags_on_commit
+
+# Courses and their profiles, shown in catalog
+CATALOG_TAG = "catalog"
+
+# Change when content templates change: new content ETags and course bundles
+CONTENT_TEMPLATES_VERSION = "1"
+
+
+def course_tag(course_id) -> str:
+    """Course, its profile (not numbers of students), blocks and subblocks"""
+    return f"course:{course_id}"
+
+
+def invalidate_catalog() -> None:
+    invalidate_tags_on_commit(CATALOG_TAG)
+
+
+def invalidate_courses(*course_ids) -> None:
+    invalidate_tags_on_commit(*[course_tag(course_id) for course_id in course_ids])
@@ -1,38 +1,121 @@
-from typing import Literal, Union
+from dataclasses import dataclass
+from decimal import Decimal
+from typing import Literal, Optional, Union
 
-from django.db.models import Prefetch, Q
-from django.shortcuts import get_object_or_404
+from django.db.models import Prefetch, Q, QuerySet
+from django.shortcuts import aget_object_or_404, get_object_or_404
 
-from main.models import Block, Course, SubBlock
+from app.cache import aget_or_set_tagged, get_or_set_tagged
+from main.models import Block, Course, CourseProfile, SubBlock
+from main.services.caching import CATALOG_TAG, course_tag
 
+COURSES_LIST_CACHE_KEY = "courses_list"
+COURSE_CARDS_CACHE_KEY = "course_cards"
 
-def get_courses_list():
-    courses = (
+
+@dataclass(frozen=True, slots=True)
+class CourseCard:
+    """Course in listings: fields of its card, cover URL resolved once"""
+
+    id: int
+    title: str
+    description: str
+    price: Decimal
+    hours_to_complete: int
+    number_of_students: int
+    # Empty if course has no cover
+    cover_url: str
+
+
+# Values of CourseCard fields, cover name last
+_CARD_FIELDS = (
+    "id",
+    "title",
+    "description",
+    "price",
+    "course_profile__hours_to_complete",
+    "course_profile__number_of_students",
+    "course_profile__cover",
+)
+
+
+def course_card(row: tuple) -> CourseCard:
+    """Card from values of _CARD_FIELDS"""
+    course_id, title, description, price, hours_to_complete, students, cover = row
+    storage = CourseProfile._meta.get_field("cover").storage
+    return CourseCard(
+        id=course_id,
+        title=title,
+        description=description,
+        price=price,
+        hours_to_complete=hours_to_complete,
+        number_of_students=students,
+        cover_url=storage.url(cover) if cover else "",
+    )
+
+
+def _courses_queryset():
+    return (
         Course.objects.all()
         .select_related("course_profile")
         .defer(
             "created_at",
             "updated_at",
+            "content_updated_at",
         )
     )
-    return courses
 
 
-def get_courses_by_query(query: str):
-    courses = (
-        Course.objects.filter(
-            Q(title__icontains=query) | Q(description__icontains=query)
-        )
-        .select_related("course_profile")
-        .defer(
-            "created_at",
-            "updated_at",
+def get_courses_list(cards: bool = False) -> Union[list[Course], list[CourseCard]]:
+    """All courses (or their cards), cached until catalog changes"""
+    if cards:
+        return get_or_set_tagged(
+            COURSE_CARDS_CACHE_KEY,
+            [CATALOG_TAG],
+            lambda: [
+                course_card(row) for row in Course.objects.values_list(*_CARD_FIELDS)
+            ],
+            "course_cards",
         )
+    return get_or_set_tagged(
+        COURSES_LIST_CACHE_KEY,
+        [CATALOG_TAG],
+        lambda: list(_courses_queryset()),
+        "courses_list",
     )
+
+
+def _search_queryset(query: str, cards: bool):
+    """Courses with query in title or description, values of cards if cards"""
+    courses = _courses_queryset().filter(
+        Q(title__icontains=query) | Q(description__icontains=query)
+    )
+    if cards:
+        return courses.values_list(*_CARD_FIELDS)
     return courses
 
 
-def get_course_first_content(course_id):
+def get_courses_by_query(
+    query: str, cards: bool = False
+) -> Union[QuerySet[Course], list[CourseCard]]:
+    """Courses with query in title or description (or their cards)"""
+    courses = _search_queryset(query, cards)
+    if cards:
+        return [course_card(row) for row in courses]
+    return courses
+
+
+async def aget_courses_by_query(
+    query: str, cards: bool = False
+) -> Union[list[Course], list[CourseCard]]:
+    """Evaluated list, templates can't query db in async context"""
+    courses = _search_queryset(query, cards)
+    if cards:
+        return [course_card(row) async for row in courses]
+    return [course async for course in courses]
+
+
+def _course_content_queryset():
     prefetch_subblock = Prefetch(
         "subblocks",
         queryset=SubBlock.objects.order_by("order"),
@@ -41,11 +124,10 @@ def get_course_first_content(course_id):
         "blocks",
         queryset=Block.objects.prefetch_related(prefetch_subblock).order_by("order"),
     )
-    course = get_object_or_404(
-        Course.objects.prefetch_related(prefetch_block).only("title", "description"),
-        id=course_id,
-    )
+    return Course.objects.prefetch_related(prefetch_block).only("title", "description")
+
 
+def _build_first_content(course: Course):
     first_block = course.blocks.first()
     first_subblock = first_block.subblocks.first() if first_block else None
     first_content = {
@@ -56,35 +138,153 @@ def get_course_first_content(course_id):
     return first_content
 
 
+def first_content_cache_key(course_id) -> str:
+    return f"course_first_content_{course_id}"
+
+
+def get_course_first_content(course_id):
+    """Course with outline, first block and subblock, cached until course changes"""
+
+    def fetch():
+        course = get_object_or_404(_course_content_queryset(), id=course_id)
+        return _build_first_content(course)
+
+    return get_or_set_tagged(
+        first_content_cache_key(course_id),
+        [course_tag(course_id)],
+        fetch,
+        "course_first_content",
+    )
+
+
+async def aget_course_first_content(course_id):
+    """Async version of get_course_first_content"""
+
+    async def fetch():
+        course = await aget_object_or_404(_course_content_queryset(), id=course_id)
+        return _build_first_content(course)
+
+    return await aget_or_set_tagged(
+        first_content_cache_key(course_id),
+        [course_tag(course_id)],
+        fetch,
+        "course_first_content",
+    )
+
+
+def build_content_at(first_content: dict, block_id: int, subblock_id=None) -> dict:
+    """
+    First content of course page moved to block (and subblock), found in
+    prefetched outline. First content if they aren't in the course anymore.
+    """
+    for block in first_content["course"].blocks.all():
+        if block.id != block_id:
+            continue
+        subblock = None
+        if subblock_id is not None:
+            subblocks = [sub for sub in block.subblocks.all() if sub.id == subblock_id]
+            if not subblocks:
+                break
+            subblock = subblocks[0]
+        return {**first_content, "first_block": block, "first_subblock": subblock}
+    return first_content
+
+
+def outline_cache_key(course_id) -> str:
+    return f"course_outline_{course_id}"
+
+
+def get_course_outline(course_id: int) -> list[tuple[int, Optional[int]]]:
+    """
+    Reading order of course: (block_id, None) of every block followed by
+    (block_id, subblock_id) of its subblocks, cached until course changes
+    """
+
+    def fetch():
+        subblocks = {}
+        for block_id, subblock_id in (
+            SubBlock.objects.filter(block__course_id=course_id)
+            .order_by("order")
+            .values_list("block_id", "id")
+        ):
+            subblocks.setdefault(block_id, []).append(subblock_id)
+
+        outline = []
+        for block_id in (
+            Block.objects.filter(course_id=course_id)
+            .order_by("order")
+            .values_list("id", flat=True)
+        ):
+            outline.append((block_id, None))
+            outline.extend((block_id, sub_id) for sub_id in subblocks.get(block_id, []))
+        return outline
+
+    return get_or_set_tagged(
+        outline_cache_key(course_id), [course_tag(course_id)], fetch, "course_outline"
+    )
+
+
 def get_block(block_id: int, only_fields=None) -> Block:
     only_fields = only_fields or []
     block = get_object_or_404(Block.objects.only(*only_fields), id=block_id)
     return block
 
 
+async def aget_block(block_id: int, only_fields=None) -> Block:
+    only_fields = only_fields or []
+    block = await aget_object_or_404(Block.objects.only(*only_fields), id=block_id)
+    return block
+
+
+def _next_block_queryset(current_block, course_id: int):
+    return Block.objects.filter(
+        course__id=course_id, order__gt=current_block.order
+    ).order_by("order")
+
+
 def get_next_block(current_block, course_id: int) -> Block:
-    next_block = (
-        Block.objects.filter(course__id=course_id, order__gt=current_block.order)
-        .order_by("order")
-        .first()
-    )
+    next_block = _next_block_queryset(current_block, course_id).first()
     return next_block
 
 
+async def aget_next_block(current_block, course_id: int) -> Block:
+    next_block = await _next_block_queryset(current_block, course_id).afirst()
+    return next_block
+
+
+def _current_subblock_queryset(block: Block, current_subblock_id):
+    return SubBlock.objects.only("order").filter(
+        id=current_subblock_id, block__id=block.id
+    )
+
+
+def _next_subblock_queryset(block: Block, current_subblock=None):
+    if current_subblock:
+        subblocks = SubBlock.objects.filter(
+            block=block.id, order__gt=current_subblock.order
+        )
+    else:
+        subblocks = SubBlock.objects.filter(block__id=block.id)
+    return subblocks.order_by("order")
+
+
 def get_next_subblock(block: Block, current_subblock_id=None) -> SubBlock:
+    current_subblock = None
     if current_subblock_id:
         current_subblock = get_object_or_404(
-            SubBlock.objects.only("order"), id=current_subblock_id, block__id=block.id
+            _current_subblock_queryset(block, current_subblock_id)
         )
-        next_subblock = (
-            SubBlock.objects.filter(block=block.id, order__gt=current_subblock.order)
-            .order_by("order")
-            .first()
-        )
-    else:
-        next_subblock = (
-            SubBlock.objects.filter(block__id=block.id).order_by("order").first()
+    next_subblock = _next_subblock_queryset(block, current_subblock).first()
+    return next_subblock
+
+
+async def aget_next_subblock(block: Block, current_subblock_id=None) -> SubBlock:
+    current_subblock = None
+    if current_subblock_id:
+        current_subblock = await aget_object_or_404(
+            _current_subblock_queryset(block, current_subblock_id)
         )
+    next_subblock = await _next_subblock_queryset(block, current_subblock).afirst()
     return next_subblock
 
 
@@ -105,6 +305,40 @@ def build_next_content(
     return next_content
 
 
+def next_content_cache_key(course_id, block_id, subblock_id=None) -> str:
+    return f"course_next_content_{course_id}_{block_id}_{subblock_id}"
+
+
+async def aget_next_content(
+    course_id: int, current_block_id: int, current_subblock_id=None
+):
+    """
+    Next subblock of current block, or else next block of course (None after
+    the last one), cached until course changes
+    """
+
+    async def fetch():
+        current_block = await aget_object_or_404(
+            Block.objects.only("order"), id=current_block_id, course_id=course_id
+        )
+        next_subblock = await aget_next_subblock(current_block, current_subblock_id)
+        if next_subblock:
+            return build_next_content(
+                next_subblock, "subblock", course_id, current_block_id
+            )
+        next_block = await aget_next_block(current_block, course_id)
+        if next_block:
+            return build_next_content(next_block, "block", course_id, next_block.id)
+        return None
+
+    return await aget_or_set_tagged(
+        next_content_cache_key(course_id, current_block_id, current_subblock_id),
+        [course_tag(course_id)],
+        fetch,
+        "course_next_content",
+    )
+
+
 def get_example_team_members():
     # Example members, change if needed
     members = [
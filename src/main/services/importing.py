@@ -0,0 +1,188 @@
+import hashlib
+from collections import Counter
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator
+
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import (
+    ORDER_GAP,
+    Block,
+    Course,
+    SubBlock,
+    render_content,
+)
+from main.services.caching import invalidate_catalog, invalidate_courses
+
+MARKDOWN_SUFFIXES = (".md", ".markdown")
+BATCH_SIZE = 50
+
+TITLE_LENGTH = Course._meta.get_field("title").max_length
+DESCRIPTION_LENGTH = Course._meta.get_field("description").max_length
+BLOCK_TITLE_LENGTH = Block._meta.get_field("title").max_length
+
+
+def parse_markdown(text: str) -> list[dict]:
+    """Split markdown into blocks (## headings) with subblocks (### headings)"""
+    blocks: list[dict] = []
+    lines: list[str] = []
+    in_code = False
+
+    def close_section() -> None:
+        content = "\n".join(lines).strip()
+        lines.clear()
+        if not blocks:
+            return
+        if blocks[-1]["subblocks"]:
+            blocks[-1]["subblocks"][-1]["content"] = content
+        else:
+            blocks[-1]["content"] = content
+
+    for line in text.splitlines():
+        if line.startswith("```"):
+            in_code = not in_code
+        if not in_code and line.startswith("## "):
+            close_section()
+            blocks.append({"title": line[3:].strip(), "content": "", "subblocks": []})
+        elif not in_code and line.startswith("### ") and blocks:
+            close_section()
+            blocks[-1]["subblocks"].append({"title": line[4:].strip(), "content": ""})
+        else:
+            lines.append(line)
+    close_section()
+    return blocks
+
+
+def parse_course(text: str, default_title: str) -> dict:
+    """
+    Course from markdown: title from "# " heading, description from text
+    before the first block, blocks from parse_markdown
+    """
+    title = default_title
+    description: list[str] = []
+    for line in text.splitlines():
+        if line.startswith("## "):
+            break
+        if line.startswith("# "):
+            title = line[2:].strip()
+        elif line.strip():
+            description.append(line.strip())
+    return {
+        "title": title[:TITLE_LENGTH],
+        "description": " ".join(description)[:DESCRIPTION_LENGTH],
+        "blocks": parse_markdown(text),
+    }
+
+
+def iter_markdown_files(root: Path) -> Iterator[Path]:
+    for path in sorted(root.rglob("*")):
+        if path.suffix in MARKDOWN_SUFFIXES and path.is_file():
+            yield path
+
+
+def import_courses(root: Path, batch_size: int = BATCH_SIZE) -> Counter[str]:
+    """
+    Create or update a course from every markdown file under root, batch of
+    files at a time: bulk_create of courses, profiles, blocks and subblocks
+    with rendered content. Files with unchanged hash are skipped, blocks of
+    changed files are replaced.
+    """
+    root = Path(root)
+    stats: Counter[str] = Counter()
+    paths = iter_markdown_files(root)
+    batch = list(islice(paths, batch_size))
+    while batch:
+        stats.update(_import_batch(root, batch))
+        batch = list(islice(paths, batch_size))
+    return stats
+
+
+def _import_batch(root: Path, paths: Iterable[Path]) -> Counter[str]:
+    files: dict[str, tuple[str, bytes, str]] = {}
+    for path in paths:
+        data = path.read_bytes()
+        source = path.relative_to(root).as_posix()
+        default_title = path.stem.replace("_", " ").capitalize()
+        files[source] = (hashlib.sha256(data).hexdigest(), data, default_title)
+
+    existing = {
+        course.source_path: course
+        for course in Course.objects.filter(source_path__in=files).only(
+            "source_path", "source_hash"
+        )
+    }
+
+    stats: Counter[str] = Counter()
+    new, changed, parsed = [], [], []
+    for source, (digest, data, default_title) in files.items():
+        course = existing.get(source)
+        if course is not None and course.source_hash == digest:
+            stats["skipped"] += 1
+            continue
+
+        course_data = parse_course(data.decode(), default_title)
+        if course is None:
+            course = Course(source_path=source)
+            new.append(course)
+        else:
+            course.updated_at = course.content_updated_at = timezone.now()
+            changed.append(course)
+        course.title = course_data["title"]
+        course.description = course_data["description"]
+        course.source_hash = digest
+        parsed.append((course, course_data["blocks"]))
+    if not parsed:
+        return stats
+
+    with transaction.atomic():
+        Course.objects.bulk_create_with_profiles(new)
+        if changed:
+            Course.objects.bulk_update(
+                changed,
+                [
+                    "title",
+                    "description",
+                    "source_hash",
+                    "updated_at",
+                    "content_updated_at",
+                ],
+            )
+            Block.objects.filter(course__in=changed).delete()
+            invalidate_courses(*[course.pk for course in changed])
+        _create_blocks(parsed)
+        invalidate_catalog()
+
+    stats["created"] += len(new)
+    stats["updated"] += len(changed)
+    return stats
+
+
+def _create_blocks(parsed: list[tuple[Course, list[dict]]]) -> None:
+    blocks, sections = [], []
+    for course, course_blocks in parsed:
+        for order, section in enumerate(course_blocks, 1):
+            blocks.append(
+                Block(
+                    course=course,
+                    title=section["title"][:BLOCK_TITLE_LENGTH],
+                    content=section["content"],
+                    rendered_content=render_content(section["content"]),
+                    order=order * ORDER_GAP,
+                )
+            )
+            sections.append(section)
+    Block.objects.bulk_create(blocks)
+
+    SubBlock.objects.bulk_create(
+        SubBlock(
+            block=block,
+            title=subblock["title"][:BLOCK_TITLE_LENGTH],
+            content=subblock["content"],
+            rendered_content=render_content(subblock["content"]),
+            order=order * ORDER_GAP,
+        )
+        for block, section in zip(blocks, sections)
+        for order, subblock in enumerate(section["subblocks"], 1)
+    )
@@ -0,0 +1,80 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Value, When
+
+from main.models import ORDER_GAP, Block, Course, SubBlock
+
+
+def _parse_outline(outline) -> list[tuple[int, list[int]]]:
+    """[{"id": 1, "subblocks": [2, 3]}, ...] -> [(1, [2, 3]), ...]"""
+    try:
+        return [
+            (int(block["id"]), [int(subblock_id) for subblock_id in block["subblocks"]])
+            for block in outline
+        ]
+    except (TypeError, KeyError, ValueError):
+        raise ValidationError("Неверный формат порядка блоков")
+
+
+def _case(mapping: dict[int, int]) -> Case:
+    return Case(
+        *[When(pk=pk, then=Value(value)) for pk, value in mapping.items()],
+        output_field=IntegerField(),
+    )
+
+
+def _move_all(queryset, max_order, orders: dict[int, int], **fields) -> None:
+    """Shift rows above old and new orders (unique order), then set new ones"""
+    offset = max(max_order, max(orders.values())) + 1
+    queryset.update(order=F("order") + offset)
+    queryset.update(order=_case(orders), **fields)
+
+
+def reorder_course(course_id: int, outline) -> None:
+    """
+    Apply full order of course blocks and subblocks (subblocks may move to
+    another block of the course) in one transaction, with constant number
+    of queries. Cachalot invalidates blocks and subblocks once, on commit.
+    """
+    outline = _parse_outline(outline)
+
+    with transaction.atomic():
+        blocks = Block.objects.filter(course_id=course_id).order_by()
+        subblocks = SubBlock.objects.filter(block__course_id=course_id).order_by()
+        block_orders = dict(blocks.select_for_update().values_list("id", "order"))
+        subblock_orders = dict(
+            subblocks.select_for_update(of=("self",)).values_list("id", "order")
+        )
+
+        new_blocks = [block_id for block_id, _ in outline]
+        new_subblocks = [
+            subblock_id for _, subblock_ids in outline for subblock_id in subblock_ids
+        ]
+        if sorted(new_blocks) != sorted(block_orders) or sorted(
+            new_subblocks
+        ) != sorted(subblock_orders):
+            raise ValidationError("Порядок должен содержать все блоки и подблоки курса")
+        if not new_blocks:
+            return
+
+        _move_all(
+            blocks,
+            max(block_orders.values()),
+            {block_id: n * ORDER_GAP for n, block_id in enumerate(new_blocks, 1)},
+        )
+        Course.objects.touch(course_id)
+        if not new_subblocks:
+            return
+
+        subblock_parents = {}
+        new_subblock_orders = {}
+        for block_id, subblock_ids in outline:
+            for n, subblock_id in enumerate(subblock_ids, 1):
+                subblock_parents[subblock_id] = block_id
+                new_subblock_orders[subblock_id] = n * ORDER_GAP
+        _move_all(
+            SubBlock.objects.filter(id__in=new_subblocks),
+            max(subblock_orders.values()),
+            new_subblock_orders,
+            block_id=_case(subblock_parents),
+        )
@@ -0,0 +1,161 @@
+"""
+Reading progress of users (ReadingProgress).
+
+Every loaded part of a course sets the user's position in a Redis hash
+(HSET, the last one wins), so scrolling doesn't write to the database on
+every step. flush_reading_progress command upserts the hash in batches.
+Without django-redis cache (tests, local) progress is saved directly.
+"""
+
+from typing import Optional
+
+from django.db import transaction
+from redis.exceptions import ResponseError
+
+from app.cache import get_redis
+from main.models import Block, ReadingProgress, SubBlock
+from main.services.fetching import get_course_outline
+from users.models import CustomUser
+
+PENDING_KEY = "cogniwise:progress:pending"
+FLUSHING_KEY = "cogniwise:progress:flushing"
+BATCH_SIZE = 500
+
+# (block_id, subblock_id or None, percent)
+Position = tuple[int, Optional[int], int]
+
+
+def _field(user_id, course_id) -> str:
+    return f"{user_id}:{course_id}"
+
+
+def _dump(position: Position) -> str:
+    block_id, subblock_id, percent = position
+    return f"{block_id}:{subblock_id or ''}:{percent}"
+
+
+def _load(value) -> Position:
+    block_id, subblock_id, percent = value.decode().split(":")
+    return int(block_id), int(subblock_id) if subblock_id else None, int(percent)
+
+
+def progress_percent(outline: list, block_id: int, subblock_id=None) -> Optional[int]:
+    """Share of outline read up to the position, None if it isn't in outline"""
+    try:
+        index = outline.index((block_id, subblock_id))
+    except ValueError:
+        return None
+    return (index + 1) * 100 // len(outline)
+
+
+def record_progress(user_id: int, course_id: int, block_id: int, subblock_id=None):
+    """Position reached by user (ignored if it isn't in the course)"""
+    outline = get_course_outline(course_id)
+    percent = progress_percent(outline, block_id, subblock_id)
+    if percent is None:
+        return
+
+    position = (block_id, subblock_id, percent)
+    redis = get_redis()
+    if redis is None:
+        _save_progress({(user_id, course_id): position})
+        return
+    redis.hset(PENDING_KEY, _field(user_id, course_id), _dump(position))
+
+
+def get_progress(user_id: int, course_id: int) -> Optional[Position]:
+    """Saved position, buffered one first"""
+    redis = get_redis()
+    if redis is not None:
+        field = _field(user_id, course_id)
+        for key in (PENDING_KEY, FLUSHING_KEY):
+            value = redis.hget(key, field)
+            if value is not None:
+                return _load(value)
+
+    progress = (
+        ReadingProgress.objects.filter(
+            user_id=user_id, course_id=course_id, block__isnull=False
+        )
+        .values_list("block_id", "subblock_id", "percent")
+        .first()
+    )
+    return progress
+
+
+def _save_progress(positions: dict[tuple[int, int], Position]) -> None:
+    """One upsert for a batch of {(user_id, course_id): position}"""
+    ReadingProgress.objects.bulk_create(
+        [
+            ReadingProgress(
+                user_id=user_id,
+                course_id=course_id,
+                block_id=block_id,
+                subblock_id=subblock_id,
+                percent=percent,
+            )
+            for (user_id, course_id), (block_id, subblock_id, percent) in (
+                positions.items()
+            )
+        ],
+        update_conflicts=True,
+        unique_fields=["user", "course"],
+        update_fields=["block", "subblock", "percent", "updated_at"],
+    )
+
+
+def _existing_positions(positions: dict[tuple[int, int], Position]) -> dict:
+    """Positions without users or content deleted since they were buffered"""
+    blocks = dict(
+        Block.objects.filter(
+            id__in={block_id for block_id, _, _ in positions.values()}
+        ).values_list("id", "course_id")
+    )
+    subblocks = set(
+        SubBlock.objects.filter(
+            id__in={sub_id for _, sub_id, _ in positions.values() if sub_id}
+        ).values_list("id", flat=True)
+    )
+    users = set(
+        CustomUser.objects.filter(
+            id__in={user_id for user_id, _ in positions}
+        ).values_list("id", flat=True)
+    )
+    return {
+        (user_id, course_id): (block_id, subblock_id, percent)
+        for (user_id, course_id), (block_id, subblock_id, percent) in positions.items()
+        if user_id in users
+        and blocks.get(block_id) == course_id
+        and (subblock_id is None or subblock_id in subblocks)
+    }
+
+
+def flush_reading_progress(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Save buffered positions, return their number. Pending hash is renamed
+    first, positions set during flush go to a new one. Hash left by a failed
+    flush is saved by the next one.
+    """
+    redis = get_redis()
+    if redis is None:
+        return 0
+    if not redis.exists(FLUSHING_KEY):
+        try:
+            redis.rename(PENDING_KEY, FLUSHING_KEY)
+        except ResponseError:
+            # No pending positions
+            return 0
+
+    positions = {}
+    for field, value in redis.hgetall(FLUSHING_KEY).items():
+        user_id, course_id = field.decode().split(":")
+        positions[(int(user_id), int(course_id))] = _load(value)
+
+    # Sorted, concurrent transactions lock progress rows in the same order
+    items = sorted(positions.items())
+    with transaction.atomic():
+        for start in range(0, len(items), batch_size):
+            end = start + batch_size
+            _save_progress(_existing_positions(dict(items[start:end])))
+    redis.delete(FLUSHING_KEY)
+    return len(items)
@@ -0,0 +1,150 @@
+"""
+Number of students of courses (CourseProfile.number_of_students).
+
+A completed purchase adds to a Redis hash (HINCRBY, no row lock), so
+purchases of a hot course don't wait for each other on its profile row.
+flush_student_counts command moves the hash to the database in batches.
+Without django-redis cache (tests, local) profiles are updated directly.
+"""
+
+import uuid
+from typing import Optional
+
+from django.db import transaction
+from django.db.models import (
+    Case,
+    Count,
+    F,
+    IntegerField,
+    OuterRef,
+    Subquery,
+    Value,
+    When,
+)
+from django.db.models.functions import Coalesce
+from redis.exceptions import ResponseError
+
+from app.cache import get_redis
+from main.models import CourseProfile
+from main.services.caching import invalidate_catalog
+from orders.models import Order
+
+PENDING_KEY = "cogniwise:students:pending"
+BATCH_KEY_PREFIX = "cogniwise:students:batch:"
+LOCK_KEY = "cogniwise:students:lock"
+# Seconds, longer than a flush takes
+LOCK_TIMEOUT = 300
+BATCH_SIZE = 500
+
+
+def _add_to_profiles(counts: list[tuple[int, int]]) -> None:
+    """One UPDATE for a batch of (course_id, added students)"""
+    added = Case(
+        *[When(course_id=course_id, then=Value(count)) for course_id, count in counts],
+        output_field=IntegerField(),
+    )
+    CourseProfile.objects.filter(
+        course_id__in=[course_id for course_id, _ in counts]
+    ).update(number_of_students=F("number_of_students") + added)
+
+
+def add_student(course_id: int, count: int = 1) -> None:
+    """Buffer students of course, negative count removes them"""
+    redis = get_redis()
+    if redis is None:
+        _add_to_profiles([(course_id, count)])
+        invalidate_catalog()
+        return
+    redis.hincrby(PENDING_KEY, course_id, count)
+
+
+def _take_pending(redis) -> dict:
+    """
+    Pending increments, removed from Redis in one transaction (MULTI), so
+    they are taken once. Increments made later go to a new pending hash.
+    """
+    batch_key = f"{BATCH_KEY_PREFIX}{uuid.uuid4().hex}"
+    pipe = redis.pipeline()
+    pipe.rename(PENDING_KEY, batch_key)
+    pipe.hgetall(batch_key)
+    pipe.delete(batch_key)
+    renamed, pending, _ = pipe.execute(raise_on_error=False)
+    if isinstance(renamed, ResponseError):
+        # No pending increments
+        return {}
+    return pending
+
+
+def _restore_pending(redis, counts: list[tuple[int, int]]) -> None:
+    """Put increments of a failed flush back, the next flush applies them"""
+    pipe = redis.pipeline()
+    for course_id, count in counts:
+        pipe.hincrby(PENDING_KEY, course_id, count)
+    pipe.execute()
+
+
+def flush_student_counts(batch_size: int = BATCH_SIZE) -> int:
+    """
+    Apply buffered increments, return number of updated courses.
+    One flush runs at a time (SET NX lock), others return 0. Increments
+    are taken from Redis before the UPDATE and put back if it fails.
+    """
+    redis = get_redis()
+    if redis is None:
+        return 0
+    if not redis.set(LOCK_KEY, 1, nx=True, ex=LOCK_TIMEOUT):
+        return 0
+
+    try:
+        # Sorted, concurrent transactions lock profile rows in the same order
+        counts = sorted(
+            (int(course_id), int(count))
+            for course_id, count in _take_pending(redis).items()
+            if int(count)
+        )
+        try:
+            with transaction.atomic():
+                for start in range(0, len(counts), batch_size):
+                    end = start + batch_size
+                    _add_to_profiles(counts[start:end])
+                invalidate_catalog()
+        except Exception:
+            _restore_pending(redis, counts)
+            raise
+        return len(counts)
+    finally:
+        redis.delete(LOCK_KEY)
+
+
+def reconcile_student_counts() -> Optional[int]:
+    """
+    Recompute numbers of students from completed orders (distinct users)
+    in one UPDATE, return number of profiles, None if a flush is running.
+    Holds the flush lock, buffered increments are taken before the UPDATE
+    and dropped, they are included in the orders.
+    """
+    redis = get_redis()
+    if redis is None:
+        return _recompute_student_counts()
+    if not redis.set(LOCK_KEY, 1, nx=True, ex=LOCK_TIMEOUT):
+        return None
+    try:
+        _take_pending(redis)
+        return _recompute_student_counts()
+    finally:
+        redis.delete(LOCK_KEY)
+
+
+def _recompute_student_counts() -> int:
+    students = (
+        Order.objects.filter(course_id=OuterRef("course_id"), status="completed")
+        .order_by()
+        .values("course_id")
+        .annotate(students=Count("user_id", distinct=True))
+        .values("students")
+    )
+    updated = CourseProfile.objects.update(
+        number_of_students=Coalesce(Subquery(students), 0)
+    )
+    invalidate_catalog()
+    return updated
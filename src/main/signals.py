@@ -0,0 +1,22 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main.models import Course, CourseProfile, course_content_changed
+from main.services.caching import invalidate_catalog, invalidate_courses
+
+
+@receiver([post_save, post_delete], sender=Course)
+def course_changed(sender, instance, **kwargs):
+    invalidate_catalog()
+    invalidate_courses(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CourseProfile)
+def catalog_changed(sender, instance, **kwargs):
+    invalidate_catalog()
+    invalidate_courses(instance.course_id)
+
+
+@receiver(course_content_changed)
+def content_changed(sender, course_ids, **kwargs):
+    invalidate_courses(*course_ids)
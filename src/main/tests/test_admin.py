@@ -0,0 +1,195 @@
+import json
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from main.admin import BLOCKS_PER_PAGE
+from main.models import ORDER_GAP, Block, SubBlock
+from main.services.ordering import reorder_course
+
+pytestmark = [pytest.mark.django_db]
+
+
+@pytest.fixture
+def admin_app(app, mixer):
+    admin = mixer.blend("users.CustomUser", is_staff=True, is_superuser=True)
+    app.client.force_login(admin)
+    return app
+
+
+def _create_outline(mixer, course, blocks_count, subblocks_count=2):
+    blocks = []
+    for n in range(1, blocks_count + 1):
+        block = mixer.blend("main.Block", course=course, order=n)
+        mixer.cycle(subblocks_count).blend(
+            "main.SubBlock", block=block, order=(order for order in range(1, 10))
+        )
+        blocks.append(block)
+    return blocks
+
+
+def _reorder(admin_app, course, outline, expected_status_code=200):
+    return admin_app.post(
+        reverse("admin:main_course_reorder", args=[course.id]),
+        data=json.dumps({"blocks": outline}),
+        content_type="application/json",
+        expected_status_code=expected_status_code,
+    )
+
+
+class TestCourseReorderView:
+    def test_get(self, admin_app, mixer, course):
+        _create_outline(mixer, course, 2)
+        response = admin_app.get(reverse("admin:main_course_reorder", args=[course.id]))
+        assert len(response.context["outline"]) == 2
+
+    def test_staff_required(self, app, auth_user, course):
+        app.get(
+            reverse("admin:main_course_reorder", args=[course.id]),
+            expected_status_code=302,
+        )
+
+    def test_reorder(self, admin_app, mixer, course):
+        """Test blocks reversed and subblock moved to another block"""
+        first, second = _create_outline(mixer, course, 2)
+        first_subs = list(
+            first.subblocks.order_by("order").values_list("id", flat=True)
+        )
+        second_subs = list(
+            second.subblocks.order_by("order").values_list("id", flat=True)
+        )
+
+        outline = [
+            {"id": second.id, "subblocks": [first_subs[0], *second_subs[::-1]]},
+            {"id": first.id, "subblocks": first_subs[1:]},
+        ]
+        _reorder(admin_app, course, outline)
+
+        assert list(course.blocks.order_by("order").values_list("id", "order")) == [
+            (second.id, ORDER_GAP),
+            (first.id, 2 * ORDER_GAP),
+        ]
+        assert list(
+            SubBlock.objects.filter(block=second)
+            .order_by("order")
+            .values_list("id", flat=True)
+        ) == [first_subs[0], *second_subs[::-1]]
+
+    def test_constant_queries(self, mixer, course):
+        """Test number of queries doesn't depend on number of blocks"""
+        counts = []
+        for blocks_count in [2, 8]:
+            Block.objects.filter(course=course).delete()
+            blocks = _create_outline(mixer, course, blocks_count)
+            outline = [
+                {
+                    "id": block.id,
+                    "subblocks": list(block.subblocks.values_list("id", flat=True)),
+                }
+                for block in reversed(blocks)
+            ]
+            with CaptureQueriesContext(connection) as queries:
+                reorder_course(course.id, outline)
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+
+    @pytest.mark.parametrize("broken", ["missing", "foreign", "format"])
+    def test_invalid_outline(self, admin_app, mixer, course, broken):
+        first, second = _create_outline(mixer, course, 2, subblocks_count=0)
+        outline = {
+            "missing": [{"id": first.id, "subblocks": []}],
+            "foreign": [
+                {"id": first.id, "subblocks": []},
+                {"id": mixer.blend("main.Block").id, "subblocks": []},
+            ],
+            "format": [{"pk": first.id}],
+        }[broken]
+
+        response = _reorder(admin_app, course, outline, expected_status_code=400)
+
+        assert "error" in response.json()
+        assert Block.objects.get(pk=first.pk).order == 1
+
+
+class TestCourseBlocksView:
+    def test_get(self, admin_app, mixer, course):
+        _create_outline(mixer, course, BLOCKS_PER_PAGE + 1)
+        url = reverse("admin:main_course_blocks", args=[course.id])
+
+        response = admin_app.get(url)
+        outline = response.context["outline"]
+        assert len(outline) == BLOCKS_PER_PAGE
+        block, subblocks = outline[0]
+        assert "content" in block.get_deferred_fields()
+        assert "content" in subblocks[0].get_deferred_fields()
+
+        response = admin_app.get(f"{url}?page=2")
+        assert len(response.context["outline"]) == 1
+
+    def test_staff_required(self, app, auth_user, course):
+        app.get(
+            reverse("admin:main_course_blocks", args=[course.id]),
+            expected_status_code=302,
+        )
+
+
+class TestCourseBlockContentView:
+    @staticmethod
+    def _url(course, kind, pk):
+        return reverse("admin:main_course_block_content", args=[course.id, kind, pk])
+
+    def test_get_form(self, admin_app, mixer, course):
+        block = mixer.blend("main.Block", course=course, content="Текст блока")
+        response = admin_app.get(self._url(course, "block", block.id))
+        assert response.context["form"].initial["content"] == "Текст блока"
+
+    def test_cancel(self, admin_app, mixer, course):
+        block = mixer.blend("main.Block", course=course)
+        response = admin_app.get(f"{self._url(course, 'block', block.id)}?cancel=1")
+        assert "form" not in response.context
+
+    def test_post_saves_changed_fields(self, admin_app, mixer, course):
+        block = mixer.blend("main.Block", course=course, title="Блок")
+        subblock = mixer.blend("main.SubBlock", block=block, title="Подблок")
+
+        with CaptureQueriesContext(connection) as queries:
+            admin_app.post(
+                self._url(course, "subblock", subblock.id),
+                data={"title": "Подблок", "content": "Новый текст"},
+            )
+
+        subblock.refresh_from_db()
+        assert subblock.content == "Новый текст"
+        updates = [
+            q["sql"] for q in queries if q["sql"].startswith('UPDATE "main_subblock"')
+        ]
+        assert len(updates) == 1
+        assert '"title"' not in updates[0]
+
+    def test_post_unchanged(self, admin_app, mixer, course):
+        block = mixer.blend("main.Block", course=course, title="Блок", content="a")
+
+        with CaptureQueriesContext(connection) as queries:
+            admin_app.post(
+                self._url(course, "block", block.id),
+                data={"title": "Блок", "content": "a"},
+            )
+
+        assert not [q for q in queries if q["sql"].startswith("UPDATE")]
+
+    def test_post_invalid(self, admin_app, mixer, course):
+        block = mixer.blend("main.Block", course=course, title="Блок")
+        response = admin_app.post(
+            self._url(course, "block", block.id), data={"title": "", "content": "a"}
+        )
+        assert response.context["form"].errors
+        block.refresh_from_db()
+        assert block.title == "Блок"
+
+    @pytest.mark.parametrize("kind", ["block", "subblock"])
+    def test_other_course(self, admin_app, mixer, course, kind):
+        item = mixer.blend(f"main.{kind.capitalize()}")
+        admin_app.get(self._url(course, kind, item.id), expected_status_code=404)
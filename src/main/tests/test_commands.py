@@ -0,0 +1,385 @@
+import json
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import CommandError, call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from redis.exceptions import ResponseError
+
+from main.models import Block, Course, CourseProfile, ReadingProgress, SubBlock
+from main.services.importing import parse_markdown
+from main.services.progress import get_progress, record_progress
+from main.services.students import LOCK_KEY, PENDING_KEY, add_student
+from orders.models import Order
+from users.models import CustomUser
+
+pytestmark = [pytest.mark.django_db]
+
+
+def test_parse_markdown():
+    text = (
+        "## Block\nIntro\n### Sub 1\nText\n```python\n## not a heading\n```\n"
+        "### Sub 2\nMore\n## Second\nBody"
+    )
+    blocks = parse_markdown(text)
+
+    assert [block["title"] for block in blocks] == ["Block", "Second"]
+    assert blocks[0]["content"] == "Intro"
+    assert [sub["title"] for sub in blocks[0]["subblocks"]] == ["Sub 1", "Sub 2"]
+    assert "## not a heading" in blocks[0]["subblocks"][0]["content"]
+    assert blocks[1]["content"] == "Body"
+
+
+class TestSeedBenchmarkData:
+    def test_seed(self, tmp_path):
+        """Test courses with profiles and content, users, orders and sessions"""
+        output = tmp_path / "data.json"
+        call_command(
+            "seed_benchmark_data",
+            courses=5,
+            users=3,
+            orders=2,
+            sessions=2,
+            output=str(output),
+            stdout=StringIO(),
+        )
+
+        assert Course.objects.count() == CourseProfile.objects.count() == 5
+        assert Block.objects.exists() and SubBlock.objects.exists()
+        assert CustomUser.objects.filter(profile__isnull=False).count() == 3
+        assert Order.objects.filter(status="completed").count() == 6
+        assert Order.objects.filter(status="pending").count() == 3
+
+        data = json.loads(output.read_text())
+        assert len(data["users"]) == 2
+        assert data["users"][0]["cookie"].startswith("sessionid=")
+        assert len(data["users"][0]["purchased"]) == 2
+
+    def test_clear(self, tmp_path):
+        options = {"courses": 2, "users": 1, "output": str(tmp_path / "data.json")}
+        call_command("seed_benchmark_data", stdout=StringIO(), **options)
+        call_command("seed_benchmark_data", clear=True, stdout=StringIO(), **options)
+
+        assert Course.objects.count() == 2
+        assert CustomUser.objects.count() == 1
+
+
+COURSE_MARKDOWN = """# Основы Python
+Вводный курс.
+
+## Установка
+Скачайте **Python**.
+### Windows
+Текст
+## Первый код
+```python
+## not a heading
+```
+"""
+
+
+def _import(directory, **options):
+    out = StringIO()
+    call_command("import_courses", str(directory), stdout=out, **options)
+    return out.getvalue()
+
+
+class TestImportCourses:
+    def test_import(self, tmp_path):
+        (tmp_path / "python").mkdir()
+        (tmp_path / "python" / "basics.md").write_text(COURSE_MARKDOWN)
+        (tmp_path / "js_intro.markdown").write_text("## Блок\nТекст")
+        (tmp_path / "notes.txt").write_text("## Not a course")
+
+        output = _import(tmp_path)
+
+        assert "Created: 2" in output
+        course = Course.objects.get(source_path="python/basics.md")
+        assert course.title == "Основы Python"
+        assert course.description == "Вводный курс."
+        assert CourseProfile.objects.filter(course=course).exists()
+        blocks = list(course.blocks.order_by("order"))
+        assert [block.title for block in blocks] == ["Установка", "Первый код"]
+        assert "<strong" in blocks[0].rendered_content
+        assert blocks[0].subblocks.get().title == "Windows"
+        assert Course.objects.filter(title="Js intro").exists()
+
+    def test_unchanged_skipped(self, tmp_path):
+        (tmp_path / "basics.md").write_text(COURSE_MARKDOWN)
+        _import(tmp_path)
+
+        with CaptureQueriesContext(connection) as queries:
+            output = _import(tmp_path)
+
+        assert "unchanged: 1" in output
+        assert not [q for q in queries if not q["sql"].startswith("SELECT")]
+
+    def test_changed_replaced(self, tmp_path):
+        path = tmp_path / "basics.md"
+        path.write_text(COURSE_MARKDOWN)
+        _import(tmp_path)
+        course = Course.objects.get()
+
+        path.write_text("# Новый курс\n## Один блок\nТекст")
+        output = _import(tmp_path)
+
+        assert "updated: 1" in output
+        course.refresh_from_db()
+        assert course.title == "Новый курс"
+        assert list(course.blocks.values_list("title", flat=True)) == ["Один блок"]
+        assert not SubBlock.objects.exists()
+        assert CourseProfile.objects.count() == 1
+
+    def test_constant_queries(self, tmp_path):
+        """Test number of queries of a batch doesn't depend on number of files"""
+        counts = []
+        for files_count in [1, 5]:
+            directory = tmp_path / str(files_count)
+            directory.mkdir()
+            for n in range(files_count):
+                (directory / f"course_{files_count}_{n}.md").write_text(COURSE_MARKDOWN)
+            with CaptureQueriesContext(connection) as queries:
+                _import(directory)
+            counts.append(len(queries))
+
+        assert counts[0] == counts[1]
+
+    def test_directory_not_found(self, tmp_path):
+        with pytest.raises(CommandError):
+            _import(tmp_path / "missing")
+
+
+def test_create_missing_profiles():
+    Course.objects.bulk_create([Course(title="a")])
+    CustomUser.objects.bulk_create([CustomUser(email="a@mail.ru")])
+
+    call_command("create_missing_profiles", stdout=StringIO())
+
+    assert CourseProfile.objects.count() == 1
+    assert CustomUser.objects.filter(profile__isnull=False).count() == 1
+
+
+class FakeRedis:
+    """Hash commands used by student counters and reading progress"""
+
+    def __init__(self):
+        self.hashes = {}
+        self.values = {}
+
+    def hincrby(self, key, field, amount):
+        values = self.hashes.setdefault(key, {})
+        values[str(field)] = values.get(str(field), 0) + amount
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value.encode()
+
+    def hget(self, key, field):
+        return self.hashes.get(key, {}).get(field.encode())
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def exists(self, key):
+        return key in self.hashes
+
+    def rename(self, key, new_key):
+        if key not in self.hashes:
+            raise ResponseError("no such key")
+        self.hashes[new_key] = self.hashes.pop(key)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.hashes.pop(key, None)
+            self.values.pop(key, None)
+
+    def set(self, key, value, nx=False, ex=None):
+        if nx and key in self.values:
+            return None
+        self.values[key] = value
+        return True
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    """Commands queued and executed one after another"""
+
+    def __init__(self, redis):
+        self.redis = redis
+        self.commands = []
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.commands.append((getattr(self.redis, name), args, kwargs))
+
+        return queue
+
+    def execute(self, raise_on_error=True):
+        results = []
+        for command, args, kwargs in self.commands:
+            try:
+                results.append(command(*args, **kwargs))
+            except ResponseError as error:
+                if raise_on_error:
+                    raise
+                results.append(error)
+        return results
+
+
+@pytest.fixture
+def fake_redis():
+    redis = FakeRedis()
+    with (
+        patch("main.services.students.get_redis", return_value=redis),
+        patch("main.services.progress.get_redis", return_value=redis),
+    ):
+        yield redis
+
+
+def _students(course):
+    return CourseProfile.objects.get(course=course).number_of_students
+
+
+class TestStudentCounts:
+    def test_buffered_until_flush(self, fake_redis, mixer, course):
+        other = mixer.blend("main.Course")
+        add_student(course.id)
+        add_student(course.id)
+        add_student(other.id)
+        assert _students(course) == 0
+
+        call_command("flush_student_counts", batch_size=1, stdout=StringIO())
+
+        assert (_students(course), _students(other)) == (2, 1)
+        assert not fake_redis.hashes
+        call_command("flush_student_counts", stdout=StringIO())
+        assert _students(course) == 2
+
+    def test_failed_flush_applied_next_time(self, fake_redis, course):
+        add_student(course.id)
+        with (
+            patch("main.services.students._add_to_profiles", side_effect=RuntimeError),
+            pytest.raises(RuntimeError),
+        ):
+            call_command("flush_student_counts", stdout=StringIO())
+        add_student(course.id)
+        assert _students(course) == 0
+
+        call_command("flush_student_counts", stdout=StringIO())
+        assert _students(course) == 2
+        assert not fake_redis.values
+
+    def test_one_flush_at_a_time(self, fake_redis, course):
+        add_student(course.id)
+        fake_redis.set(LOCK_KEY, 1)
+
+        call_command("flush_student_counts", stdout=StringIO())
+        assert _students(course) == 0
+        assert fake_redis.hashes[PENDING_KEY]
+
+    def test_without_redis(self, course):
+        add_student(course.id)
+        assert _students(course) == 1
+
+    def test_reconcile(self, fake_redis, mixer, course, django_assert_num_queries):
+        empty = mixer.blend("main.Course")
+        CourseProfile.objects.update(number_of_students=100)
+        user = mixer.blend("users.CustomUser")
+        mixer.cycle(2).blend(
+            "orders.Order", course=course, user=user, status="completed"
+        )
+        mixer.blend("orders.Order", course=course, status="completed")
+        mixer.blend("orders.Order", course=course, status="pending")
+        add_student(course.id)
+
+        with django_assert_num_queries(1):
+            call_command("reconcile_student_counts", stdout=StringIO())
+
+        assert (_students(course), _students(empty)) == (2, 0)
+        assert not fake_redis.hashes
+        assert not fake_redis.values
+
+    def test_reconcile_during_flush(self, fake_redis, course):
+        add_student(course.id)
+        fake_redis.set(LOCK_KEY, 1)
+
+        with pytest.raises(CommandError):
+            call_command("reconcile_student_counts", stdout=StringIO())
+        assert fake_redis.hashes[PENDING_KEY]
+
+    def test_removed_students(self, fake_redis, course):
+        add_student(course.id, 3)
+        add_student(course.id, -1)
+
+        call_command("flush_student_counts", stdout=StringIO())
+        assert _students(course) == 2
+
+
+class TestReadingProgress:
+    @pytest.fixture
+    def outline(self, mixer, course, block, subblock):
+        block2 = mixer.blend("main.Block", course=course, order=2)
+        return block, subblock, block2
+
+    def test_buffered_until_flush(self, fake_redis, mixer, user, course, outline):
+        block, subblock, block2 = outline
+        record_progress(user.id, course.id, block.id)
+        record_progress(user.id, course.id, block.id, subblock.id)
+        assert not user.reading_progress.exists()
+        assert get_progress(user.id, course.id) == (block.id, subblock.id, 66)
+
+        call_command("flush_reading_progress", batch_size=1, stdout=StringIO())
+
+        progress = user.reading_progress.get()
+        assert (progress.block, progress.subblock, progress.percent) == (
+            block,
+            subblock,
+            66,
+        )
+        assert not fake_redis.hashes
+
+        record_progress(user.id, course.id, block2.id)
+        call_command("flush_reading_progress", stdout=StringIO())
+        assert get_progress(user.id, course.id) == (block2.id, None, 100)
+        assert user.reading_progress.count() == 1
+
+    def test_deleted_content_skipped(self, fake_redis, mixer, user, course, outline):
+        block, _, block2 = outline
+        other_user = mixer.blend("users.CustomUser")
+        record_progress(user.id, course.id, block2.id)
+        record_progress(other_user.id, course.id, block.id)
+        block2.delete()
+        other_user.delete()
+
+        call_command("flush_reading_progress", stdout=StringIO())
+
+        assert not ReadingProgress.objects.exists()
+        assert not fake_redis.hashes
+
+    def test_position_not_in_course_ignored(self, fake_redis, mixer, user, course):
+        record_progress(user.id, course.id, mixer.blend("main.Block").id)
+        assert not fake_redis.hashes
+
+    def test_without_redis(self, user, course, outline, django_assert_num_queries):
+        block, subblock, _ = outline
+        record_progress(user.id, course.id, block.id)
+
+        with django_assert_num_queries(1):
+            record_progress(user.id, course.id, block.id, subblock.id)
+
+        assert get_progress(user.id, course.id) == (block.id, subblock.id, 66)
+
+
+def test_build_course_bundles(bundle_storage, mixer, course, block):
+    other = mixer.blend("main.Course")
+    bundle_storage.save(f"{course.id}/old.json.gz", StringIO("{}"))
+
+    out = StringIO()
+    call_command("build_course_bundles", stdout=out)
+
+    assert "Bundles built: 2, old deleted: 1" in out.getvalue()
+    assert len(bundle_storage.listdir(str(course.id))[1]) == 1
+    assert len(bundle_storage.listdir(str(other.id))[1]) == 1
@@ -0,0 +1,69 @@
+import pytest
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.test import RequestFactory
+
+from main.context_processors import user_avatar
+from users.models import CustomUserProfile
+from users.services.caching import _local_avatars, avatar_cache_key
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _clear_avatar_cache(user):
+    cache.delete(avatar_cache_key(user.id))
+    _local_avatars.clear()
+
+
+@pytest.fixture
+def request_for(rf: RequestFactory):
+    def _request_for(user):
+        request = rf.get("/")
+        request.user = user
+        return request
+
+    return _request_for
+
+
+class TestUserAvatar:
+    def test_anonymous(self, request_for):
+        """Test no avatar for anonymous user"""
+        context = user_avatar(request_for(AnonymousUser()))
+        assert not context["avatar_url"]
+
+    def test_lazy(self, request_for, user, django_assert_num_queries):
+        """Test nothing is fetched until template uses avatar_url"""
+        _clear_avatar_cache(user)
+        with django_assert_num_queries(0):
+            user_avatar(request_for(user))
+
+    def test_avatar_url(self, request_for, user):
+        """Test avatar URL of user profile"""
+        _clear_avatar_cache(user)
+        context = user_avatar(request_for(user))
+        assert "avatars/default_user.png" in str(context["avatar_url"])
+
+    def test_negative_cached(self, request_for, user, django_assert_num_queries):
+        """Test user without avatar isn't fetched from db on every request"""
+        CustomUserProfile.objects.filter(user=user).update(avatar=None)
+        _clear_avatar_cache(user)
+
+        with django_assert_num_queries(1):
+            assert not user_avatar(request_for(user))["avatar_url"]
+
+        _local_avatars.clear()
+        with django_assert_num_queries(0):
+            assert not user_avatar(request_for(user))["avatar_url"]
+
+    def test_profile_save_updates_cache(
+        self, request_for, user, django_capture_on_commit_callbacks
+    ):
+        """Test cached URL changes on profile save"""
+        str(user_avatar(request_for(user))["avatar_url"])
+
+        profile = user.profile
+        profile.avatar = None
+        with django_capture_on_commit_callbacks(execute=True):
+            profile.save()
+
+        assert not user_avatar(request_for(user))["avatar_url"]
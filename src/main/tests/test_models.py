@@ -0,0 +1,230 @@
+from io import StringIO
+from unittest.mock import patch
+
+import pytest
+from django.core.management import call_command
+
+from main.models import ORDER_GAP, Block, Course, CourseProfile, SubBlock
+
+pytestmark = [pytest.mark.django_db]
+
+
+def _titles(course):
+    return list(course.blocks.order_by("order").values_list("title", flat=True))
+
+
+class TestGapOrdering:
+    def test_append(self, course):
+        """Test new blocks are appended ORDER_GAP apart"""
+        first = Block.objects.create(course=course, title="1", content="")
+        second = Block.objects.create(course=course, title="2", content="")
+
+        assert (first.order, second.order) == (ORDER_GAP, 2 * ORDER_GAP)
+
+    def test_first_subblock(self, block):
+        subblock = SubBlock.objects.create(block=block, title="1", content="")
+        assert subblock.order == ORDER_GAP
+
+    def test_delete_keeps_siblings(self, course):
+        """Test delete changes no other rows"""
+        blocks = [
+            Block.objects.create(course=course, title=str(i), content="")
+            for i in range(3)
+        ]
+        blocks[1].delete()
+
+        assert list(course.blocks.values_list("order", flat=True)) == [
+            ORDER_GAP,
+            3 * ORDER_GAP,
+        ]
+
+    def test_move_after(self, course, django_assert_num_queries):
+        """Test moving updates only moved row (and course content version)"""
+        first, second, third = [
+            Block.objects.create(course=course, title=str(i), content="")
+            for i in range(3)
+        ]
+
+        with django_assert_num_queries(3):
+            Block.objects.move_after(third, first)
+
+        assert _titles(course) == ["0", "2", "1"]
+        assert Block.objects.get(pk=second.pk).order == 2 * ORDER_GAP
+
+    def test_move_first(self, course):
+        first, second = [
+            Block.objects.create(course=course, title=str(i), content="")
+            for i in range(2)
+        ]
+        Block.objects.move_after(second, None)
+
+        assert _titles(course) == ["1", "0"]
+
+    def test_insert_new_between(self, course):
+        first, second = [
+            Block.objects.create(course=course, title=str(i), content="")
+            for i in range(2)
+        ]
+        block = Block(course=course, title="new", content="")
+        Block.objects.move_after(block, first)
+        block.save()
+
+        assert _titles(course) == ["0", "new", "1"]
+
+    def test_rebalance_when_no_gap(self, course):
+        """Test siblings are renumbered when neighbours are adjacent"""
+        for order in [1, 2, 3]:
+            Block.objects.create(
+                course=course, title=str(order), content="", order=order
+            )
+        first, _, third = course.blocks.order_by("order")
+
+        Block.objects.move_after(third, first)
+
+        assert _titles(course) == ["1", "3", "2"]
+        orders = list(course.blocks.order_by("order").values_list("order", flat=True))
+        assert min(b - a for a, b in zip(orders, orders[1:])) > 1
+
+
+class TestRebalance:
+    @pytest.mark.parametrize("count", [3, 30])
+    def test_constant_queries(self, block, count, django_assert_num_queries):
+        """Test renumbering runs aggregate and two updates for any size"""
+        SubBlock.objects.bulk_create(
+            SubBlock(block=block, title=str(i), content="", order=count - i)
+            for i in range(count)
+        )
+
+        with django_assert_num_queries(3):
+            SubBlock.objects.rebalance({"block": block})
+
+        subblocks = list(
+            block.subblocks.order_by("order").values_list("title", "order")
+        )
+        assert subblocks == [
+            (str(count - n), n * ORDER_GAP) for n in range(1, count + 1)
+        ]
+
+    def test_dense(self, course):
+        for order in [5, 7, 3000]:
+            Block.objects.create(
+                course=course, title=str(order), content="", order=order
+            )
+
+        Block.objects.rebalance({"course": course}, gap=1)
+
+        assert list(course.blocks.values_list("order", flat=True)) == [1, 2, 3]
+
+    def test_other_siblings_untouched(self, mixer, course, block):
+        other = mixer.blend("main.Block", course=mixer.blend("main.Course"), order=7)
+
+        Block.objects.rebalance({"course": course})
+
+        assert Block.objects.get(pk=other.pk).order == 7
+
+    def test_max_order(self, course):
+        assert Block.objects.get_max_order({"course": course}) == 0
+
+
+def test_rebalance_command(mixer, course, block):
+    """Test only siblings with tight gaps are renumbered"""
+    other = mixer.blend("main.Course")
+    Block.objects.create(course=other, title="a", content="", order=ORDER_GAP)
+    Block.objects.create(course=other, title="b", content="", order=3 * ORDER_GAP)
+    Block.objects.create(course=course, title="b", content="", order=2)
+
+    call_command("rebalance_block_orders", stdout=StringIO())
+
+    assert list(course.blocks.values_list("order", flat=True)) == [
+        ORDER_GAP,
+        2 * ORDER_GAP,
+    ]
+    assert list(other.blocks.values_list("order", flat=True)) == [
+        ORDER_GAP,
+        3 * ORDER_GAP,
+    ]
+
+
+class TestRenderedContent:
+    def test_rendered_on_save(self, block):
+        block.content = "**Жирный**"
+        block.save()
+        assert "<strong" in Block.objects.get(pk=block.pk).rendered_content
+
+    def test_update_fields(self, block):
+        block.content = "**Жирный**"
+        block.save(update_fields=["content"])
+        assert "<strong" in Block.objects.get(pk=block.pk).rendered_content
+
+    def test_not_rendered_without_content(self, block, django_assert_num_queries):
+        subblock = SubBlock.objects.create(block=block, title="a", content="`код`")
+        subblock = SubBlock.objects.only("title", "block").get(pk=subblock.pk)
+        subblock.title = "b"
+        # UPDATE, course of the block and its updated_at, no content fetch
+        with django_assert_num_queries(3):
+            subblock.save()
+        assert "<code" in SubBlock.objects.get(pk=subblock.pk).rendered_content
+
+
+class TestCourseProfiles:
+    def test_save_creates_profile(self, django_assert_num_queries):
+        with django_assert_num_queries(2):
+            course = Course.objects.create(title="Курс")
+        assert course.course_profile.hours_to_complete == 1
+
+    def test_save_given_profile(self):
+        course = Course(title="Курс")
+        course.course_profile = CourseProfile(hours_to_complete=10)
+        course.save()
+        assert CourseProfile.objects.get(course=course).hours_to_complete == 10
+
+    def test_save_after_profile_read(self):
+        """Test missing profile read before the first save (forms, admin)"""
+        course = Course(title="Курс")
+        assert not hasattr(course, "course_profile")
+        course.save()
+        assert CourseProfile.objects.filter(course=course).exists()
+
+    @pytest.mark.parametrize("count", [1, 20])
+    def test_bulk_create_with_profiles(self, count, django_assert_num_queries):
+        courses = [Course(title=str(n)) for n in range(count)]
+        courses[0].course_profile = CourseProfile(number_of_students=5)
+
+        with django_assert_num_queries(2):
+            Course.objects.bulk_create_with_profiles(courses)
+
+        assert CourseProfile.objects.filter(course__in=courses).count() == count
+        assert courses[0].course_profile.number_of_students == 5
+
+    def test_create_missing_profiles(self, course):
+        without_profile = Course.objects.bulk_create(
+            [Course(title="a"), Course(title="b")]
+        )
+
+        assert Course.objects.create_missing_profiles() == 2
+
+        assert CourseProfile.objects.filter(course__in=without_profile).count() == 2
+        assert Course.objects.create_missing_profiles() == 0
+
+
+def test_touch_once(course, block):
+    """Test saves of many subblocks touch their course once"""
+    subblocks = [SubBlock(block=block, title=str(n), content="a") for n in range(3)]
+    with patch("main.models.course_content_changed.send") as send:
+        with Course.objects.touch_once():
+            for subblock in subblocks:
+                subblock.save()
+    send.assert_called_once()
+    assert set(send.call_args.kwargs["course_ids"]) == {course.id}
+
+
+def test_content_changes_touch_course(course, block, subblock):
+    """Test changes of blocks and subblocks update course content version"""
+    versions = [Course.objects.get(pk=course.pk).content_updated_at]
+    for change in [subblock.save, subblock.delete, block.delete]:
+        change()
+        versions.append(Course.objects.get(pk=course.pk).content_updated_at)
+
+    assert versions == sorted(set(versions))
+    # Catalog order is kept
+    assert Course.objects.get(pk=course.pk).updated_at == course.updated_at
@@ -1,13 +1,19 @@
+import gzip
+import json
 from unittest.mock import patch
 
 import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from pytest_django.asserts import (
     assertRedirects,
     assertTemplateUsed,
 )
 
+from app.tests.test_clients import AppClient
 from main.forms import EmailForContactForm
+from main.services.fetching import CourseCard, get_courses_by_query
 
 pytestmark = [pytest.mark.django_db]
 
@@ -79,11 +85,25 @@ class TestCoursesListView:
     def test_with_courses(self, app, course):
         """Test rendering list of courses"""
         response = app.get(reverse("main:courses-list"))
-        assert course in response.context["courses"]
-        assert (
-            f"/covers/default_cover.jpeg"
-            in response.context["courses"][0].course_profile.cover.url
-        )
+        card = response.context["courses"][0]
+        assert card.id == course.id
+        assert card.title == course.title
+        assert card.number_of_students == course.course_profile.number_of_students
+        assert card.cover_url.endswith("/covers/default_cover.jpeg")
+        assert "/covers/default_cover.jpeg" in response.content.decode()
+
+    def test_cards_follow_catalog(
+        self, app, course, django_capture_on_commit_callbacks
+    ):
+        """Test cached cards are rebuilt after course change"""
+        app.get(reverse("main:courses-list"))
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.title = "Новое название"
+            course.save()
+
+        response = app.get(reverse("main:courses-list"))
+        assert response.context["courses"][0].title == "Новое название"
 
     def test_without_courses(self, app):
         """Test rendering msg, when without courses"""
@@ -104,7 +124,13 @@ class TestCoursesSearchView:
     def test_query(self, app, course, query_dict):
         """Test rendering list of courses using query"""
         response = app.get(reverse("main:courses-search"), query_dict)
-        assert course in response.context["courses"]
+        assert course.id in [card.id for card in response.context["courses"]]
+
+    def test_sync_cards(self, course):
+        """Test sync search gives cards like the view"""
+        cards = get_courses_by_query(course.title, cards=True)
+        assert [(card.id, card.title) for card in cards] == [(course.id, course.title)]
+        assert isinstance(cards[0], CourseCard)
 
     def test_without_courses(self, app):
         """Test rendering msg, when without courses"""
@@ -141,7 +167,7 @@ class TestCoursesDetailView:
         )
         assertTemplateUsed(response, "main/access_denied.html")
 
-    @patch("main.decorators.is_purchased")
+    @patch("main.decorators.ais_purchased")
     def test_purchased(
         self, mock_is_purchased, app, auth_user, course, block, subblock
     ):
@@ -156,7 +182,7 @@ class TestCoursesDetailView:
         assert block == response.context["first_block"]
         assert subblock == response.context["first_subblock"]
 
-    @patch("main.decorators.is_purchased")
+    @patch("main.decorators.ais_purchased")
     def test_purchased_no_content(self, mock_is_purchased, app, auth_user, course):
         """Test when course is bought, but it has no content (block, subblock)"""
         mock_is_purchased.return_value = True
@@ -178,7 +204,7 @@ def _test_load_content(content, content_type, response):
 
 @pytest.mark.auth_req
 @pytest.mark.purchase_req
-@patch("main.decorators.is_purchased")
+@patch("main.decorators.ais_purchased")
 class TestLoadNextContentView:
     def test_next_block(self, mock_is_purchased, mixer, app, auth_user, course, block):
         """Test load, next content - block"""
@@ -215,7 +241,7 @@ class TestLoadNextContentView:
 
 @pytest.mark.auth_req
 @pytest.mark.purchase_req
-@patch("main.decorators.is_purchased")
+@patch("main.decorators.ais_purchased")
 class TestLoadNextContentFromSubblockView:
     def test_next_from_subblock_next_block(
         self, mock_is_purchased, mixer, app, auth_user, course, block, subblock
@@ -251,3 +277,239 @@ class TestLoadNextContentFromSubblockView:
         )
 
         _test_load_content(subblock2, "subblock", response)
+
+
+@pytest.mark.auth_req
+@pytest.mark.purchase_req
+@patch("main.decorators.ais_purchased")
+class TestCourseResumeView:
+    def test_saved_position(
+        self, mock_is_purchased, mixer, app, auth_user, course, block, subblock
+    ):
+        """Test course page opens at the last loaded part"""
+        mock_is_purchased.return_value = True
+        mixer.blend("main.Block", course=course, title="Test Block 2", order=2)
+        app.get(
+            reverse(
+                "main:load-next-content-from-subblock",
+                args=[course.id, block.id, subblock.id],
+            )
+        )
+
+        response = app.get(reverse("main:course-resume", args=[course.id]))
+
+        assertTemplateUsed(response, "main/course_detail.html")
+        assert response.context["first_block"] == block
+        assert response.context["first_subblock"] == subblock
+        assert course.reading_progress.get(user=auth_user).percent == 66
+
+    def test_no_progress(self, mock_is_purchased, app, auth_user, course, block):
+        """Test course page opens at the beginning"""
+        mock_is_purchased.return_value = True
+
+        response = app.get(reverse("main:course-resume", args=[course.id]))
+
+        assert response.context["first_block"] == block
+        assert response.context["first_subblock"] is None
+
+    def test_other_course_block_ignored(
+        self, mock_is_purchased, mixer, app, auth_user, course, block
+    ):
+        mock_is_purchased.return_value = True
+        other_block = mixer.blend("main.Block", order=1)
+
+        app.get(
+            reverse("main:load-next-content", args=[course.id, other_block.id]),
+            expected_status_code=404,
+        )
+
+        assert not course.reading_progress.exists()
+
+
+@pytest.mark.auth_req
+@pytest.mark.purchase_req
+@patch("main.decorators.ais_purchased", return_value=True)
+class TestCourseBundleView:
+    def test_local_storage(
+        self, mock_is_purchased, app, auth_user, bundle_storage, course, subblock
+    ):
+        """Test bundle without signed URLs is served by the view"""
+        response = app.get(reverse("main:course-bundle", args=[course.id]))
+
+        assert response["Content-Encoding"] == "gzip"
+        assert "no-store" in response["Cache-Control"]
+        bundle = json.loads(gzip.decompress(response.content))
+        assert bundle["course"]["id"] == course.id
+        assert bundle["outline"] == [
+            {
+                "id": subblock.block.id,
+                "title": subblock.block.title,
+                "subblocks": [{"id": subblock.id, "title": subblock.title}],
+            }
+        ]
+        assert [part["id"] for part in bundle["parts"]] == [
+            f"block-{subblock.block.id}",
+            f"subblock-{subblock.id}",
+        ]
+        assert "hx-get" not in bundle["parts"][-1]["html"]
+
+    def test_built_once_per_version(
+        self,
+        mock_is_purchased,
+        app,
+        auth_user,
+        bundle_storage,
+        course,
+        block,
+        django_capture_on_commit_callbacks,
+    ):
+        url = reverse("main:course-bundle", args=[course.id])
+        app.get(url)
+        app.get(url)
+        assert len(bundle_storage.listdir(str(course.id))[1]) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            block.title = "Новый заголовок"
+            block.save()
+
+        assert "Новый заголовок".encode() in gzip.decompress(app.get(url).content)
+        assert len(bundle_storage.listdir(str(course.id))[1]) == 2
+
+    @patch("main.views.signed_bundle_url", return_value="https://s3/bundle?sig=1")
+    def test_signed_url(
+        self, mock_url, mock_is_purchased, app, auth_user, bundle_storage, course
+    ):
+        response = app.get(
+            reverse("main:course-bundle", args=[course.id]), expected_status_code=302
+        )
+
+        assert response["Location"] == "https://s3/bundle?sig=1"
+        assert "no-store" in response["Cache-Control"]
+
+    def test_not_purchased(self, mock_is_purchased, app, auth_user, course):
+        mock_is_purchased.return_value = False
+        app.get(
+            reverse("main:course-bundle", args=[course.id]), expected_status_code=402
+        )
+
+
+@pytest.mark.auth_req
+@pytest.mark.purchase_req
+@patch("main.decorators.ais_purchased")
+def test_load_next_content_session_queries(
+    mock_is_purchased, settings, user, course, block, subblock
+):
+    """Test cache session engine saves the per-request session query"""
+    mock_is_purchased.return_value = True
+    url = reverse("main:load-next-content", args=[course.id, block.id])
+
+    queries = {}
+    for mode in ["db", "cache"]:
+        settings.SESSION_ENGINE = settings.SESSION_ENGINES[mode]
+        # SessionMiddleware picks engine on client creation
+        app = AppClient()
+        app.client.force_login(user)
+        app.get(url)  # warm up caches
+
+        with CaptureQueriesContext(connection) as context:
+            app.get(url)
+        queries[mode] = len(context)
+
+    assert queries["cache"] == queries["db"] - 1
+
+
+@patch("main.decorators.ais_purchased", return_value=True)
+class TestConditionalContent:
+    def test_headers(self, mock_is_purchased, app, auth_user, course, block):
+        response = app.get(
+            reverse("main:load-next-content", args=[course.id, block.id])
+        )
+
+        assert response["ETag"].startswith('W/"')
+        assert "Last-Modified" in response
+        assert "private" in response["Cache-Control"]
+        assert "no-cache" in response["Cache-Control"]
+
+    def test_not_modified(self, mock_is_purchased, app, auth_user, course, block):
+        """Test 304 is returned before content queries"""
+        url = reverse("main:load-next-content", args=[course.id, block.id])
+        etag = app.get(url)["ETag"]
+
+        with CaptureQueriesContext(connection) as queries:
+            response = app.get(url, HTTP_IF_NONE_MATCH=etag, expected_status_code=304)
+
+        assert response["ETag"] == etag
+        assert not response.content
+        assert not [q for q in queries if "main_block" in q["sql"]]
+
+    def test_changed_content(self, mock_is_purchased, app, auth_user, course, block):
+        url = reverse("main:load-next-content", args=[course.id, block.id])
+        etag = app.get(url)["ETag"]
+
+        block.content = "Новый текст"
+        block.save()
+
+        response = app.get(url, HTTP_IF_NONE_MATCH=etag)
+        assert response["ETag"] != etag
+
+    def test_other_user(self, mock_is_purchased, app, mixer, auth_user, course, block):
+        url = reverse("main:load-next-content", args=[course.id, block.id])
+        etag = app.get(url)["ETag"]
+
+        app.client.force_login(mixer.blend("users.CustomUser"))
+        app.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    def test_not_purchased(self, mock_is_purchased, app, auth_user, course, block):
+        mock_is_purchased.return_value = False
+        response = app.get(
+            reverse("main:load-next-content", args=[course.id, block.id]),
+            expected_status_code=402,
+        )
+        assert "ETag" not in response
+
+    def test_not_on_page(self, mock_is_purchased, app, auth_user, course, block):
+        """Test course page (with profile header) isn't revalidated by ETag"""
+        response = app.get(reverse("main:course-detail", args=[course.id]))
+        assert "ETag" not in response
+
+
+@patch("main.decorators.ais_purchased", return_value=True)
+class TestContentCache:
+    def test_shared_by_users(self, mock_is_purchased, app, mixer, auth_user, course):
+        """Test content cached for one user is served to another one"""
+        url = reverse("main:course-detail", args=[course.id])
+        app.get(url)
+
+        app.client.force_login(mixer.blend("users.CustomUser"))
+        with CaptureQueriesContext(connection) as queries:
+            app.get(url)
+
+        assert not [q for q in queries if "main_block" in q["sql"]]
+
+    def test_block_save(
+        self,
+        mock_is_purchased,
+        app,
+        mixer,
+        auth_user,
+        course,
+        block,
+        django_capture_on_commit_callbacks,
+    ):
+        """Test new block is shown after commit"""
+        url = reverse("main:load-next-content", args=[course.id, block.id])
+        assert app.get(url).content.decode() == ""
+
+        with django_capture_on_commit_callbacks(execute=True):
+            block2 = mixer.blend("main.Block", course=course, order=2 * block.order)
+
+        _test_load_content(block2, "block", app.get(url))
+
+    def test_block_of_other_course(
+        self, mock_is_purchased, app, mixer, auth_user, course
+    ):
+        block = mixer.blend("main.Block")
+        app.get(
+            reverse("main:load-next-content", args=[course.id, block.id]),
+            expected_status_code=404,
+        )
@@ -2,8 +2,10 @@ from django.urls import path
 
 from main.views import (
     about_view,
+    course_bundle_view,
     course_detail_view,
     course_list_view,
+    course_resume_view,
     courses_search_view,
     home_view,
     load_next_content_view,
@@ -23,6 +25,8 @@ urlpatterns = [
     path("courses/", course_list_view, name="courses-list"),
     path("courses-search/", courses_search_view, name="courses-search"),
     path("courses/<int:course_id>/", course_detail_view, name="course-detail"),
+    path("courses/<int:course_id>/resume/", course_resume_view, name="course-resume"),
+    path("courses/<int:course_id>/bundle/", course_bundle_view, name="course-bundle"),
     path(
         "courses/<int:course_id>/load-next/<int:current_block_id>/",
         load_next_content_view,
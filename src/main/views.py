@@ -1,41 +1,52 @@
+from asgiref.sync import sync_to_async
 from django.contrib.auth.decorators import login_required
-from django.http import HttpResponse
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseRedirect
 from django.shortcuts import render
+from django.utils.cache import patch_cache_control
 
-from main.decorators import purchase_required
+from app.pagecache import cache_anonymous_page
+from app.shortcuts import arender
+from main.decorators import conditional_content, purchase_required, track_progress
 from main.forms import EmailForContactForm
+from main.services.bundles import get_course_bundle, read_bundle, signed_bundle_url
+from main.services.caching import CATALOG_TAG
 from main.services.fetching import (
-    build_next_content,
-    get_block,
-    get_course_first_content,
-    get_courses_by_query,
+    aget_course_first_content,
+    aget_courses_by_query,
+    aget_next_content,
+    build_content_at,
     get_courses_list,
     get_example_team_members,
-    get_next_block,
-    get_next_subblock,
 )
 from main.services.mailing import send_email_for_contact
+from main.services.progress import get_progress
 
 
+@cache_anonymous_page()
 def home_view(request):
     return render(request, "main/home.html")
 
 
+@cache_anonymous_page()
 def about_view(request):
     team_members = get_example_team_members()
     return render(request, "main/about.html", {"team_members": team_members})
 
 
+@cache_anonymous_page(CATALOG_TAG)
 def course_list_view(request):
     """Return all courses"""
-    courses = get_courses_list()
+    courses = get_courses_list(cards=True)
     return render(request, "main/course_list.html", {"courses": courses})
 
 
-def courses_search_view(request):
+# Async views are read-only, ATOMIC_REQUESTS isn't supported for them
+@transaction.non_atomic_requests
+async def courses_search_view(request):
     """Return searched courses"""
     query = request.GET.get("query", "")
-    courses = get_courses_by_query(query)
+    courses = await aget_courses_by_query(query, cards=True)
     return render(
         request,
         "main/partials/partial_search_courses.html",
@@ -43,51 +54,76 @@ def courses_search_view(request):
     )
 
 
+@transaction.non_atomic_requests
 @login_required
 @purchase_required
-def course_detail_view(request, course_id: int):
+async def course_detail_view(request, course_id: int):
     """Return first part of course"""
 
-    first_content = get_course_first_content(course_id)
-    return render(
+    first_content = await aget_course_first_content(course_id)
+    return await arender(
         request,
         "main/course_detail.html",
         first_content,
     )
 
 
+@transaction.non_atomic_requests
+@login_required
+@purchase_required
+async def course_resume_view(request, course_id: int):
+    """Course page from saved reading position"""
+    user = await request.auser()
+    content = await aget_course_first_content(course_id)
+    progress = await sync_to_async(get_progress)(user.pk, course_id)
+    if progress is not None:
+        block_id, subblock_id, _ = progress
+        content = build_content_at(content, block_id, subblock_id)
+    return await arender(request, "main/course_detail.html", content)
+
+
+@transaction.non_atomic_requests
+@login_required
+@purchase_required
+async def course_bundle_view(request, course_id: int):
+    """Whole course in one gzipped JSON, by signed URL if storage has them"""
+    name = await sync_to_async(get_course_bundle)(course_id)
+    url = await sync_to_async(signed_bundle_url)(name)
+    if url is not None:
+        response = HttpResponseRedirect(url)
+    else:
+        response = HttpResponse(
+            await sync_to_async(read_bundle)(name),
+            content_type="application/json",
+            headers={"Content-Encoding": "gzip"},
+        )
+    # Signed URLs expire, bundle name changes with course
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@transaction.non_atomic_requests
 @login_required
 @purchase_required
-def load_next_content_view(
+@track_progress
+@conditional_content
+async def load_next_content_view(
     request, course_id: int, current_block_id: int, current_subblock_id=None
 ):
     """Return next part of course"""
-    current_block = get_block(current_block_id, only_fields=["order"])
-
-    # Return next subblock if exist
-    next_subblock = get_next_subblock(current_block, current_subblock_id)
-    if next_subblock:
-        next_content = build_next_content(
-            next_subblock, "subblock", course_id, current_block_id
-        )
-        return render(
-            request,
-            "main/partials/partial_content.html",
-            next_content,
-        )
-
-    # Return next block if exist
-    next_block = get_next_block(current_block, course_id)
-    if next_block:
-        next_content = build_next_content(next_block, "block", course_id, next_block.id)
-        return render(
-            request,
-            "main/partials/partial_content.html",
-            next_content,
-        )
-    return HttpResponse("")
+    next_content = await aget_next_content(
+        course_id, current_block_id, current_subblock_id
+    )
+    if next_content is None:
+        return HttpResponse("")
+    return render(
+        request,
+        "main/partials/partial_content.html",
+        next_content,
+    )
 
 
+@cache_anonymous_page()
 def modal_open_demo_view(request):
     demo_url = "https://www.youtube.com/embed/u_sIfs7Yom4"
     return render(request, "main/partials/modal_demo.html", {"demo_url": demo_url})
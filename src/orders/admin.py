@@ -1,6 +1,7 @@
 from django.contrib import admin
 
 from orders.models import Order
+from orders.services import order_status_changed
 
 
 @admin.register(Order)
@@ -9,3 +10,8 @@ class OrderAdmin(admin.ModelAdmin):
     list_filter = ("status", "created_at")
     search_fields = ("user__email", "course__title")
     readonly_fields = ("yookassa_payment_id", "created_at", "updated_at")
+
+    def save_model(self, request, obj, form, change):
+        super().save_model(request, obj, form, change)
+        if change and "status" in form.changed_data:
+            order_status_changed(obj, form.initial["status"])
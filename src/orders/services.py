@@ -2,11 +2,16 @@ import logging
 from uuid import uuid4
 
 from django.conf import settings
-from django.core.cache import cache
+from django.db import transaction
 from django.http import Http404
+from django.utils import timezone
 from yookassa import Payment
 
+from app import metrics
+from app.cache import aget_or_set_tagged, get_or_set_tagged, invalidate_tags
+from main.services.students import add_student
 from orders.models import Order
+from users.services.caching import user_tag
 
 formatter = logging.Formatter(
     fmt="[{asctime}] #{levelname:8} {filename}:" "{lineno} - {name} - {message}",
@@ -19,18 +24,32 @@ logger = logging.getLogger(__name__)
 logger.addHandler(handler)
 
 
+def purchase_cache_key(user_id, course_id) -> str:
+    return f"purchase_status_{user_id}_{course_id}"
+
+
+def _completed_orders(user, course_id):
+    return Order.objects.filter(user=user, course__id=course_id, status="completed")
+
+
 def is_purchased(user, course_id) -> bool:
-    """Check if course is purchased or not, using cache"""
-    cache_key = f"purchase_status_{user.id}_{course_id}"
-    purchase_status = cache.get(cache_key)
+    """Check if course is purchased or not, using cache (until orders change)"""
+    return get_or_set_tagged(
+        purchase_cache_key(user.id, course_id),
+        [user_tag(user.id)],
+        _completed_orders(user, course_id).exists,
+        "purchase_status",
+    )
 
-    # if not in cache
-    if purchase_status is None:
-        purchase_status = Order.objects.filter(
-            user=user, course__id=course_id, status="completed"
-        ).exists()
-        cache.set(cache_key, purchase_status, 1800)
-    return purchase_status
+
+async def ais_purchased(user, course_id) -> bool:
+    """Async version of is_purchased"""
+    return await aget_or_set_tagged(
+        purchase_cache_key(user.id, course_id),
+        [user_tag(user.id)],
+        _completed_orders(user, course_id).aexists,
+        "purchase_status",
+    )
 
 
 def create_order(user, course, price, status) -> Order:
@@ -43,6 +62,70 @@ def create_order(user, course, price, status) -> Order:
     return order
 
 
+def complete_order(order, payment_id=None) -> bool:
+    """
+    Mark order completed, return False if it already was. Conditional UPDATE,
+    so concurrent webhook and status page complete it once, and add a student
+    to course on commit. Checkout doesn't sell a bought course again, rare
+    second order of user is fixed by reconcile_student_counts.
+    """
+    fields = {"status": "completed", "updated_at": timezone.now()}
+    if payment_id:
+        fields["yookassa_payment_id"] = payment_id
+    updated = (
+        Order.objects.filter(id=order.id).exclude(status="completed").update(**fields)
+    )
+    for field, value in fields.items():
+        setattr(order, field, value)
+    if not updated:
+        return False
+
+    course_id, user_id = order.course_id, order.user_id
+
+    def on_commit():
+        invalidate_tags(user_tag(user_id))
+        add_student(course_id)
+
+    transaction.on_commit(on_commit)
+    return True
+
+
+def cancel_order(order) -> bool:
+    """
+    Mark order canceled, return False if it already was. Conditional UPDATE
+    on the status the order was read with, a completed one (refund) loses
+    its student on commit.
+    """
+    previous_status = order.status
+    updated = (
+        Order.objects.filter(id=order.id, status=previous_status)
+        .exclude(status="canceled")
+        .update(status="canceled", updated_at=timezone.now())
+    )
+    if not updated:
+        return False
+
+    order.status = "canceled"
+    user_id = order.user_id
+
+    def on_commit():
+        invalidate_tags(user_tag(user_id))
+
+    transaction.on_commit(on_commit)
+    order_status_changed(order, previous_status)
+    return True
+
+
+def order_status_changed(order, previous_status) -> None:
+    """Add or remove student of course on commit, if completion changed"""
+    was_completed = previous_status == "completed"
+    if was_completed == (order.status == "completed"):
+        return
+    course_id = order.course_id
+    count = -1 if was_completed else 1
+    transaction.on_commit(lambda: add_student(course_id, count))
+
+
 def get_user_order_or_404(order_id, user):
     try:
         order = (
@@ -81,32 +164,33 @@ def create_yookassa_payment(request, order):
 
     try:
         idempotence_key = str(uuid4())
-        payment = Payment.create(
-            {
-                "amount": {
-                    "value": f"{discounted_total_rub:.2f}",
-                    "currency": "RUB",
+        with metrics.timed("yookassa_api_duration_seconds", method="create"):
+            payment = Payment.create(
+                {
+                    "amount": {
+                        "value": f"{discounted_total_rub:.2f}",
+                        "currency": "RUB",
+                    },
+                    "confirmation": {
+                        "type": "redirect",
+                        "return_url": request.build_absolute_uri(
+                            "/orders/yookassa/success/"
+                        )
+                        + f"?order_id={order.id}",
+                    },
+                    "capture": True,
+                    "description": f"Заказ #{order.id}",
+                    "metadata": {
+                        "order_id": order.id,
+                        "user_id": order.user.id,
+                    },
+                    "receipt": {
+                        "customer": customer,
+                        "items": receipt_items,
+                    },
                 },
-                "confirmation": {
-                    "type": "redirect",
-                    "return_url": request.build_absolute_uri(
-                        "/orders/yookassa/success/"
-                    )
-                    + f"?order_id={order.id}",
-                },
-                "capture": True,
-                "description": f"Заказ #{order.id}",
-                "metadata": {
-                    "order_id": order.id,
-                    "user_id": order.user.id,
-                },
-                "receipt": {
-                    "customer": customer,
-                    "items": receipt_items,
-                },
-            },
-            idempotence_key,
-        )
+                idempotence_key,
+            )
 
         order.yookassa_payment_id = payment.id
         order.save()
@@ -0,0 +1,19 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from main.services.students import add_student
+from orders.models import Order
+from users.services.caching import invalidate_user
+
+
+@receiver([post_save, post_delete], sender=Order)
+def order_changed(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
+
+
+@receiver(post_delete, sender=Order)
+def order_deleted(sender, instance, **kwargs):
+    if instance.status == "completed":
+        course_id = instance.course_id
+        transaction.on_commit(lambda: add_student(course_id, -1))
@@ -1,10 +1,20 @@
 from unittest.mock import Mock, patch
 
 import pytest
+from asgiref.sync import async_to_sync
+from django.core.cache import cache
 from django.urls import reverse
 from pytest_django.asserts import assertRedirects, assertTemplateUsed
 
+from main.models import CourseProfile
 from orders.models import Order
+from orders.services import (
+    ais_purchased,
+    cancel_order,
+    complete_order,
+    is_purchased,
+    purchase_cache_key,
+)
 
 pytestmark = [pytest.mark.django_db]
 
@@ -169,3 +179,143 @@ class TestYookassaPaymentStatusView:
             assert response.context["order"] == order
             assert Order.objects.get(id=order.id).status == "canceled"
             assertTemplateUsed(response, "orders/yookassa_cancel.html")
+
+
+class TestYookassaWebhook:
+    def test_payment_succeeded(self, app, mixer, user, course):
+        """Test webhook completes order from payment metadata"""
+        order = mixer.blend("orders.Order", user=user, course=course, status="pending")
+        event = {
+            "type": "payment.succeeded",
+            "object": {
+                "id": "payment-1",
+                "status": "succeeded",
+                "metadata": {"order_id": order.id, "user_id": user.id},
+            },
+        }
+        app.post(
+            reverse("orders:yookassa_webhook"),
+            data=event,
+            content_type="application/json",
+            HTTP_USER_AGENT="YooKassa",
+        )
+
+        order.refresh_from_db()
+        assert order.status == "completed"
+        assert order.yookassa_payment_id == "payment-1"
+
+    def test_student_counted_once(
+        self, app, mixer, user, course, django_capture_on_commit_callbacks
+    ):
+        """Test repeated webhook of order adds one student"""
+        order = mixer.blend("orders.Order", user=user, course=course, status="pending")
+        for _ in range(2):
+            event = {
+                "type": "payment.succeeded",
+                "object": {
+                    "id": "payment-1",
+                    "status": "succeeded",
+                    "metadata": {"order_id": order.id, "user_id": user.id},
+                },
+            }
+            with django_capture_on_commit_callbacks(execute=True):
+                app.post(
+                    reverse("orders:yookassa_webhook"),
+                    data=event,
+                    content_type="application/json",
+                    HTTP_USER_AGENT="YooKassa",
+                )
+
+        assert CourseProfile.objects.get(course=course).number_of_students == 1
+
+
+class TestStudentCounts:
+    """Students of course follow completion of orders (no Redis in tests)"""
+
+    def _students(self, course):
+        return CourseProfile.objects.get(course=course).number_of_students
+
+    def test_cancel_completed(
+        self, mixer, user, course, django_capture_on_commit_callbacks
+    ):
+        order = mixer.blend("orders.Order", user=user, course=course, status="pending")
+        with django_capture_on_commit_callbacks(execute=True):
+            complete_order(order)
+        assert self._students(course) == 1
+
+        with django_capture_on_commit_callbacks(execute=True):
+            assert cancel_order(order)
+            assert not cancel_order(order)
+        assert self._students(course) == 0
+        assert Order.objects.get(id=order.id).status == "canceled"
+
+    def test_cancel_pending(
+        self, mixer, user, course, django_capture_on_commit_callbacks
+    ):
+        order = mixer.blend("orders.Order", user=user, course=course, status="pending")
+        with django_capture_on_commit_callbacks(execute=True):
+            assert cancel_order(order)
+        assert self._students(course) == 0
+
+    def test_admin_status_change(
+        self,
+        client,
+        mixer,
+        user,
+        course,
+        django_capture_on_commit_callbacks,
+    ):
+        order = mixer.blend(
+            "orders.Order", user=user, course=course, status="pending", total_price=1
+        )
+        client.force_login(
+            mixer.blend("users.CustomUser", is_staff=True, is_superuser=True)
+        )
+        url = reverse("admin:orders_order_change", args=[order.id])
+        data = {"user": user.id, "course": course.id, "total_price": "1.00"}
+        for status, students in [("completed", 1), ("canceled", 0)]:
+            with django_capture_on_commit_callbacks(execute=True):
+                response = client.post(url, {**data, "status": status})
+            assert response.status_code == 302
+            assert self._students(course) == students
+
+    def test_delete_completed(
+        self, mixer, user, course, django_capture_on_commit_callbacks
+    ):
+        order = mixer.blend("orders.Order", user=user, course=course, status="pending")
+        with django_capture_on_commit_callbacks(execute=True):
+            complete_order(order)
+        with django_capture_on_commit_callbacks(execute=True):
+            Order.objects.filter(id=order.id).delete()
+        assert self._students(course) == 0
+
+
+@pytest.mark.parametrize("check", [is_purchased, async_to_sync(ais_purchased)])
+class TestIsPurchased:
+    def test_purchased(self, check, user, course, order):
+        """Test completed order gives access, and status is cached"""
+        cache.delete(purchase_cache_key(user.id, course.id))
+
+        assert check(user, course.id)
+        assert cache.get(purchase_cache_key(user.id, course.id))["value"] is True
+
+    def test_not_purchased(self, check, user, course):
+        """Test no completed order, no access"""
+        cache.delete(purchase_cache_key(user.id, course.id))
+
+        assert not check(user, course.id)
+
+
+def test_completed_order_invalidates_status(
+    user, course, order, django_capture_on_commit_callbacks
+):
+    """Test cached status changes once order is completed"""
+    order.status = "pending"
+    with django_capture_on_commit_callbacks(execute=True):
+        order.save()
+    assert not is_purchased(user, course.id)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        complete_order(order)
+
+    assert is_purchased(user, course.id)
@@ -10,9 +10,12 @@ from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_POST
 from yookassa import Configuration, Payment
 
+from app import metrics
 from main.models import Course
 from orders.models import Order
 from orders.services import (
+    cancel_order,
+    complete_order,
     create_order,
     create_yookassa_payment,
     get_user_order_for_update,
@@ -69,6 +72,7 @@ def checkout_view(request, course_id):
 
 @csrf_exempt
 @require_POST
+@metrics.timed("yookassa_webhook_duration_seconds")
 def yookassa_webhook(request):
     if request.method != "POST":
         logger.warning(f"Недопустимый метод запроса: {request.method}")
@@ -98,7 +102,7 @@ def yookassa_webhook(request):
             )
             return HttpResponseBadRequest("Отсутствуют необходимые метаданные")
 
-        order = get_user_order_for_update(user_id, order_id)
+        order = get_user_order_for_update(order_id, user_id)
 
         # Check if order already handled
         if order.status in ["completed", "cancelled"]:
@@ -109,18 +113,13 @@ def yookassa_webhook(request):
 
         if event_type == "payment.succeeded":
             if payment.get("status") == "succeeded":
-                if order.status != "completed":
-                    order.status = "completed"
-                    order.yookassa_payment_id = payment_id
-                    order.save()
+                if complete_order(order, payment_id):
                     logger.info("Заказ %s успешно обработан", order_id)
                 logger.info("Заказ %s уже обработан, пропускаем", order_id)
 
         elif event_type == "payment.canceled":
             if payment.get("status") == "canceled":
-                if order.status != "canceled":
-                    order.status = "canceled"
-                    order.save()
+                if cancel_order(order):
                     logger.info("Заказ %s помечен как отменен", order_id)
                 logger.info("Заказ %s уже отменен, пропускаем", order_id)
 
@@ -156,15 +155,14 @@ def yookassa_payment_status_view(request):
         return render(request, "orders/yookassa_pending.html", {"order": order})
 
     try:
-        payment = Payment.find_one(order.yookassa_payment_id)
+        with metrics.timed("yookassa_api_duration_seconds", method="find_one"):
+            payment = Payment.find_one(order.yookassa_payment_id)
         if payment.status == "succeeded":
-            order.status = "completed"
-            order.save()
+            complete_order(order)
             messages.success(request, "Оплата прошла успешно! Доступ к курсу открыт.")
             return render(request, "orders/yookassa_success.html", {"order": order})
         elif payment.status in ["canceled", "failed"]:
-            order.status = "canceled"
-            order.save()
+            cancel_order(order)
             messages.error(request, "Платеж был отменен.")
             return render(request, "orders/yookassa_cancel.html", {"order": order})
     except Exception as e:
@@ -0,0 +1,50 @@
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Copy active database sessions to the session cache (SESSION_MODE=cache)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument(
+            "--delete",
+            action="store_true",
+            help="Delete migrated sessions from the database",
+        )
+
+    def handle(self, *args, chunk_size, delete, **options):
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        now = timezone.now()
+        sessions = Session.objects.filter(expire_date__gt=now).order_by("session_key")
+
+        migrated = 0
+        last_key = ""
+        while True:
+            chunk = list(sessions.filter(session_key__gt=last_key)[:chunk_size])
+            if not chunk:
+                break
+            last_key = chunk[-1].session_key
+            cached_keys = []
+            for session in chunk:
+                cache_key = CacheSessionStore(session.session_key).cache_key
+                timeout = int((session.expire_date - now).total_seconds())
+                # add() keeps sessions already created in cache untouched
+                if cache.add(cache_key, session.get_decoded(), timeout):
+                    migrated += 1
+                elif not cache.has_key(cache_key):
+                    continue
+                # Only sessions the cache has are deleted
+                cached_keys.append(session.session_key)
+
+            if delete:
+                Session.objects.filter(session_key__in=cached_keys).delete()
+
+        if delete:
+            Session.objects.filter(expire_date__lte=now).delete()
+
+        self.stdout.write(self.style.SUCCESS(f"Migrated sessions: {migrated}"))
@@ -1,12 +1,14 @@
 from django.contrib.auth.models import AbstractUser, BaseUserManager
-from django.core.cache import cache
 from django.db import models
 from django_resized import ResizedImageField
 
+from app.models import ProfileManagerMixin
 from users.validators import birthday_validator, phone_validator
 
 
-class CustomUserManager(BaseUserManager):
+class CustomUserManager(ProfileManagerMixin, BaseUserManager):
+    profile_field = "profile"
+
     def create_user(self, email, first_name, last_name, password=None, **extra_fields):
         if not email:
             raise ValueError("Поле Email должно быть указанно")
@@ -51,13 +53,10 @@ class CustomUser(AbstractUser):
         return self.email
 
     def save(self, *args, **kwargs):
-        created = self.pk is None
+        created = self._state.adding
         super().save(*args, **kwargs)
         if created:
-            try:
-                self.profile
-            except CustomUserProfile.DoesNotExist:
-                CustomUserProfile.objects.create(user=self)
+            CustomUser.objects.create_profile(self, using=kwargs.get("using"))
 
 
 class CustomUserProfile(models.Model):
@@ -102,12 +101,3 @@ class CustomUserProfile(models.Model):
 
     def __str__(self):
         return f"Профиль для: {self.user.email}"
-
-    def save(self, *args, **kwargs):
-        super().save(*args, **kwargs)
-
-        cache_key = f"user_avatar_url_{self.user.id}"
-        avatar_url = cache.get(cache_key, None)
-        if self.avatar and avatar_url != self.avatar.url:
-            avatar_url = self.avatar.url
-        cache.set(cache_key, avatar_url, 1800)
@@ -1 +1 @@
-__all__ = ["check", "fetching", "mailing"]
+__all__ = ["caching", "check", "fetching", "mailing"]
@@ -0,0 +1,65 @@
+from typing import Optional
+
+from django.db import transaction
+
+from app import metrics
+from app.cache import LocalTTLCache, get_or_set_tagged, invalidate_tags
+from users.models import CustomUserProfile
+
+AVATAR_LOCAL_TIMEOUT = 30
+
+# Marks cache miss, cached None means "user has no avatar"
+_MISSING = object()
+
+_local_avatars = LocalTTLCache(timeout=AVATAR_LOCAL_TIMEOUT)
+
+
+def user_tag(user_id) -> str:
+    """User, their profile and orders"""
+    return f"user:{user_id}"
+
+
+def avatar_cache_key(user_id) -> str:
+    return f"user_avatar_url_{user_id}"
+
+
+def fetch_user_avatar_url(user_id) -> Optional[str]:
+    try:
+        profile = CustomUserProfile.objects.only("avatar").get(user_id=user_id)
+        avatar_url = profile.avatar.url if profile.avatar else None
+    except CustomUserProfile.DoesNotExist:
+        avatar_url = None
+    return avatar_url
+
+
+def get_user_avatar_url(user_id) -> Optional[str]:
+    """
+    Get user avatar URL, using in-process cache, then Redis, then db.
+    Other workers may show old avatar for AVATAR_LOCAL_TIMEOUT after a change.
+    """
+    cache_key = avatar_cache_key(user_id)
+
+    avatar_url = _local_avatars.get(cache_key, _MISSING)
+    if avatar_url is not _MISSING:
+        metrics.cache_result("user_avatar_url", True, level="local")
+        return avatar_url
+    metrics.cache_result("user_avatar_url", False, level="local")
+
+    avatar_url = get_or_set_tagged(
+        cache_key,
+        [user_tag(user_id)],
+        lambda: fetch_user_avatar_url(user_id),
+        "user_avatar_url",
+    )
+    _local_avatars.set(cache_key, avatar_url)
+    return avatar_url
+
+
+def invalidate_user(user_id) -> None:
+    """Drop cached data of user after commit (local avatar of this worker too)"""
+
+    def on_commit():
+        invalidate_tags(user_tag(user_id))
+        _local_avatars.delete(avatar_cache_key(user_id))
+
+    transaction.on_commit(on_commit)
@@ -0,0 +1,10 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from users.models import CustomUserProfile
+from users.services.caching import invalidate_user
+
+
+@receiver([post_save, post_delete], sender=CustomUserProfile)
+def profile_changed(sender, instance, **kwargs):
+    invalidate_user(instance.user_id)
@@ -0,0 +1,63 @@
+from datetime import timedelta
+from unittest.mock import patch
+
+import pytest
+from django.conf import settings
+from django.contrib.sessions.backends.cache import SessionStore as CacheSessionStore
+from django.contrib.sessions.backends.db import SessionStore as DBSessionStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.core.management import call_command
+from django.utils import timezone
+
+pytestmark = [pytest.mark.django_db]
+
+
+class TestMigrateSessionsToCache:
+    def test_migrate(self):
+        """Test active session copied to cache, expired one skipped"""
+        active = DBSessionStore()
+        active["_auth_user_id"] = "7"
+        active.create()
+
+        expired = DBSessionStore()
+        expired["_auth_user_id"] = "8"
+        expired.create()
+        Session.objects.filter(session_key=expired.session_key).update(
+            expire_date=timezone.now() - timedelta(days=1)
+        )
+
+        call_command("migrate_sessions_to_cache")
+
+        assert CacheSessionStore(active.session_key)["_auth_user_id"] == "7"
+        assert not CacheSessionStore(expired.session_key).exists(expired.session_key)
+        assert Session.objects.count() == 2
+
+    def test_migrate_delete(self):
+        """Test database sessions removed with --delete"""
+        session = DBSessionStore()
+        session["key"] = "value"
+        session.create()
+
+        call_command("migrate_sessions_to_cache", delete=True)
+
+        assert CacheSessionStore(session.session_key)["key"] == "value"
+        assert not Session.objects.exists()
+
+    def test_delete_only_cached(self):
+        """Test sessions not copied to cache are kept in the database"""
+        sessions = [DBSessionStore() for _ in range(3)]
+        for session in sessions:
+            session.create()
+        failed = CacheSessionStore(sessions[0].session_key).cache_key
+        cache = caches[settings.SESSION_CACHE_ALIAS]
+        add = cache.add
+
+        with patch.object(
+            cache, "add", lambda key, *args: key != failed and add(key, *args)
+        ):
+            call_command("migrate_sessions_to_cache", chunk_size=2, delete=True)
+
+        assert list(Session.objects.values_list("session_key", flat=True)) == [
+            sessions[0].session_key
+        ]
@@ -3,12 +3,16 @@ from unittest.mock import patch
 import pytest
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.tokens import default_token_generator
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.utils.encoding import force_bytes
 from django.utils.http import urlsafe_base64_encode
 from pytest_django.asserts import assertRedirects, assertTemplateUsed
 
 from conftest import mixer
+from main.services.caching import invalidate_catalog
 from users.forms import (
     CustomUserCreationForm,
     CustomUserLoginForm,
@@ -221,6 +225,81 @@ def test_profile_partial_view(app, auth_user):
     assertTemplateUsed(response, "users/partials/profile_partial.html")
 
 
+@pytest.mark.auth_req
+@patch("users.services.fetching.ORDERS_PER_PAGE", 2)
+class TestProfileOrders:
+    def test_pages(self, app, mixer, auth_user):
+        """Test orders are split into pages, newest first"""
+        orders = mixer.cycle(5).blend("orders.Order", user=auth_user)[::-1]
+
+        response = app.get(reverse("users:profile"))
+        assert response.context["user_orders"] == orders[:2]
+        assert response.context["next_orders_page"] == 2
+
+        url = reverse("users:profile-orders")
+        response = app.get(url + "?page=3")
+        assertTemplateUsed(response, "users/partials/order_rows.html")
+        assert response.context["user_orders"] == orders[4:]
+        assert response.context["next_orders_page"] is None
+        assert app.get(url + "?page=x").context["user_orders"] == orders[:2]
+
+    def test_constant_queries(self, app, mixer, auth_user, course):
+        """Test profile data takes the same queries for any number of orders"""
+        url = reverse("users:profile-partial")
+        queries = []
+        for _ in range(2):
+            for course in mixer.cycle(3).blend("main.Course"):
+                mixer.blend(
+                    "orders.Order", user=auth_user, course=course, status="completed"
+                )
+            cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = app.get(url)
+            queries.append(len(context))
+
+        assert queries[0] == queries[1]
+        assert len(response.context["courses_covers"]) == 6
+
+    def test_cached_until_order_change(
+        self, app, mixer, auth_user, course, django_capture_on_commit_callbacks
+    ):
+        url = reverse("users:profile-partial")
+        app.get(url)
+        with CaptureQueriesContext(connection) as context:
+            app.get(url)
+        assert not [q for q in context if "orders_order" in q["sql"]]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            order = mixer.blend(
+                "orders.Order", user=auth_user, course=course, status="completed"
+            )
+
+        response = app.get(url)
+        assert response.context["user_orders"] == [order]
+        assert response.context["courses_covers"] == [course.course_profile]
+
+    def test_cached_until_course_change(
+        self, app, mixer, auth_user, course, django_capture_on_commit_callbacks
+    ):
+        """Test catalog changes (numbers of students) keep profile data cached"""
+        mixer.blend("orders.Order", user=auth_user, course=course, status="completed")
+        url = reverse("users:profile-partial")
+        app.get(url)
+
+        with django_capture_on_commit_callbacks(execute=True):
+            invalidate_catalog()
+        with CaptureQueriesContext(connection) as context:
+            app.get(url)
+        assert not [q for q in context if "main_course" in q["sql"]]
+
+        with django_capture_on_commit_callbacks(execute=True):
+            course.title = "Новое название"
+            course.save()
+        response = app.get(url)
+        assert response.context["user_orders"][0].course.title == "Новое название"
+        assert response.context["courses_covers"][0].course.title == "Новое название"
+
+
 @pytest.mark.auth_req
 class TestPasswordChangeView:
     def test_login_required(self, app):
@@ -12,6 +12,7 @@ from users.views import (
     login_view,
     logout_view,
     password_change_view,
+    profile_orders_view,
     profile_partial_view,
     profile_view,
     register_view,
@@ -28,6 +29,7 @@ urlpatterns = [
 urlpatterns += [
     path("profile/", profile_view, name="profile"),
     path("profile-partial/", profile_partial_view, name="profile-partial"),
+    path("profile-orders/", profile_orders_view, name="profile-orders"),
     path("password-change/", password_change_view, name="password-change"),
     path(
         "edit-account-details/",
@@ -21,6 +21,7 @@ from users.services.check import is_verified_by_token
 from users.services.fetching import (
     get_profile_by_user,
     get_user_by_uidb64,
+    get_user_orders_page,
     get_user_profile_data,
 )
 from users.services.mailing import secret_email_context_gen, send_verification_email
@@ -85,6 +86,13 @@ def logout_view(request):
     return redirect("main:home")
 
 
+def _page_number(request) -> int:
+    try:
+        return max(int(request.GET.get("page", 1)), 1)
+    except ValueError:
+        return 1
+
+
 @login_required
 def profile_view(request):
     user_profile_data = get_user_profile_data(request.user)
@@ -105,6 +113,13 @@ def profile_partial_view(request):
     )
 
 
+@login_required
+def profile_orders_view(request):
+    """Next page of order history rows"""
+    orders_page = get_user_orders_page(request.user.pk, _page_number(request))
+    return render(request, "users/partials/order_rows.html", orders_page)
+
+
 class CustomPasswordResetView(PasswordResetView):
     form_class = CustomUserPasswordResetForm
     template_name = "users/password/password_reset_form.html"